@@ -0,0 +1,83 @@
+"""
+Record router traffic against a local fake OpenAI server into a cassette,
+then replay it with the recorded latencies and with none, checking every
+replayed answer matches the recording. Replaying without latency leaves
+only our own overhead in the timings.
+
+Run with: python -m benchmarks.bench_cassette
+"""
+
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ["ROUTER_LOG_ENABLED"] = "false"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.agents.graph_registry import warm_up_graphs
+from src.agents.router_agent import run_router, stream_router
+from src.llm_cassette import Cassette, close_cassette
+
+LATENCY = 0.05
+
+QUERIES = [
+    "How do I escape side control?",
+    "My knee hurts after drilling heel hooks",
+    "I have a tournament next month against wrestlers",
+    "What should I work on as a new blue belt?",
+    "Can you help me with my guard retention?",
+]
+
+
+def run_all() -> tuple[float, list[str]]:
+    """Run every query blocking and streamed, returning the time and answers"""
+    start = time.perf_counter()
+    answers = []
+    for query in QUERIES:
+        answers.append(run_router(query))
+        answers.append(
+            "".join(text for kind, text in stream_router(query) if kind == "token")
+        )
+    return time.perf_counter() - start, answers
+
+
+def run_with_cassette(mode: str, replay_latency: bool = True) -> tuple[float, list]:
+    close_cassette()
+    Config.LLM_CASSETTE_MODE = mode
+    Config.LLM_CASSETTE_REPLAY_LATENCY = replay_latency
+    return run_all()
+
+
+def main() -> None:
+    server = start_fake_openai(latency=LATENCY)
+    Config.OPENAI_BASE_URL = server.base_url
+    warm_up_graphs()
+
+    with tempfile.TemporaryDirectory() as directory:
+        Config.LLM_CASSETTE_PATH = os.path.join(directory, "llm.jsonl.gz")
+        recorded_time, recorded = run_with_cassette("record")
+        requests = server.requests
+        close_cassette()
+        entries = len(Cassette(Config.LLM_CASSETTE_PATH, "replay"))
+        size = os.path.getsize(Config.LLM_CASSETTE_PATH)
+
+        replay_time, replayed = run_with_cassette("replay")
+        fast_time, fast = run_with_cassette("replay", replay_latency=False)
+        close_cassette()
+    Config.LLM_CASSETTE_MODE = "off"
+    server.shutdown()
+
+    print(f"Recorded {entries} LLM calls, cassette size {size} bytes")
+    print(f"Live run:                 {recorded_time * 1000:8.1f} ms")
+    print(f"Replay, recorded latency: {replay_time * 1000:8.1f} ms")
+    print(f"Replay, no latency:       {fast_time * 1000:8.1f} ms")
+    print(f"Requests sent during replay: {server.requests - requests}")
+    print(f"Replayed answers match: {recorded == replayed == fast}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark the database lookups the app makes per request (a student's
+progress and game plans, a student by name, the evaluation summary) on
+tables of growing size, at the initial schema and after the index
+migrations.
+
+Run with: python -m benchmarks.bench_db_indexes
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from config import Config
+from src import database
+from src.db_migrations import MIGRATIONS, migrate
+from src.db_pool import close_pools, get_connection, transaction
+from src.evaluation import get_evaluation_summary
+
+SIZES = (10_000, 100_000, 1_000_000)
+ROWS_PER_USER = 50
+LOOKUPS = 20
+AGENTS = ("coach", "game_plan", "injury")
+
+
+def fill(rows: int) -> int:
+    """Insert that many rows into each table; returns the number of users"""
+    students = max(rows // ROWS_PER_USER, 1)
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO students (name, belt_color) VALUES (?, 'blue')",
+            ((f"student {i}",) for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO progress_tracking (user_id, technique, level, created_at) "
+            "VALUES (?, 'armbar', 'drilling', datetime('now', ?))",
+            ((i % students + 1, f"-{i} seconds") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO game_plans (user_id, tournament_name, game_plan, created_at) "
+            "VALUES (?, 'open', 'pull guard', datetime('now', ?))",
+            ((i % students + 1, f"-{i} seconds") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO evaluation_results (agent_type, score) VALUES (?, ?)",
+            ((AGENTS[i % len(AGENTS)], random.random()) for i in range(rows)),
+        )
+    return students
+
+
+def time_lookups(rows: int, students: int) -> dict[str, float]:
+    """Mean milliseconds per call of each lookup"""
+    lookups = {
+        "progress": lambda: database.get_progress_by_user(random.randint(1, students)),
+        "game plans": lambda: database.get_game_plans_by_user(
+            random.randint(1, students)
+        ),
+        "by name": lambda: database.get_student_by_name(
+            f"student {random.randrange(rows)}"
+        ),
+        "eval summary": get_evaluation_summary,
+    }
+    times = {}
+    for name, lookup in lookups.items():
+        start = time.perf_counter()
+        for _ in range(LOOKUPS):
+            lookup()
+        times[name] = (time.perf_counter() - start) / LOOKUPS * 1000
+    return times
+
+
+def main() -> None:
+    random.seed(0)
+    tmp = tempfile.mkdtemp()
+    names = ("progress", "game plans", "by name", "eval summary")
+    print(f"ms per lookup, mean of {LOOKUPS}:")
+    print(f"  {'rows':>9} {'schema':<8}" + "".join(f"{name:>14}" for name in names))
+    for rows in SIZES:
+        Config.DATABASE_PATH = os.path.join(tmp, f"bench_{rows}.db")
+        migrate(target=1)
+        students = fill(rows)
+        for label in ("initial", "latest"):
+            if label == "latest":
+                start = time.perf_counter()
+                migrate()
+                print(
+                    f"  {'':>9} migrated to {MIGRATIONS[-1][0]} in "
+                    f"{time.perf_counter() - start:.2f} s"
+                )
+            get_connection().execute("ANALYZE")
+            times = time_lookups(rows, students)
+            print(
+                f"  {rows:>9} {label:<8}"
+                + "".join(f"{times[name]:>14.2f}" for name in names)
+            )
+        close_pools()
+
+
+if __name__ == "__main__":
+    main()
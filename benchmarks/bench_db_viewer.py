@@ -0,0 +1,118 @@
+"""
+Benchmark the Database Viewer's reads on an evaluation_results table with
+large prompt and response texts: loading the whole table (the old
+view_all_rows) vs. one keyset page, at the start and deep into the table,
+and a full scan through iter_rows. Reports time and peak Python memory.
+
+Run with: python -m benchmarks.bench_db_viewer
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from config import Config
+from src import database
+from src.db_pool import close_pools, get_connection
+
+ROWS = 5000
+TEXT_CHARS = 10_000
+PAGE_SIZE = 50
+MAX_CHARS = 500
+
+
+def fill() -> None:
+    text = "armbar from closed guard " * (TEXT_CHARS // 25)
+    database.save_many(
+        "evaluation_results",
+        [
+            {
+                "agent_type": ("coach", "game_plan", "injury")[i % 3],
+                "input_text": text,
+                "output_text": text,
+                "score": (i % 100) / 100,
+            }
+            for i in range(ROWS)
+        ],
+    )
+
+
+def measure(label: str, read) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = read()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"  {label:<38} {elapsed * 1000:8.1f} ms  "
+        f"peak {peak / 2**20:7.1f} MiB  {rows} rows"
+    )
+
+
+def main() -> None:
+    Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database.init_database()
+    fill()
+    size = os.path.getsize(Config.DATABASE_PATH) / 2**20
+    print(
+        f"{ROWS} evaluation results, {2 * TEXT_CHARS} chars of text each, {size:.0f} MiB:"
+    )
+
+    measure(
+        "whole table (view_all_rows)",
+        lambda: len(database.view_all_rows("evaluation_results")),
+    )
+    measure(
+        f"first page of {PAGE_SIZE}",
+        lambda: len(database.read_page("evaluation_results", limit=PAGE_SIZE)[0]),
+    )
+    measure(
+        f"first page, text cut to {MAX_CHARS} chars",
+        lambda: len(
+            database.read_page(
+                "evaluation_results", limit=PAGE_SIZE, max_chars=MAX_CHARS
+            )[0]
+        ),
+    )
+    last_page = (ROWS - 1) // PAGE_SIZE * PAGE_SIZE
+    measure(
+        f"page at row {last_page} by OFFSET",
+        lambda: len(
+            get_connection()
+            .execute(
+                "SELECT * FROM evaluation_results ORDER BY id LIMIT ? OFFSET ?",
+                (PAGE_SIZE, last_page),
+            )
+            .fetchall()
+        ),
+    )
+    # The key the viewer holds after paging that far
+    (last_id,) = (
+        get_connection()
+        .execute(
+            "SELECT id FROM evaluation_results ORDER BY id LIMIT 1 OFFSET ?",
+            (last_page - 1,),
+        )
+        .fetchone()
+    )
+    measure(
+        f"page at row {last_page} by key",
+        lambda: len(
+            database.read_page(
+                "evaluation_results", after=(last_id, last_id), limit=PAGE_SIZE
+            )[0]
+        ),
+    )
+    measure(
+        "iter_rows over the whole table",
+        lambda: sum(
+            1 for _ in database.iter_rows("evaluation_results", batch_size=PAGE_SIZE)
+        ),
+    )
+    close_pools()
+
+
+if __name__ == "__main__":
+    main()
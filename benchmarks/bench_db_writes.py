@@ -0,0 +1,92 @@
+"""
+Benchmark progress-entry inserts from concurrent request threads: a
+transaction per row (save_data_to_sqlite), batches through save_many, and
+the write-behind queue behind save_later. Reports throughput and how long
+the saving thread is blocked per row.
+
+Run with: python -m benchmarks.bench_db_writes
+"""
+
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from src import database
+from src.db_pool import close_pools, get_connection
+from src.db_writer import flush_writes, get_write_queue_stats
+
+THREADS = 8
+ROWS_PER_THREAD = 500
+BATCH = 100
+
+
+def progress_row(thread: int, i: int) -> dict:
+    return {
+        "user_id": thread + 1,
+        "technique": f"technique {i}",
+        "level": "drilling",
+        "notes": "benchmark",
+    }
+
+
+def one_by_one(thread: int) -> list[float]:
+    waits = []
+    for i in range(ROWS_PER_THREAD):
+        start = time.perf_counter()
+        database.save_data_to_sqlite("progress_tracking", progress_row(thread, i))
+        waits.append(time.perf_counter() - start)
+    return waits
+
+
+def batched(thread: int) -> list[float]:
+    waits = []
+    for first in range(0, ROWS_PER_THREAD, BATCH):
+        rows = [progress_row(thread, i) for i in range(first, first + BATCH)]
+        start = time.perf_counter()
+        database.save_many("progress_tracking", rows)
+        waits.append((time.perf_counter() - start) / len(rows))
+    return waits
+
+
+def write_behind(thread: int) -> list[float]:
+    waits = []
+    for i in range(ROWS_PER_THREAD):
+        start = time.perf_counter()
+        database.save_later("progress_tracking", progress_row(thread, i))
+        waits.append(time.perf_counter() - start)
+    return waits
+
+
+def run(label: str, save) -> None:
+    Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database.init_database()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        waits = [wait for waits in pool.map(save, range(THREADS)) for wait in waits]
+    flush_writes()
+    elapsed = time.perf_counter() - start
+    (rows,) = (
+        get_connection().execute("SELECT COUNT(*) FROM progress_tracking").fetchone()
+    )
+    print(
+        f"  {label:<22} {rows / elapsed:8.0f} rows/s  "
+        f"blocked {statistics.mean(waits) * 1e6:7.1f} us/row mean, "
+        f"{max(waits) * 1e3:6.1f} ms max  ({rows} rows)"
+    )
+    close_pools()
+
+
+def main() -> None:
+    print(f"{THREADS} threads x {ROWS_PER_THREAD} progress entries:")
+    run("transaction per row", one_by_one)
+    run(f"save_many x{BATCH}", batched)
+    Config.DB_WRITE_BEHIND_ENABLED = True
+    run("write-behind queue", write_behind)
+    print(f"  queue: {get_write_queue_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of per-request graph overhead: compiling a graph on every
+call versus reusing the compiled graph from the registry.
+
+The game plan agent is invoked with input that lacks tournament details, so
+the request never reaches the LLM and only framework overhead is measured.
+
+Run with: python -m benchmarks.bench_graph_compile
+"""
+
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from src.agents.coach_agent import build_coach_graph, build_coach_graph_with_tools
+from src.agents.game_plan_agent import (
+    GamePlanInput,
+    GamePlanState,
+    build_game_plan_graph,
+)
+from src.agents.graph_registry import get_graph, warm_up_graphs
+from src.agents.injury_agent import build_injury_graph
+from src.agents.router_agent import build_router_graph
+
+REQUESTS = 200
+
+
+def time_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(timings)
+
+
+def main() -> None:
+    print("Compile cost per graph:")
+    for name, builder in [
+        ("router", build_router_graph),
+        ("coach", build_coach_graph),
+        ("coach_with_tools", build_coach_graph_with_tools),
+        ("game_plan", build_game_plan_graph),
+        ("injury", build_injury_graph),
+    ]:
+        print(f"  {name:<18} {time_ms(builder, 20):7.2f} ms")
+
+    state = GamePlanState(input=GamePlanInput(message="help me prepare"))
+    before = time_ms(lambda: build_game_plan_graph().invoke(state), REQUESTS)
+    warm_up_graphs()
+    after = time_ms(lambda: get_graph("game_plan").invoke(state), REQUESTS)
+
+    print(f"\nPer-request overhead over {REQUESTS} game plan requests:")
+    print(f"  compile per request  {before:7.2f} ms")
+    print(f"  registry             {after:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark use_llm_batch against sequential use_llm_raw calls, and check that
+a rate-limited batch stays within its requests-per-minute budget, against a
+local fake OpenAI server.
+
+Run with: python -m benchmarks.bench_llm_batch
+"""
+
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.llm_utils import use_llm_batch, use_llm_raw
+
+PROMPTS = [f"Give me drill number {i} for guard retention" for i in range(64)]
+LATENCY = 0.1
+RATE_LIMIT_RPM = 600
+
+
+def main() -> None:
+    server = start_fake_openai(latency=LATENCY)
+    Config.OPENAI_BASE_URL = server.base_url
+
+    start = time.perf_counter()
+    for prompt in PROMPTS:
+        use_llm_raw(prompt)
+    sequential = time.perf_counter() - start
+
+    print(f"{len(PROMPTS)} prompts, {LATENCY * 1000:.0f} ms fake server latency:")
+    print(
+        f"  sequential use_llm_raw   {sequential:6.2f} s  "
+        f"{len(PROMPTS) / sequential:7.1f} req/s"
+    )
+    for workers in (4, 8, 16):
+        stats = use_llm_batch(PROMPTS, max_workers=workers).stats
+        print(
+            f"  use_llm_batch {workers:>2} workers {stats['elapsed_s']:6.2f} s  "
+            f"{stats['requests_per_s']:7.1f} req/s"
+        )
+
+    result = use_llm_batch(
+        PROMPTS[:20], max_workers=8, requests_per_minute=RATE_LIMIT_RPM
+    )
+    stats = result.stats
+    print(f"\n20 prompts limited to {RATE_LIMIT_RPM} requests/min:")
+    print(
+        f"  {stats['elapsed_s']:.2f} s, {stats['requests_per_s']:.1f} req/s, "
+        f"{stats['rate_limit_wait_s']:.2f} s waiting on the bucket, "
+        f"{stats['failed']:.0f} failed"
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark per-call setup overhead of use_llm_raw with and without the pooled
+client registry, against a local fake OpenAI server.
+
+Run with: python -m benchmarks.bench_llm_clients
+"""
+
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src import llm_utils
+
+CALLS = 200
+
+
+def fresh_client_call(prompt: str) -> str:
+    """Previous behaviour: a new client and connection pool per call"""
+    with httpx.Client() as http_client:
+        llm = ChatOpenAI(
+            model="gpt-4o",
+            temperature=0.0,
+            openai_api_key=llm_utils.openai_api_key,
+            base_url=Config.OPENAI_BASE_URL,
+            http_client=http_client,
+        )
+        return llm.invoke(prompt).content
+
+
+def run(label: str, call, server) -> None:
+    connections_before = server.connections
+    timings = []
+    for i in range(CALLS):
+        start = time.perf_counter()
+        call(f"how do I escape mount? #{i}")
+        timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:<16} mean {statistics.mean(timings):6.2f} ms  "
+        f"p50 {statistics.median(timings):6.2f} ms  "
+        f"connections {server.connections - connections_before}"
+    )
+
+
+def main() -> None:
+    server = start_fake_openai()
+    Config.OPENAI_BASE_URL = server.base_url
+    llm_utils.clear_client_registry()
+
+    print(f"{CALLS} sequential calls against {server.base_url}")
+    run("fresh client", fresh_client_call, server)
+    run("pooled registry", llm_utils.use_llm_raw, server)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
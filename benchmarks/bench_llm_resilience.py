@@ -0,0 +1,85 @@
+"""
+Exercise the LLM resilience layer against a fault-injecting fake OpenAI server:
+success rate under transient 503s with and without retries, deadline
+enforcement against a slow upstream, and how fast calls fail once the
+circuit breaker has opened.
+
+Run with: python -m benchmarks.bench_llm_resilience
+"""
+
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ.setdefault("LLM_RETRY_BASE_DELAY", "0.02")
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.llm_resilience import (
+    LLMCallError,
+    get_circuit_breaker_stats,
+    reset_circuit_breakers,
+)
+from src.llm_utils import use_llm_batch, use_llm_raw
+
+PROMPTS = [f"What should I drill today? ({i})" for i in range(200)]
+ERROR_RATE = 0.3
+
+
+def run_batch(label: str) -> None:
+    reset_circuit_breakers()
+    stats = use_llm_batch(PROMPTS, max_workers=8).stats
+    print(
+        f"  {label:<22} {stats['succeeded']:.0f}/{stats['items']:.0f} succeeded "
+        f"in {stats['elapsed_s']:.2f} s"
+    )
+
+
+def timed_failure(prompt: str, **kwargs) -> tuple[float, LLMCallError]:
+    start = time.perf_counter()
+    try:
+        use_llm_raw(prompt, **kwargs)
+    except LLMCallError as e:
+        return (time.perf_counter() - start) * 1000, e
+    raise AssertionError("Expected the call to fail")
+
+
+def main() -> None:
+    server = start_fake_openai(latency=0.01, error_rate=ERROR_RATE, seed=7)
+    Config.OPENAI_BASE_URL = server.base_url
+    # Fail fast on the open breaker rather than falling back to another model
+    Config.LLM_FALLBACK_MODELS = ""
+    # Keep the breaker out of the way while measuring retries alone
+    Config.LLM_BREAKER_ERROR_RATE = 1.01
+
+    print(f"{len(PROMPTS)} prompts, {ERROR_RATE:.0%} of requests fail with 503:")
+    Config.LLM_MAX_RETRIES = 0
+    run_batch("no retries")
+    Config.LLM_MAX_RETRIES = 3
+    run_batch("3 jittered retries")
+
+    print("\nDeadline against a 2 s upstream:")
+    server.error_rate = 0.0
+    server.latency = 2.0
+    elapsed, error = timed_failure("slow", timeout=0.5)
+    print(f"  timeout=0.5 s          failed after {elapsed:.0f} ms ({error.kind})")
+
+    print("\nUpstream hard down (every request fails with 503):")
+    server.latency = 0.05
+    server.error_rate = 1.0
+    Config.LLM_BREAKER_ERROR_RATE = 0.5
+    reset_circuit_breakers()
+    elapsed, error = timed_failure("down")
+    print(f"  breaker closed         failed after {elapsed:.0f} ms ({error.kind})")
+    for _ in range(5):
+        timed_failure("down")
+    elapsed, error = timed_failure("down")
+    print(f"  breaker open           failed after {elapsed:.2f} ms ({error.kind})")
+    print(f"  breaker stats          {get_circuit_breaker_stats()['gpt-4o']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
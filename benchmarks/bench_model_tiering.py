@@ -0,0 +1,80 @@
+"""
+Show which model each agent calls under the configured model tiers, and how
+calls move to the cheaper fallback model when the primary model is slow or
+the hourly budget is spent, against a local fake OpenAI server.
+
+Run with: python -m benchmarks.bench_model_tiering
+"""
+
+import os
+import time
+from collections import Counter
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ["ROUTER_LOG_ENABLED"] = "false"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.agents.router_agent import run_router
+from src.llm_metrics import get_llm_metrics, reset_llm_metrics
+from src.llm_utils import use_llm_raw
+from src.model_policy import get_model_policy_stats, reset_model_policy
+
+QUERIES = [
+    "hello there",
+    "My knee hurts after drilling heel hooks",
+    "I have a tournament next month against wrestlers",
+    "How do I escape side control?",
+]
+CALLS = 20
+
+
+def calls_per_model() -> str:
+    counts = Counter()
+    for (agent, _, model), bucket in get_llm_metrics().items():
+        counts[f"{agent}={model}"] += bucket["calls"]
+    return ", ".join(f"{key} x{calls:.0f}" for key, calls in sorted(counts.items()))
+
+
+def coach_calls(label: str) -> None:
+    reset_llm_metrics()
+    start = time.perf_counter()
+    for i in range(CALLS):
+        use_llm_raw(f"What should I drill today? ({i})", agent="coach")
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<30} {elapsed:5.2f} s  {calls_per_model()}")
+    print(f"  {'':<30} fallbacks {get_model_policy_stats()['fallbacks']}")
+
+
+def main() -> None:
+    server = start_fake_openai(latency=0.02)
+    Config.OPENAI_BASE_URL = server.base_url
+
+    print(f"Model tiers: {Config.LLM_MODELS} (default {Config.OPENAI_MODEL})")
+    reset_llm_metrics()
+    for query in QUERIES:
+        run_router(query)
+    print(f"  router queries: {calls_per_model()}")
+
+    print(f"\n{CALLS} coach calls, fallbacks {Config.LLM_FALLBACK_MODELS}:")
+    reset_model_policy()
+    coach_calls("no pressure")
+
+    Config.LLM_FALLBACK_LATENCY_MS = 100
+    reset_model_policy()
+    server.latency = 0.15
+    coach_calls("150 ms upstream, 100 ms limit")
+    Config.LLM_FALLBACK_LATENCY_MS = 0
+    server.latency = 0.02
+
+    Config.LLM_HOURLY_BUDGET_USD = 0.0005
+    reset_model_policy()
+    coach_calls("$0.0005 hourly budget")
+    print(f"  {'':<30} spent ${get_model_policy_stats()['hourly_spend_usd']:.4f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark student profile lookups, as made for every personalized message,
+with and without the profile cache, and how soon a profile save in another
+process is picked up.
+
+Run with: python -m benchmarks.bench_profile_cache
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from config import Config
+from src import database
+from src.profile_cache import get_profile_cache_stats, reset_profile_cache
+
+STUDENTS = 10_000
+ACTIVE = 200
+LOOKUPS = 20_000
+
+
+def lookups() -> float:
+    """Mean microseconds per lookup, alternating by id and by name"""
+    random.seed(0)
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        student = random.randint(1, ACTIVE)
+        if i % 2:
+            database.get_student_by_id(student)
+        else:
+            database.get_student_by_name(f"student {student}")
+    return (time.perf_counter() - start) / LOOKUPS * 1e6
+
+
+def main() -> None:
+    Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database.init_database()
+    database.save_many(
+        "students",
+        [
+            {"name": f"student {i}", "belt_color": "blue"}
+            for i in range(1, STUDENTS + 1)
+        ],
+    )
+    print(f"{LOOKUPS} lookups over {ACTIVE} active of {STUDENTS} students:")
+
+    Config.PROFILE_CACHE_ENABLED = False
+    print(f"  {'no cache':<20} {lookups():6.1f} us/lookup")
+    Config.PROFILE_CACHE_ENABLED = True
+    for interval in (0, Config.PROFILE_CACHE_CHECK_INTERVAL):
+        Config.PROFILE_CACHE_CHECK_INTERVAL = interval
+        reset_profile_cache()
+        label = f"cache, {interval:g} s check"
+        print(f"  {label:<20} {lookups():6.1f} us/lookup")
+    print(f"  {'':<20} {get_profile_cache_stats()}")
+
+    # Another process promotes a student
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    conn.execute("UPDATE students SET belt_color = 'purple' WHERE id = 1")
+    conn.commit()
+    conn.close()
+    start = time.perf_counter()
+    while database.get_student_by_id(1)["belt_color"] != "purple":
+        time.sleep(0.01)
+    print(
+        f"  a save in another process was seen after "
+        f"{time.perf_counter() - start:.2f} s: {get_profile_cache_stats()}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Report the cacheable prompt prefix of each agent and the share of prompt
+tokens served from the provider's prefix cache, against the local fake
+OpenAI server, which reports a repeated leading system message as cached
+tokens.
+
+The same requests are sent twice: once with each agent's system and user
+messages joined into one message, the way prompts were sent before they
+were split, and once as separate system and user messages.
+
+Run with: python -m benchmarks.bench_prompt_cache
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.agents.coach_agent import build_coach_prompt
+from src.agents.game_plan_agent import TournamentInfo, build_game_plan_prompt
+from src.agents.injury_agent import build_injury_prompt
+from src.agents.router_agent import build_router_prompt
+from src.llm_metrics import get_prompt_cache_stats, reset_llm_metrics
+from src.llm_utils import use_llm_raw
+
+MESSAGES = [
+    "How do I escape side control?",
+    "My knee hurts after drilling heel hooks",
+    "I have a tournament next month against wrestlers",
+    "What should I work on as a new blue belt?",
+    "Can you help me with my guard retention?",
+]
+
+
+def requests() -> list[tuple[str, str, str]]:
+    """(agent, system, user) for every message through every agent"""
+    built = []
+    for index, message in enumerate(MESSAGES):
+        info = TournamentInfo(division="adult", weight_class=f"{70 + index}kg")
+        built += [
+            ("router", *build_router_prompt(message)),
+            ("coach", *build_coach_prompt(message, "james")),
+            ("injury", *build_injury_prompt(message)),
+            ("game_plan", *build_game_plan_prompt(info)),
+        ]
+    return built
+
+
+def report(label: str) -> None:
+    print(label)
+    for agent, stats in get_prompt_cache_stats().items():
+        print(
+            f"  {agent:<10} prefix {stats['avg_prefix_tokens']:>5.0f} tokens   "
+            f"cacheable {stats['cacheable_ratio']:>4.0%}   "
+            f"cached {stats['cached_ratio']:>4.0%}"
+        )
+
+
+def main() -> None:
+    server = start_fake_openai()
+    Config.OPENAI_BASE_URL = server.base_url
+    built = requests()
+
+    reset_llm_metrics()
+    for agent, system, user in built:
+        use_llm_raw(f"{system}\n\n{user}", agent=agent)
+    report("One combined message:")
+
+    reset_llm_metrics()
+    for agent, system, user in built:
+        use_llm_raw(user, agent=agent, system=system)
+    report("\nStatic system message + dynamic user message:")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark end-to-end request deadlines against a slow local fake OpenAI
+server: a query the router cannot place locally, run with no deadline and
+with tighter ones. With little time left the router takes its keyword route
+instead of asking the LLM, and the agent's max_tokens shrinks to what can be
+generated before the deadline.
+
+Run with: python -m benchmarks.bench_request_deadline
+"""
+
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ["ROUTER_LOG_ENABLED"] = "false"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.agents.graph_registry import warm_up_graphs
+from src.agents.router_agent import get_router_stats, run_router
+
+LATENCY = 0.5
+TOKENS_PER_SECOND = 200
+REPLY = "coach " + " ".join(["word"] * 799)
+QUERY = "What should I focus on this week?"
+
+
+def main() -> None:
+    server = start_fake_openai(
+        latency=LATENCY, reply=REPLY, tokens_per_second=TOKENS_PER_SECOND
+    )
+    Config.OPENAI_BASE_URL = server.base_url
+    Config.LLM_FIRST_TOKEN_SECONDS = LATENCY
+    Config.LLM_OUTPUT_TOKENS_PER_SECOND = TOKENS_PER_SECOND
+    Config.ROUTER_LLM_MIN_SECONDS = 6
+    warm_up_graphs()
+
+    print(
+        f"{LATENCY * 1000:.0f} ms latency, {TOKENS_PER_SECOND} tokens/s, "
+        f"{len(REPLY.split())}-token replies"
+    )
+    for timeout in (0, 10, 5, 2):
+        before = get_router_stats()
+        start = time.perf_counter()
+        answer = run_router(QUERY, timeout=timeout)
+        elapsed = time.perf_counter() - start
+        after = get_router_stats()
+        route = next(
+            source
+            for source in ("fast_path", "model", "llm", "deadline")
+            if after[source] > before[source]
+        )
+        label = f"timeout {timeout} s" if timeout else "no deadline"
+        print(
+            f"  {label:<14} {elapsed:5.2f} s  routed by {route:<8} "
+            f"{len(answer.split()):>4} tokens"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
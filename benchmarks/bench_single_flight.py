@@ -0,0 +1,80 @@
+"""
+Benchmark a class of students asking the same question at once, with and
+without single-flight coalescing, against a local fake OpenAI server. The
+burst is sent from a thread pool through the sync API and as coroutines
+through the async API, and again through the streaming API, reporting the
+requests that reached the server each time.
+
+Run with: python -m benchmarks.bench_single_flight
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+
+Config.LLM_MAX_CONNECTIONS = 100
+Config.LLM_MAX_KEEPALIVE_CONNECTIONS = 100
+
+from src.llm_utils import use_llm_async, use_llm_raw, use_llm_stream
+from src.single_flight import get_single_flight_stats, reset_single_flight_stats
+
+STUDENTS = 30
+LLM_LATENCY = 0.5
+QUESTION = "Give me a five minute warm-up drill for today's class"
+
+
+def stream(prompt: str) -> str:
+    return "".join(use_llm_stream(prompt))
+
+
+def run_threads(call) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=STUDENTS) as pool:
+        answers = set(pool.map(call, [QUESTION] * STUDENTS))
+    assert len(answers) == 1
+    return time.perf_counter() - start
+
+
+async def run_async() -> float:
+    start = time.perf_counter()
+    answers = await asyncio.gather(*(use_llm_async(QUESTION) for _ in range(STUDENTS)))
+    assert len(set(answers)) == 1
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    server = start_fake_openai(latency=LLM_LATENCY)
+    Config.OPENAI_BASE_URL = server.base_url
+
+    print(f"{STUDENTS} identical requests, {LLM_LATENCY * 1000:.0f} ms LLM latency")
+    for enabled in (False, True):
+        Config.LLM_SINGLE_FLIGHT_ENABLED = enabled
+        print("single-flight on" if enabled else "single-flight off")
+        for label, run in [
+            ("threads", lambda: run_threads(use_llm_raw)),
+            ("threads, streamed", lambda: run_threads(stream)),
+            ("asyncio", lambda: asyncio.run(run_async())),
+        ]:
+            reset_single_flight_stats()
+            sent = server.requests
+            elapsed = run()
+            coalesced = get_single_flight_stats()["coalesced"]
+            print(
+                f"  {label:<18} {elapsed:5.2f} s  "
+                f"{server.requests - sent:>3} upstream requests  "
+                f"{coalesced:>3} coalesced"
+            )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
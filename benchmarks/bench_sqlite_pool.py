@@ -0,0 +1,120 @@
+"""
+Benchmark concurrent reads and writes on the app database: threads logging
+progress entries and reading them back, with a new connection per query in
+the default rollback-journal mode (the old database.py) vs. the pooled WAL
+connections of src.db_pool.
+
+Run with: python -m benchmarks.bench_sqlite_pool
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from src import database
+from src.db_pool import close_pools
+
+THREADS = 8
+OPS_PER_THREAD = 300
+# One write for every WRITE_EVERY operations, the rest are reads
+WRITE_EVERY = 4
+USERS = 20
+
+
+def per_call_save(db_path: str, data: dict) -> bool:
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        columns = ", ".join(data.keys())
+        placeholders = ", ".join(["?" for _ in data])
+        cursor.execute(
+            f"INSERT INTO progress_tracking ({columns}) VALUES ({placeholders})",
+            list(data.values()),
+        )
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def per_call_read(db_path: str, user_id: int) -> bool:
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM progress_tracking WHERE user_id = ? ORDER BY created_at DESC",
+            (user_id,),
+        )
+        cursor.fetchall()
+        conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def pooled_save(db_path: str, data: dict) -> bool:
+    return database.save_data_to_sqlite("progress_tracking", data)
+
+
+def pooled_read(db_path: str, user_id: int) -> bool:
+    database.get_progress_by_user(user_id)
+    return True
+
+
+def worker(save, read, db_path: str, thread: int) -> int:
+    errors = 0
+    for i in range(OPS_PER_THREAD):
+        user_id = (thread * OPS_PER_THREAD + i) % USERS + 1
+        if i % WRITE_EVERY == 0:
+            ok = save(
+                db_path,
+                {
+                    "user_id": user_id,
+                    "technique": f"technique {i}",
+                    "level": "drilling",
+                    "notes": "benchmark",
+                },
+            )
+        else:
+            ok = read(db_path, user_id)
+        errors += not ok
+    return errors
+
+
+def run(label: str, save, read, db_path: str) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        errors = sum(pool.map(lambda t: worker(save, read, db_path, t), range(THREADS)))
+    elapsed = time.perf_counter() - start
+    ops = THREADS * OPS_PER_THREAD
+    print(
+        f"  {label:<28} {elapsed:6.2f} s  {ops / elapsed:8.0f} ops/s  "
+        f"{errors} failed"
+    )
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    print(f"{THREADS} threads x {OPS_PER_THREAD} ops, 1 write per {WRITE_EVERY} ops:")
+
+    Config.DATABASE_PATH = os.path.join(tmp, "per_call.db")
+    database.init_database()
+    close_pools()
+    # The old code never changed the journal mode
+    conn = sqlite3.connect(Config.DATABASE_PATH)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    run("connection per query", per_call_save, per_call_read, Config.DATABASE_PATH)
+
+    Config.DATABASE_PATH = os.path.join(tmp, "pooled.db")
+    database.init_database()
+    run("pooled WAL connections", pooled_save, pooled_read, Config.DATABASE_PATH)
+    close_pools()
+
+
+if __name__ == "__main__":
+    main()
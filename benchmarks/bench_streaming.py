@@ -0,0 +1,81 @@
+"""
+Benchmark time-to-first-token for the router, comparing the blocking
+run_router call with stream_router, against a local fake OpenAI server that
+generates its reply at a fixed number of tokens per second.
+
+Run with: python -m benchmarks.bench_streaming
+"""
+
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ["ROUTER_LOG_ENABLED"] = "false"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+from src.agents.graph_registry import warm_up_graphs
+from src.agents.router_agent import run_router, stream_router
+
+REQUESTS = 5
+LATENCY = 0.2
+TOKENS_PER_SECOND = 50
+REPLY = "coach " + " ".join(["word"] * 99)
+
+# Enough keywords for the fast path, so only the agent's own call is measured
+QUERY = "How do I escape mount and finish the armbar drill?"
+
+
+def blocking_request() -> tuple[float, float]:
+    start = time.perf_counter()
+    run_router(QUERY)
+    total = time.perf_counter() - start
+    return total, total
+
+
+def streaming_request() -> tuple[float, float, float]:
+    start = time.perf_counter()
+    agent_at = first_token_at = None
+    for kind, _ in stream_router(QUERY):
+        now = time.perf_counter() - start
+        if kind == "agent" and agent_at is None:
+            agent_at = now
+        elif kind == "token" and first_token_at is None:
+            first_token_at = now
+    return agent_at, first_token_at, time.perf_counter() - start
+
+
+def main() -> None:
+    server = start_fake_openai(
+        latency=LATENCY, reply=REPLY, tokens_per_second=TOKENS_PER_SECOND
+    )
+    Config.OPENAI_BASE_URL = server.base_url
+    warm_up_graphs()
+
+    blocking = [blocking_request() for _ in range(REQUESTS)]
+    streaming = [streaming_request() for _ in range(REQUESTS)]
+    server.shutdown()
+
+    print(
+        f"{REQUESTS} requests, {len(REPLY.split())}-token replies at "
+        f"{TOKENS_PER_SECOND} tokens/s after {LATENCY * 1000:.0f} ms latency:"
+    )
+    print("                 agent badge   first token     complete")
+    print(
+        f"  run_router     {'-':>11}   "
+        f"{statistics.mean(r[0] for r in blocking) * 1000:8.0f} ms  "
+        f"{statistics.mean(r[1] for r in blocking) * 1000:8.0f} ms"
+    )
+    print(
+        f"  stream_router  "
+        f"{statistics.mean(r[0] for r in streaming) * 1000:8.0f} ms   "
+        f"{statistics.mean(r[1] for r in streaming) * 1000:8.0f} ms  "
+        f"{statistics.mean(r[2] for r in streaming) * 1000:8.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Load test of concurrent chat users per process: the sync agent API on a
+bounded thread pool (how Gradio/Streamlit run sync callbacks) versus the
+async API on a single event loop.
+
+The fake OpenAI server answers every LLM call after a fixed delay to stand in for
+model latency.
+
+Run with: python -m benchmarks.load_test_async
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ["ROUTER_LOG_ENABLED"] = "false"
+
+from src.fake_openai import start_fake_openai
+from config import Config
+
+Config.LLM_MAX_CONNECTIONS = 100
+Config.LLM_MAX_KEEPALIVE_CONNECTIONS = 100
+
+from src.agents.injury_agent import arun_injury_agent, run_injury_agent
+
+USERS = 100
+WORKER_THREADS = 40
+LLM_LATENCY = 1.0
+
+
+def run_threads() -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKER_THREADS) as pool:
+        list(pool.map(run_injury_agent, [f"my knee hurts #{i}" for i in range(USERS)]))
+    return time.perf_counter() - start
+
+
+async def run_async() -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(arun_injury_agent(f"my knee hurts #{i}") for i in range(USERS))
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    server = start_fake_openai(latency=LLM_LATENCY)
+    Config.OPENAI_BASE_URL = server.base_url
+
+    print(
+        f"{USERS} concurrent users, {LLM_LATENCY * 1000:.0f} ms LLM latency, "
+        f"{WORKER_THREADS} worker threads for the sync API"
+    )
+    for label, elapsed in [
+        ("sync, thread pool", run_threads()),
+        ("async, event loop", asyncio.run(run_async())),
+    ]:
+        print(f"  {label:<18} {elapsed:6.2f} s  {USERS / elapsed:7.1f} req/s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
 import os
+from pathlib import Path
+from typing import Optional
+
+# Relative paths in the configuration resolve against the project root, so
+# the app works no matter which directory it is launched from
+PROJECT_ROOT = Path(__file__).resolve().parent
 
 
 class Config:
@@ -6,19 +12,187 @@ class Config:
 
     # OpenAI Configuration
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o")
     OPENAI_TEMPERATURE: float = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
     OPENAI_MAX_TOKENS: int = int(os.getenv("OPENAI_MAX_TOKENS", "1000"))
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
+
+    # LLM HTTP connection pool Configuration
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10")
+    )
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+    # LLM resilience Configuration
+    # Deadline in seconds for a whole call, including retries
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "60"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    # The breaker opens when LLM_BREAKER_ERROR_RATE of the last
+    # LLM_BREAKER_WINDOW calls failed (once at least LLM_BREAKER_MIN_CALLS
+    # were made), and tries again after LLM_BREAKER_COOLDOWN seconds
+    LLM_BREAKER_WINDOW: int = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+    LLM_BREAKER_MIN_CALLS: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+    LLM_BREAKER_ERROR_RATE: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    LLM_BREAKER_COOLDOWN: float = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+    # LLM model tiering Configuration (see src/model_policy.py)
+    # Model per agent, e.g. "router=gpt-4o-mini,game_plan=gpt-4o"; agents
+    # not listed use OPENAI_MODEL
+    LLM_MODELS: str = os.getenv(
+        "LLM_MODELS",
+        "router=gpt-4o-mini,coach-video=gpt-4o-mini,rag=gpt-4o-mini,game_plan=gpt-4o",
+    )
+    # Cheaper model to use while a model is under pressure, e.g. "gpt-4o=gpt-4o-mini"
+    LLM_FALLBACK_MODELS: str = os.getenv("LLM_FALLBACK_MODELS", "gpt-4o=gpt-4o-mini")
+    # Fall back when a model's recent latency is above this; 0 disables
+    LLM_FALLBACK_LATENCY_MS: float = float(os.getenv("LLM_FALLBACK_LATENCY_MS", "0"))
+    # Fall back when the estimated spend over the last hour is above this; 0 disables
+    LLM_HOURLY_BUDGET_USD: float = float(os.getenv("LLM_HOURLY_BUDGET_USD", "0"))
+    # Seconds before a model that was too slow is tried again
+    LLM_FALLBACK_COOLDOWN: float = float(os.getenv("LLM_FALLBACK_COOLDOWN", "60"))
+
+    # LLM batch Configuration
+    LLM_BATCH_WORKERS: int = int(os.getenv("LLM_BATCH_WORKERS", "8"))
+    # Provider rate limits shared by batched calls; 0 disables a limit
+    LLM_RATE_LIMIT_RPM: float = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+    LLM_RATE_LIMIT_TPM: float = float(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+
+    # LLM response cache Configuration
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MEMORY_ENTRIES: int = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    LLM_CACHE_DEFAULT_TTL: int = int(os.getenv("LLM_CACHE_DEFAULT_TTL", "86400"))
+    # Per-agent TTLs in seconds, e.g. "router=604800,coach=86400"
+    LLM_CACHE_TTLS: str = os.getenv(
+        "LLM_CACHE_TTLS",
+        "router=604800,coach=86400,coach-video=604800,injury=86400,game_plan=86400",
+    )
+    # Share one response between identical cacheable calls made concurrently
+    LLM_SINGLE_FLIGHT_ENABLED: bool = (
+        os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    )
+
+    # Prompt token budgets
+    # Input tokens a prompt may use, including trimmable context like chat
+    # history and retrieved examples, e.g. "coach=4000,rag=6000"
+    LLM_INPUT_TOKEN_BUDGET: int = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "6000"))
+    LLM_INPUT_TOKEN_BUDGETS: str = os.getenv(
+        "LLM_INPUT_TOKEN_BUDGETS", "coach=4000,rag=6000"
+    )
+
+    # LLM metrics Configuration
+    LLM_METRICS_ENABLED: bool = (
+        os.getenv("LLM_METRICS_ENABLED", "true").lower() == "true"
+    )
+    # Seconds between writes of aggregated metrics to SQLite; 0 disables
+    LLM_METRICS_FLUSH_INTERVAL: float = float(
+        os.getenv("LLM_METRICS_FLUSH_INTERVAL", "60")
+    )
+    # USD per million input/output/cached input tokens, e.g. "gpt-4o=2.5/10/1.25"
+    LLM_PRICES: str = os.getenv(
+        "LLM_PRICES",
+        "gpt-4o=2.5/10/1.25,gpt-4o-mini=0.15/0.6/0.075,gpt-4=30/60/30",
+    )
+
+    # Router Configuration
+    ROUTER_FAST_PATH_ENABLED: bool = (
+        os.getenv("ROUTER_FAST_PATH_ENABLED", "true").lower() == "true"
+    )
+    # Minimum keyword confidence (0-1) for skipping the LLM routing call
+    ROUTER_FAST_PATH_THRESHOLD: float = float(
+        os.getenv("ROUTER_FAST_PATH_THRESHOLD", "0.5")
+    )
+    ROUTER_MODEL_PATH: str = str(
+        PROJECT_ROOT / os.getenv("ROUTER_MODEL_PATH", "models/router_model.json")
+    )
+    # Minimum predicted probability for the trained router model to be used
+    ROUTER_MODEL_THRESHOLD: float = float(os.getenv("ROUTER_MODEL_THRESHOLD", "0.85"))
+    # Speculatively run the most likely agent while the LLM router decides.
+    # Lowers p50 latency at the cost of tokens spent on wrong guesses.
+    ROUTER_SPECULATION_ENABLED: bool = (
+        os.getenv("ROUTER_SPECULATION_ENABLED", "false").lower() == "true"
+    )
+    # Minimum local predictor confidence (0-1) before speculating
+    ROUTER_SPECULATION_MIN_CONFIDENCE: float = float(
+        os.getenv("ROUTER_SPECULATION_MIN_CONFIDENCE", "0.0")
+    )
+    ROUTER_SPECULATION_WORKERS: int = int(os.getenv("ROUTER_SPECULATION_WORKERS", "8"))
+    ROUTER_LOG_ENABLED: bool = os.getenv("ROUTER_LOG_ENABLED", "true").lower() == "true"
+    # Take the best local route instead of asking the LLM with less time left
+    ROUTER_LLM_MIN_SECONDS: float = float(os.getenv("ROUTER_LLM_MIN_SECONDS", "10"))
+
+    # Request deadline Configuration (see src/deadline.py)
+    # Seconds a chat request may take from routing to answer; 0 disables
+    REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "60"))
+    # Expected model speed, used to cap max_tokens to the time left
+    LLM_FIRST_TOKEN_SECONDS: float = float(os.getenv("LLM_FIRST_TOKEN_SECONDS", "1"))
+    LLM_OUTPUT_TOKENS_PER_SECOND: float = float(
+        os.getenv("LLM_OUTPUT_TOKENS_PER_SECOND", "50")
+    )
+    LLM_MIN_OUTPUT_TOKENS: int = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "128"))
+
+    # Fake OpenAI server Configuration (see src/fake_openai.py)
+    # Send every LLM call to an in-process fake API instead of OpenAI
+    FAKE_OPENAI_ENABLED: bool = (
+        os.getenv("FAKE_OPENAI_ENABLED", "false").lower() == "true"
+    )
+    FAKE_OPENAI_PORT: int = int(os.getenv("FAKE_OPENAI_PORT", "0"))
+    # Seconds, or a distribution like "lognormal:0.4:0.5"
+    FAKE_OPENAI_LATENCY: str = os.getenv("FAKE_OPENAI_LATENCY", "0")
+    FAKE_OPENAI_TOKENS_PER_SECOND: float = float(
+        os.getenv("FAKE_OPENAI_TOKENS_PER_SECOND", "0")
+    )
+    FAKE_OPENAI_ERROR_RATE: float = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+    FAKE_OPENAI_SEED: Optional[int] = (
+        int(os.getenv("FAKE_OPENAI_SEED")) if os.getenv("FAKE_OPENAI_SEED") else None
+    )
+
+    # LLM cassette Configuration (see src/llm_cassette.py)
+    # "record" appends every LLM call to the cassette, "replay" serves calls from it
+    LLM_CASSETTE_MODE: str = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+    LLM_CASSETTE_PATH: str = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl.gz")
+    # Wait the recorded latency when replaying, or answer immediately
+    LLM_CASSETTE_REPLAY_LATENCY: bool = (
+        os.getenv("LLM_CASSETTE_REPLAY_LATENCY", "true").lower() == "true"
+    )
 
     # Database Configuration
-    DATABASE_PATH: str = os.getenv("DATABASE_PATH", "bjj_app.db")
+    DATABASE_PATH: str = str(PROJECT_ROOT / os.getenv("DATABASE_PATH", "bjj_app.db"))
+    # Pooled connection settings (see src/db_pool.py)
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+    # Queue progress, game plan, evaluation and routing log inserts and write
+    # them in batches from a background thread (see src/db_writer.py)
+    DB_WRITE_BEHIND_ENABLED: bool = (
+        os.getenv("DB_WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    )
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv("DB_WRITE_BATCH_SIZE", "100"))
+    DB_WRITE_FLUSH_INTERVAL: float = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "1.0"))
+    DB_WRITE_MAX_PENDING: int = int(os.getenv("DB_WRITE_MAX_PENDING", "10000"))
+    # Cache student profiles in process (see src/profile_cache.py)
+    PROFILE_CACHE_ENABLED: bool = (
+        os.getenv("PROFILE_CACHE_ENABLED", "true").lower() == "true"
+    )
+    PROFILE_CACHE_SIZE: int = int(os.getenv("PROFILE_CACHE_SIZE", "1024"))
+    # How stale a profile saved by another process may be, in seconds
+    PROFILE_CACHE_CHECK_INTERVAL: float = float(
+        os.getenv("PROFILE_CACHE_CHECK_INTERVAL", "1.0")
+    )
 
     # App Configuration
     GRADIO_SERVER_NAME: str = os.getenv("GRADIO_SERVER_NAME", "0.0.0.0")
     GRADIO_SERVER_PORT: int = int(os.getenv("GRADIO_SERVER_PORT", "7861"))
 
     # Prompt Configuration
-    PROMPTS_DIR: str = "prompts"
+    PROMPTS_DIR: str = str(PROJECT_ROOT / os.getenv("PROMPTS_DIR", "prompts"))
+    # Re-read prompt files when they change on disk (for development)
+    PROMPTS_HOT_RELOAD: bool = (
+        os.getenv("PROMPTS_HOT_RELOAD", "false").lower() == "true"
+    )
 
     @classmethod
     def validate(cls) -> bool:
@@ -30,6 +204,52 @@ class Config:
             return False
         return True
 
+    @classmethod
+    def get_cache_ttl(cls, agent: str) -> int:
+        """Get the response cache TTL in seconds for an agent"""
+        for entry in cls.LLM_CACHE_TTLS.split(","):
+            name, _, ttl = entry.partition("=")
+            if name.strip() == agent and ttl.strip():
+                return int(ttl)
+        return cls.LLM_CACHE_DEFAULT_TTL
+
+    @classmethod
+    def get_model(cls, agent: str) -> str:
+        """Get the model an agent calls"""
+        for entry in cls.LLM_MODELS.split(","):
+            name, _, model = entry.partition("=")
+            if name.strip() == agent and model.strip():
+                return model.strip()
+        return cls.OPENAI_MODEL
+
+    @classmethod
+    def get_fallback_model(cls, model: str) -> Optional[str]:
+        """Get the cheaper model to use while a model is under pressure"""
+        for entry in cls.LLM_FALLBACK_MODELS.split(","):
+            name, _, fallback = entry.partition("=")
+            if name.strip() == model and fallback.strip():
+                return fallback.strip()
+        return None
+
+    @classmethod
+    def get_input_token_budget(cls, agent: str) -> int:
+        """Get the prompt input token budget for an agent"""
+        for entry in cls.LLM_INPUT_TOKEN_BUDGETS.split(","):
+            name, _, budget = entry.partition("=")
+            if name.strip() == agent and budget.strip():
+                return int(budget)
+        return cls.LLM_INPUT_TOKEN_BUDGET
+
+    @classmethod
+    def get_llm_prices(cls, model: str) -> Optional[tuple[float, float, float]]:
+        """Get the (input, output, cached input) USD prices per million tokens"""
+        for entry in cls.LLM_PRICES.split(","):
+            name, _, prices = entry.partition("=")
+            if name.strip() == model and prices.strip():
+                input_price, output_price, cached_price = prices.split("/")
+                return float(input_price), float(output_price), float(cached_price)
+        return None
+
     @classmethod
     def get_openai_config(cls) -> dict:
         """Get OpenAI configuration as a dictionary"""
@@ -1,17 +1,48 @@
 import streamlit as st
-from src.agents.router_agent import run_router
+from src.agents.router_agent import stream_router
 from src.agents.coach_agent import run_coach_agent_with_tools
 from src.agents.game_plan_agent import run_game_plan_agent
 from src.agents.injury_agent import run_injury_agent
+from src.agents.graph_registry import warm_up_graphs
+from src.router_model import get_router_model
+from src.prompt_registry import validate_prompts
+from src.llm_metrics import get_llm_metrics_summary
 from src.database import (
+    get_table_columns,
+    init_database,
+    read_page,
     save_student_profile,
-    view_all_rows,
 )
 from src.user_guide import USER_GUIDE_CONTENT
 
 st.set_page_config(page_title="BJJ AI Agents", layout="wide")
+
+
+@st.cache_resource
+def start_up() -> None:
+    # Create tables, then compile all agent graphs and prompts and load the
+    # router model once per process, not on every rerun or the first request
+    init_database()
+    warm_up_graphs()
+    validate_prompts()
+    get_router_model()
+
+
+start_up()
+
 st.title("🥋 BJJ AI Agents System")
 
+AGENT_LABELS = {
+    "coach": "👨‍🏫 Coach Agent",
+    "game_plan": "📋 Game Plan Agent",
+    "injury": "🏥 Injury Agent",
+}
+
+VIEWER_TABLES = ["students", "progress_tracking", "game_plans", "evaluation_results"]
+VIEWER_PAGE_SIZE = 50
+# Long prompts and responses are cut to this many characters in the viewer
+VIEWER_MAX_CHARS = 500
+
 # --- Sidebar: User Guide ---
 with st.sidebar:
     st.markdown("## 📖 User Guide & Help")
@@ -54,11 +85,25 @@ with tabs[0]:
             "Type your message and press Enter", key="ai_chat_input"
         )
         if st.button("Send", key="ai_chat_send") and user_input.strip():
+            history = list(st.session_state.chat_history)
             st.session_state.chat_history.append(
                 {"role": "user", "content": user_input}
             )
-            # Route to the correct agent
-            agent_response = run_router(user_input)
+            # Route to the correct agent, showing its answer as it streams in
+            events = stream_router(user_input, history, st.session_state.profile)
+            agent_label = st.empty()
+            agent_label.caption("⏳ Routing...")
+
+            def response_tokens():
+                for kind, text in events:
+                    if kind == "agent":
+                        agent_label.caption(
+                            f"**Agent:** {AGENT_LABELS.get(text, text)}"
+                        )
+                    else:
+                        yield text
+
+            agent_response = st.write_stream(response_tokens())
             st.session_state.chat_history.append(
                 {"role": "assistant", "content": agent_response}
             )
@@ -140,12 +185,60 @@ with tabs[4]:
 # --- Database Viewer Tab ---
 with tabs[5]:
     st.subheader("🔍 View Database Tables")
-    table = st.selectbox(
-        "Select Table", ["students", "progress_tracking", "game_plans"]
+    table = st.selectbox("Select Table", VIEWER_TABLES)
+    table_columns = list(get_table_columns(table))
+    columns = st.multiselect("Columns", table_columns, default=table_columns)
+    filter_col, value_col, sort_col = st.columns(3)
+    filter_column = filter_col.selectbox("Filter by", ["(none)"] + table_columns)
+    filter_value = value_col.text_input("Equal to")
+    order_by = sort_col.selectbox("Sort by", table_columns)
+    descending = st.checkbox("Descending")
+    filters = (
+        {filter_column: filter_value}
+        if filter_column != "(none)" and filter_value
+        else None
     )
+
+    # Keep the key each page starts after, so Previous can go back; any
+    # change to the view starts again from the first page
+    view = (table, tuple(columns), filter_column, filter_value, order_by, descending)
+    if st.session_state.get("db_view") != view:
+        st.session_state.db_view = view
+        st.session_state.db_pages = [None]
     if st.button("View Table"):
-        data = view_all_rows(table)
-        st.dataframe(data)
+        st.session_state.db_viewing = True
+        st.session_state.db_page = None
+
+    # Streamlit reruns this script on every click in the app, so a page is
+    # only read when it changes, not on each rerun
+    if st.session_state.get("db_viewing"):
+        pages = st.session_state.db_pages
+        page_key = (view, pages[-1])
+        page = st.session_state.get("db_page")
+        if page is None or page[0] != page_key:
+            rows, next_after = read_page(
+                table,
+                columns or None,
+                filters,
+                order_by,
+                descending,
+                after=pages[-1],
+                limit=VIEWER_PAGE_SIZE,
+                max_chars=VIEWER_MAX_CHARS,
+            )
+            page = st.session_state.db_page = (page_key, rows, next_after)
+        _, rows, next_after = page
+        st.dataframe(rows)
+        prev_col, page_col, next_col = st.columns(3)
+        page_col.caption(f"Page {len(pages)}")
+        if prev_col.button("Previous page", disabled=len(pages) == 1):
+            pages.pop()
+            st.rerun()
+        if next_col.button("Next page", disabled=next_after is None):
+            pages.append(next_after)
+            st.rerun()
+    if st.button("View LLM Usage"):
+        st.text(get_llm_metrics_summary())
 
 # --- Training Examples Tab ---
 with tabs[6]:
@@ -1,15 +1,34 @@
+import asyncio
 import re
-from typing import Tuple
+from typing import Any, AsyncIterator, Iterator, Optional, Tuple
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
-from src.llm_utils import load_prompt, use_llm_clean
-from src.database import save_data_to_sqlite
+from src.llm_utils import load_prompt, load_template
+from src.database import save_later
+from src.agents.graph_registry import get_graph, register_graph
+from src.prompt_template import register_prompt
+from src.token_budget import ContextSection, budget_context
+from src.agents.streaming import (
+    agenerate,
+    astream_graph_tokens,
+    emit,
+    generate,
+    stream_graph_tokens,
+)
+
+
+# Words that make the coach record progress in the database
+TRACKING_KEYWORDS = ["track", "progress", "learning", "practicing"]
 
 
 class CoachInput(BaseModel):
     message: str
     personality: str = "james"  # Default personality
+    # Earlier chat messages as {"role": "user" | "assistant", "content": ...}
+    history: list[dict[str, str]] = []
+    profile: dict[str, Any] = {}
 
 
 class CoachOutput(BaseModel):
@@ -19,87 +38,222 @@ class CoachOutput(BaseModel):
 class CoachState(BaseModel):
     input: CoachInput
     output: CoachOutput = CoachOutput(response="")
+    stream: bool = False
+    # time.monotonic() by which the request must be answered (see src.deadline)
+    deadline: Optional[float] = None
 
 
 def load_personality_prompt(personality: str) -> str:
     """Load a personality prompt from the personalities directory"""
     try:
-        personality_path = f"prompts/personalities/{personality}.txt"
-        with open(personality_path, "r", encoding="utf-8") as f:
-            return f.read().strip()
+        return load_prompt(f"personalities/{personality}").strip()
     except FileNotFoundError:
         # Return default personality if file not found
         return load_prompt("personalities/james")
 
 
-def coach_node(state: CoachState) -> CoachState:
-    """Coach agent node that processes user input"""
-    try:
-        # Load the personality prompt
-        personality_prompt = load_personality_prompt(state.input.personality)
+register_prompt("coach_prompt_template", ["personality", "context", "message"])
+
+HISTORY_ROLES = {"user": "Student", "assistant": "Coach"}
+
+
+def build_coach_context(
+    history: list[dict[str, str]], profile: dict[str, Any]
+) -> list[ContextSection]:
+    """Turn the student profile and chat history into trimmable prompt sections"""
+    profile_items = [
+        f"{field.replace('_', ' ')}: {value}"
+        for field, value in profile.items()
+        if value not in (None, "")
+    ]
+    history_items = [
+        f"{HISTORY_ROLES.get(turn.get('role'), 'Student')}: {turn.get('content', '')}"
+        for turn in history
+        if turn.get("content")
+    ]
+    # The profile comes first, so it is the last thing to be trimmed
+    return [
+        ContextSection(name="profile", title="Student profile", items=profile_items),
+        ContextSection(
+            name="history",
+            title="Conversation so far",
+            items=history_items,
+            keep="last",
+        ),
+    ]
 
-        # Load the base coach prompt
-        coach_prompt = load_prompt("coach_prompt_template")
 
-        # Combine personality and coach prompt
-        combined_prompt = f"""
-{personality_prompt}
+def build_coach_prompt(
+    message: str,
+    personality: str,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+) -> tuple[str, str]:
+    """Build the (system, user) coach messages in the given personality.
 
-{coach_prompt}
+    The student profile and chat history are trimmed to the coach's input
+    token budget, keeping the profile and the most recent turns.
+    """
+    # The personality goes in the system message, which stays the same for
+    # every message to that coach
+    template = load_template("coach_prompt_template")
+    values = {"personality": load_personality_prompt(personality), "message": message}
+    system, user = template.render(values, context="")
+    if not history and not profile:
+        return system, user
 
-User Input: {state.input.message}
+    context = budget_context(
+        "coach", build_coach_context(history or [], profile or {}), [system, user]
+    )
+    return template.render(values, context=context.render())
 
-Please respond in character as the coach with the personality described above.
-"""
+
+def coach_node(state: CoachState) -> CoachState:
+    """Coach agent node that processes user input"""
+    try:
+        system, prompt = build_coach_prompt(
+            state.input.message,
+            state.input.personality,
+            state.input.history,
+            state.input.profile,
+        )
 
         # Get response from LLM
-        response = use_llm_clean(combined_prompt)
+        response = generate(
+            prompt, state.stream, state.deadline, agent="coach", system=system
+        )
 
         # Update state
         state.output = CoachOutput(response=response)
         return state
     except Exception as e:
         state.output = CoachOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
+        return state
+
+
+async def acoach_node(state: CoachState) -> CoachState:
+    """Async coach agent node that processes user input"""
+    try:
+        system, prompt = build_coach_prompt(
+            state.input.message,
+            state.input.personality,
+            state.input.history,
+            state.input.profile,
+        )
+        response = await agenerate(
+            prompt, state.stream, state.deadline, agent="coach", system=system
+        )
+        state.output = CoachOutput(response=response)
+        return state
+    except Exception as e:
+        state.output = CoachOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
         return state
 
 
 def build_coach_graph():
     """Build the coach agent graph"""
     workflow = StateGraph(CoachState)
-    workflow.add_node("coach", coach_node)
+    workflow.add_node("coach", RunnableLambda(coach_node, afunc=acoach_node))
     workflow.set_entry_point("coach")
     workflow.set_finish_point("coach")
     return workflow.compile()
 
 
-def run_coach_agent(user_input: str, personality: str = "james") -> str:
+register_graph("coach", build_coach_graph)
+
+
+def _extract_response(result) -> str:
+    """Get the coach response from a graph result"""
+    # Handle different result types
+    if hasattr(result, "output"):
+        # Result is a state object
+        return result.output.response
+    elif isinstance(result, dict) and "output" in result:
+        # Result is a dictionary
+        return result["output"].response
+    elif isinstance(result, dict) and "coach" in result:
+        # Result has coach node output
+        return result["coach"]["output"].response
+    else:
+        # Fallback - try to extract response from result
+        return str(result)
+
+
+def run_coach_agent(
+    user_input: str,
+    personality: str = "james",
+    stream: bool = False,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> str:
     """Run the coach agent with user input and personality"""
     try:
-        graph = build_coach_graph()
+        graph = get_graph("coach")
         # Initialize state with both input and output
         initial_state = CoachState(
-            input=CoachInput(message=user_input, personality=personality),
+            input=CoachInput(
+                message=user_input,
+                personality=personality,
+                history=history or [],
+                profile=profile or {},
+            ),
             output=CoachOutput(response=""),
+            stream=stream,
+            deadline=deadline,
         )
-        result = graph.invoke(initial_state)
-
-        # Handle different result types
-        if hasattr(result, "output"):
-            # Result is a state object
-            return result.output.response
-        elif isinstance(result, dict) and "output" in result:
-            # Result is a dictionary
-            return result["output"].response
-        elif isinstance(result, dict) and "coach" in result:
-            # Result has coach node output
-            return result["coach"]["output"].response
-        else:
-            # Fallback - try to extract response from result
-            return str(result)
+        return _extract_response(graph.invoke(initial_state))
     except Exception as e:
         return f"Error running coach agent: {str(e)}"
 
 
+async def arun_coach_agent(
+    user_input: str,
+    personality: str = "james",
+    stream: bool = False,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> str:
+    """Run the coach agent without blocking a worker thread"""
+    try:
+        graph = get_graph("coach")
+        initial_state = CoachState(
+            input=CoachInput(
+                message=user_input,
+                personality=personality,
+                history=history or [],
+                profile=profile or {},
+            ),
+            output=CoachOutput(response=""),
+            stream=stream,
+            deadline=deadline,
+        )
+        return _extract_response(await graph.ainvoke(initial_state))
+    except Exception as e:
+        return f"Error running coach agent: {str(e)}"
+
+
+def stream_coach_agent(user_input: str, personality: str = "james") -> Iterator[str]:
+    """Run the coach agent, yielding response tokens as they are generated"""
+    initial_state = CoachState(
+        input=CoachInput(message=user_input, personality=personality), stream=True
+    )
+    return stream_graph_tokens(get_graph("coach"), initial_state)
+
+
+def astream_coach_agent(
+    user_input: str, personality: str = "james"
+) -> AsyncIterator[str]:
+    """Async version of stream_coach_agent"""
+    initial_state = CoachState(
+        input=CoachInput(message=user_input, personality=personality), stream=True
+    )
+    return astream_graph_tokens(get_graph("coach"), initial_state)
+
+
 def parse_tracking_input(user_input: str) -> Tuple[str, str, str]:
     """Parse user input for progress tracking"""
     # Simple parsing - can be enhanced
@@ -146,25 +300,47 @@ def parse_tracking_input(user_input: str) -> Tuple[str, str, str]:
     return technique, level, notes
 
 
-def retrieve_technique_video(query: str) -> str:
+VIDEO_SYSTEM_PROMPT = """Provide information about BJJ techniques that would be helpful for the user's query.
+Include:
+1. Technique name and description
+2. Key points to remember
+3. Common mistakes to avoid
+4. Suggested video resources (if available)"""
+
+
+def build_video_prompt(query: str) -> tuple[str, str]:
+    """Build the (system, user) technique video lookup messages"""
+    # This would integrate with a video database
+    # For now, return a placeholder response
+    return VIDEO_SYSTEM_PROMPT, f'Query: "{query}"'
+
+
+def retrieve_technique_video(
+    query: str, stream: bool = False, deadline: Optional[float] = None
+) -> str:
     """Retrieve technique video information"""
     try:
-        # This would integrate with a video database
-        # For now, return a placeholder response
-        video_prompt = f"""
-        Based on the query: "{query}"
-        
-        Provide information about BJJ techniques that would be helpful.
-        Include:
-        1. Technique name and description
-        2. Key points to remember
-        3. Common mistakes to avoid
-        4. Suggested video resources (if available)
-        """
-
-        return use_llm_clean(video_prompt)
+        system, prompt = build_video_prompt(query)
+        return generate(prompt, stream, deadline, agent="coach-video", system=system)
     except Exception as e:
-        return f"Error retrieving video: {str(e)}"
+        message = f"Error retrieving video: {str(e)}"
+        emit(message, stream)
+        return message
+
+
+async def aretrieve_technique_video(
+    query: str, stream: bool = False, deadline: Optional[float] = None
+) -> str:
+    """Async version of retrieve_technique_video"""
+    try:
+        system, prompt = build_video_prompt(query)
+        return await agenerate(
+            prompt, stream, deadline, agent="coach-video", system=system
+        )
+    except Exception as e:
+        message = f"Error retrieving video: {str(e)}"
+        emit(message, stream)
+        return message
 
 
 def track_student_progress(technique: str, level: str, notes: str = "") -> str:
@@ -178,7 +354,7 @@ def track_student_progress(technique: str, level: str, notes: str = "") -> str:
             "user_id": 1,  # Default user ID
         }
 
-        success = save_data_to_sqlite("progress_tracking", progress_data)
+        success = save_later("progress_tracking", progress_data)
 
         if success:
             return f"Progress tracked successfully!\nTechnique: {technique}\nLevel: {level}\nNotes: {notes}"
@@ -188,28 +364,41 @@ def track_student_progress(technique: str, level: str, notes: str = "") -> str:
         return f"Error tracking progress: {str(e)}"
 
 
+def select_coach_tool(message: str) -> str:
+    """Pick the coach tool for a message: "track", "video" or "" for none"""
+    user_input = message.lower()
+
+    # Check if user wants to track progress
+    if any(word in user_input for word in TRACKING_KEYWORDS):
+        technique, _, _ = parse_tracking_input(message)
+        if technique:
+            return "track"
+
+    # Check if user wants video information
+    if any(
+        word in user_input for word in ["video", "show me", "demonstrate", "how to"]
+    ):
+        return "video"
+
+    return ""
+
+
 def coach_node_with_tools(state: CoachState) -> CoachState:
     """Coach agent node with additional tools"""
     try:
-        user_input = state.input.message.lower()
+        tool = select_coach_tool(state.input.message)
 
-        # Check if user wants to track progress
-        if any(
-            word in user_input
-            for word in ["track", "progress", "learning", "practicing"]
-        ):
+        if tool == "track":
             technique, level, notes = parse_tracking_input(state.input.message)
+            progress_response = track_student_progress(technique, level, notes)
+            emit(progress_response, state.stream)
+            state.output = CoachOutput(response=progress_response)
+            return state
 
-            if technique:
-                progress_response = track_student_progress(technique, level, notes)
-                state.output = CoachOutput(response=progress_response)
-                return state
-
-        # Check if user wants video information
-        if any(
-            word in user_input for word in ["video", "show me", "demonstrate", "how to"]
-        ):
-            video_response = retrieve_technique_video(state.input.message)
+        if tool == "video":
+            video_response = retrieve_technique_video(
+                state.input.message, state.stream, state.deadline
+            )
             state.output = CoachOutput(response=video_response)
             return state
 
@@ -217,41 +406,122 @@ def coach_node_with_tools(state: CoachState) -> CoachState:
         return coach_node(state)
     except Exception as e:
         state.output = CoachOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
+        return state
+
+
+async def acoach_node_with_tools(state: CoachState) -> CoachState:
+    """Async coach agent node with additional tools"""
+    try:
+        tool = select_coach_tool(state.input.message)
+
+        if tool == "track":
+            technique, level, notes = parse_tracking_input(state.input.message)
+            progress_response = await asyncio.to_thread(
+                track_student_progress, technique, level, notes
+            )
+            emit(progress_response, state.stream)
+            state.output = CoachOutput(response=progress_response)
+            return state
+
+        if tool == "video":
+            video_response = await aretrieve_technique_video(
+                state.input.message, state.stream, state.deadline
+            )
+            state.output = CoachOutput(response=video_response)
+            return state
+
+        return await acoach_node(state)
+    except Exception as e:
+        state.output = CoachOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
         return state
 
 
 def build_coach_graph_with_tools():
     """Build the coach agent graph with tools"""
     workflow = StateGraph(CoachState)
-    workflow.add_node("coach", coach_node_with_tools)
+    workflow.add_node(
+        "coach", RunnableLambda(coach_node_with_tools, afunc=acoach_node_with_tools)
+    )
     workflow.set_entry_point("coach")
     workflow.set_finish_point("coach")
     return workflow.compile()
 
 
-def run_coach_agent_with_tools(user_input: str, personality: str = "james") -> str:
+register_graph("coach_with_tools", build_coach_graph_with_tools)
+
+
+def run_coach_agent_with_tools(
+    user_input: str,
+    personality: str = "james",
+    stream: bool = False,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> str:
     """Run the coach agent with tools"""
     try:
-        graph = build_coach_graph_with_tools()
+        graph = get_graph("coach_with_tools")
         # Initialize state with both input and output
         initial_state = CoachState(
-            input=CoachInput(message=user_input, personality=personality),
+            input=CoachInput(
+                message=user_input,
+                personality=personality,
+                history=history or [],
+                profile=profile or {},
+            ),
             output=CoachOutput(response=""),
+            stream=stream,
+            deadline=deadline,
         )
-        result = graph.invoke(initial_state)
-
-        # Handle different result types
-        if hasattr(result, "output"):
-            # Result is a state object
-            return result.output.response
-        elif isinstance(result, dict) and "output" in result:
-            # Result is a dictionary
-            return result["output"].response
-        elif isinstance(result, dict) and "coach" in result:
-            # Result has coach node output
-            return result["coach"]["output"].response
-        else:
-            # Fallback - try to extract response from result
-            return str(result)
+        return _extract_response(graph.invoke(initial_state))
     except Exception as e:
         return f"Error running coach agent with tools: {str(e)}"
+
+
+async def arun_coach_agent_with_tools(
+    user_input: str,
+    personality: str = "james",
+    stream: bool = False,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> str:
+    """Run the coach agent with tools without blocking a worker thread"""
+    try:
+        graph = get_graph("coach_with_tools")
+        initial_state = CoachState(
+            input=CoachInput(
+                message=user_input,
+                personality=personality,
+                history=history or [],
+                profile=profile or {},
+            ),
+            output=CoachOutput(response=""),
+            stream=stream,
+            deadline=deadline,
+        )
+        return _extract_response(await graph.ainvoke(initial_state))
+    except Exception as e:
+        return f"Error running coach agent with tools: {str(e)}"
+
+
+def stream_coach_agent_with_tools(
+    user_input: str, personality: str = "james"
+) -> Iterator[str]:
+    """Run the coach agent with tools, yielding response tokens as they arrive"""
+    initial_state = CoachState(
+        input=CoachInput(message=user_input, personality=personality), stream=True
+    )
+    return stream_graph_tokens(get_graph("coach_with_tools"), initial_state)
+
+
+def astream_coach_agent_with_tools(
+    user_input: str, personality: str = "james"
+) -> AsyncIterator[str]:
+    """Async version of stream_coach_agent_with_tools"""
+    initial_state = CoachState(
+        input=CoachInput(message=user_input, personality=personality), stream=True
+    )
+    return astream_graph_tokens(get_graph("coach_with_tools"), initial_state)
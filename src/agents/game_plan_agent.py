@@ -1,10 +1,27 @@
 import re
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
-from src.llm_utils import load_prompt, use_llm_clean
-from src.database import save_data_to_sqlite, get_game_plans_by_user
+from src.llm_utils import (
+    BatchResult,
+    load_template,
+    use_llm_batch,
+    use_llm_clean,
+    use_llm_clean_async,
+)
+from src.database import save_later, get_game_plans_by_user
+from src.prompt_template import register_prompt
+from src.token_budget import ContextSection, budget_context
+from src.agents.graph_registry import get_graph, register_graph
+from src.agents.streaming import (
+    agenerate,
+    astream_graph_tokens,
+    emit,
+    generate,
+    stream_graph_tokens,
+)
 
 
 class GamePlanInput(BaseModel):
@@ -18,6 +35,9 @@ class GamePlanOutput(BaseModel):
 class GamePlanState(BaseModel):
     input: GamePlanInput
     output: GamePlanOutput = GamePlanOutput(response="")
+    stream: bool = False
+    # time.monotonic() by which the request must be answered (see src.deadline)
+    deadline: Optional[float] = None
 
 
 class TournamentInfo(BaseModel):
@@ -78,8 +98,9 @@ def extract_tournament_info(user_input: str) -> TournamentInfo:
     ]
 
     for pattern in weight_patterns:
-        if re.search(pattern, user_input_lower):
-            info.weight_class = pattern
+        match = re.search(pattern, user_input_lower)
+        if match:
+            info.weight_class = match.group(0)
             break
 
     # Extract opponent style
@@ -119,77 +140,180 @@ def get_missing_info_prompt(info: TournamentInfo) -> Optional[str]:
     return None
 
 
-def build_game_plan(info: TournamentInfo) -> str:
+register_prompt(
+    "game_plan_agent_prompt",
+    [
+        "division",
+        "weight_class",
+        "opponent_style",
+        "tournament_name",
+        "user_style",
+        "goals",
+        "gender",
+        "no_gi_level",
+    ],
+)
+
+
+def build_game_plan_prompt(info: TournamentInfo) -> tuple[str, str]:
+    """Build the (system, user) game plan messages from tournament information"""
+    return load_template("game_plan_agent_prompt").render(
+        division=info.division or "your division",
+        weight_class=info.weight_class or "your weight class",
+        opponent_style=info.opponent_style or "various styles",
+        tournament_name=info.tournament_name or "the tournament",
+        user_style=info.user_style or "your style",
+        goals=info.goals or "winning",
+        gender=info.gender or "your gender",
+        no_gi_level=info.no_gi_level or "your no-gi level",
+    )
+
+
+def build_game_plan(
+    info: TournamentInfo, stream: bool = False, deadline: Optional[float] = None
+) -> str:
     """Build a game plan based on tournament information"""
     try:
-        # Load the game plan prompt
-        game_plan_prompt = load_prompt("game_plan_agent_prompt")
-
-        # Format the prompt with tournament info
-        formatted_prompt = game_plan_prompt.format(
-            division=info.division or "your division",
-            weight_class=info.weight_class or "your weight class",
-            opponent_style=info.opponent_style or "various styles",
-            tournament_name=info.tournament_name or "the tournament",
-            user_style=info.user_style or "your style",
-            goals=info.goals or "winning",
-            gender=info.gender or "your gender",
-            no_gi_level=info.no_gi_level or "your no-gi level",
-        )
+        system, prompt = build_game_plan_prompt(info)
+        return generate(prompt, stream, deadline, agent="game_plan", system=system)
+    except Exception as e:
+        message = f"Error building game plan: {str(e)}"
+        emit(message, stream)
+        return message
 
-        return use_llm_clean(formatted_prompt)
+
+async def abuild_game_plan(
+    info: TournamentInfo, stream: bool = False, deadline: Optional[float] = None
+) -> str:
+    """Async version of build_game_plan"""
+    try:
+        system, prompt = build_game_plan_prompt(info)
+        return await agenerate(
+            prompt, stream, deadline, agent="game_plan", system=system
+        )
     except Exception as e:
-        return f"Error building game plan: {str(e)}"
+        message = f"Error building game plan: {str(e)}"
+        emit(message, stream)
+        return message
+
+
+def build_game_plans(infos: list[TournamentInfo]) -> BatchResult:
+    """Build game plans for many tournaments concurrently, in input order"""
+    messages = [build_game_plan_prompt(info) for info in infos]
+    # The system prompt is static, so every plan shares the cached prefix
+    system = messages[0][0] if messages else None
+    prompts = [prompt for _, prompt in messages]
+    return use_llm_batch(prompts, agent="game_plan", system=system)
+
+
+def _missing_info_response(user_input: str) -> tuple[TournamentInfo, Optional[str]]:
+    """Extract tournament info and a reply asking for anything missing"""
+    info = extract_tournament_info(user_input)
+    missing_prompt = get_missing_info_prompt(info)
+    if missing_prompt:
+        return info, f"I need more information to create a game plan. {missing_prompt}"
+    return info, None
 
 
 def game_plan_node(state: GamePlanState) -> GamePlanState:
     """Game plan agent node"""
     try:
-        user_input = state.input.message
-
-        # Extract tournament information
-        info = extract_tournament_info(user_input)
-
-        # Check for missing information
-        missing_prompt = get_missing_info_prompt(info)
-        if missing_prompt:
-            response = (
-                f"I need more information to create a game plan. {missing_prompt}"
-            )
-            state.output = GamePlanOutput(response=response)
+        info, missing_response = _missing_info_response(state.input.message)
+        if missing_response:
+            emit(missing_response, state.stream)
+            state.output = GamePlanOutput(response=missing_response)
             return state
 
         # Build the game plan
-        game_plan = build_game_plan(info)
+        game_plan = build_game_plan(info, state.stream, state.deadline)
+        state.output = GamePlanOutput(response=game_plan)
+        return state
+    except Exception as e:
+        state.output = GamePlanOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
+        return state
+
+
+async def agame_plan_node(state: GamePlanState) -> GamePlanState:
+    """Async game plan agent node"""
+    try:
+        info, missing_response = _missing_info_response(state.input.message)
+        if missing_response:
+            emit(missing_response, state.stream)
+            state.output = GamePlanOutput(response=missing_response)
+            return state
+
+        game_plan = await abuild_game_plan(info, state.stream, state.deadline)
         state.output = GamePlanOutput(response=game_plan)
         return state
     except Exception as e:
         state.output = GamePlanOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
         return state
 
 
 def build_game_plan_graph():
     """Build the game plan agent graph"""
     workflow = StateGraph(GamePlanState)
-    workflow.add_node("game_plan", game_plan_node)
+    workflow.add_node(
+        "game_plan", RunnableLambda(game_plan_node, afunc=agame_plan_node)
+    )
     workflow.set_entry_point("game_plan")
     workflow.set_finish_point("game_plan")
     return workflow.compile()
 
 
-def run_game_plan_agent(user_input: str) -> str:
+register_graph("game_plan", build_game_plan_graph)
+
+
+def run_game_plan_agent(
+    user_input: str, stream: bool = False, deadline: Optional[float] = None
+) -> str:
     """Run the game plan agent"""
     try:
-        graph = build_game_plan_graph()
+        graph = get_graph("game_plan")
         initial_state = GamePlanState(
-            input=GamePlanInput(message=user_input), output=GamePlanOutput(response="")
+            input=GamePlanInput(message=user_input),
+            output=GamePlanOutput(response=""),
+            stream=stream,
+            deadline=deadline,
         )
         result = graph.invoke(initial_state)
-        return result.output.response
+        return result["output"].response
     except Exception as e:
         return f"Error running game plan agent: {str(e)}"
 
 
+async def arun_game_plan_agent(
+    user_input: str, stream: bool = False, deadline: Optional[float] = None
+) -> str:
+    """Run the game plan agent without blocking a worker thread"""
+    try:
+        graph = get_graph("game_plan")
+        initial_state = GamePlanState(
+            input=GamePlanInput(message=user_input),
+            output=GamePlanOutput(response=""),
+            stream=stream,
+            deadline=deadline,
+        )
+        result = await graph.ainvoke(initial_state)
+        return result["output"].response
+    except Exception as e:
+        return f"Error running game plan agent: {str(e)}"
+
+
+def stream_game_plan_agent(user_input: str) -> Iterator[str]:
+    """Run the game plan agent, yielding response tokens as they are generated"""
+    initial_state = GamePlanState(input=GamePlanInput(message=user_input), stream=True)
+    return stream_graph_tokens(get_graph("game_plan"), initial_state)
+
+
+def astream_game_plan_agent(user_input: str) -> AsyncIterator[str]:
+    """Async version of stream_game_plan_agent"""
+    initial_state = GamePlanState(input=GamePlanInput(message=user_input), stream=True)
+    return astream_graph_tokens(get_graph("game_plan"), initial_state)
+
+
 # RAG-enhanced game plan agent
 class GamePlanStateRAG(BaseModel):
     input: GamePlanInput
@@ -207,19 +331,48 @@ def get_examples_by_age_belt(user_id: int, age: int, belt: str, limit: int = 1)
         return f"Error getting examples: {str(e)}"
 
 
+register_prompt(
+    "advanced/game_plan_agent_with_rag", ["examples", "user_input", "age", "belt"]
+)
+
+
+def build_rag_prompt(
+    user_input: str, age: int = 25, belt: str = "blue"
+) -> tuple[str, str]:
+    """Build the (system, user) RAG game plan messages with retrieved examples.
+
+    Examples are trimmed to the rag agent's input token budget, keeping the
+    best-ranked ones.
+    """
+    # Get context from database (simplified)
+    context = get_examples_by_age_belt(1, age, f"{belt} belt", 3)
+    examples = [example for example in context.split("\n\n") if example.strip()]
+
+    template = load_template("advanced/game_plan_agent_with_rag")
+    values = {"user_input": user_input, "age": age, "belt": belt}
+    system, user = template.render(values, examples="")
+    budgeted = budget_context(
+        "rag",
+        [ContextSection(name="examples", items=examples, separator="\n\n")],
+        [system, user],
+    )
+    return template.render(values, examples=budgeted.text("examples"))
+
+
 def run_game_plan_agent_rag(user_input: str) -> str:
     """Run the game plan agent with RAG"""
     try:
-        # Load the RAG-enhanced prompt
-        rag_prompt = load_prompt("advanced/game_plan_agent_with_rag")
-
-        # Get context from database (simplified)
-        context = get_examples_by_age_belt(1, 25, "blue belt", 3)
+        system, prompt = build_rag_prompt(user_input)
+        return use_llm_clean(prompt, agent="rag", system=system)
+    except Exception as e:
+        return f"Error running RAG game plan agent: {str(e)}"
 
-        # Format the prompt with context
-        formatted_prompt = rag_prompt.format(user_input=user_input, context=context)
 
-        return use_llm_clean(formatted_prompt)
+async def arun_game_plan_agent_rag(user_input: str) -> str:
+    """Run the game plan agent with RAG without blocking a worker thread"""
+    try:
+        system, prompt = build_rag_prompt(user_input)
+        return await use_llm_clean_async(prompt, agent="rag", system=system)
     except Exception as e:
         return f"Error running RAG game plan agent: {str(e)}"
 
@@ -236,7 +389,7 @@ def save_game_plan(user_id: int, info: TournamentInfo, plan: str):
             "game_plan": plan,
         }
 
-        return save_data_to_sqlite("game_plans", game_plan_data)
+        return save_later("game_plans", game_plan_data)
     except Exception as e:
         print(f"Error saving game plan: {e}")
         return False
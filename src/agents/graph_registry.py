@@ -0,0 +1,54 @@
+"""
+Registry of compiled agent graphs.
+
+Each agent registers its graph builder at import time. The graph is compiled
+once, on first use or during warm-up, and the compiled runnable is shared by
+every request since it holds no per-invocation state.
+"""
+
+import threading
+import time
+from typing import Any, Callable
+
+_builders: dict[str, Callable[[], Any]] = {}
+_graphs: dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def register_graph(name: str, builder: Callable[[], Any]) -> None:
+    """Register a builder that returns a compiled graph"""
+    with _lock:
+        _builders[name] = builder
+        _graphs.pop(name, None)
+
+
+def get_graph(name: str) -> Any:
+    """Get the compiled graph for name, compiling it on first use"""
+    graph = _graphs.get(name)
+    if graph is not None:
+        return graph
+
+    with _lock:
+        graph = _graphs.get(name)
+        if graph is None:
+            if name not in _builders:
+                raise KeyError(f"No graph registered under '{name}'")
+            graph = _builders[name]()
+            _graphs[name] = graph
+        return graph
+
+
+def warm_up_graphs() -> dict[str, float]:
+    """Compile every registered graph and return compile times in ms"""
+    timings = {}
+    for name in list(_builders):
+        start = time.perf_counter()
+        get_graph(name)
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def clear_graphs() -> None:
+    """Drop compiled graphs so they are rebuilt on next use"""
+    with _lock:
+        _graphs.clear()
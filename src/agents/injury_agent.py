@@ -1,6 +1,17 @@
+from typing import AsyncIterator, Iterator, Optional
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 from pydantic import BaseModel
-from src.llm_utils import load_prompt, use_llm_clean
+from src.llm_utils import load_template
+from src.prompt_template import register_prompt
+from src.agents.graph_registry import get_graph, register_graph
+from src.agents.streaming import (
+    agenerate,
+    astream_graph_tokens,
+    emit,
+    generate,
+    stream_graph_tokens,
+)
 
 
 class InjuryInput(BaseModel):
@@ -14,41 +25,106 @@ class InjuryOutput(BaseModel):
 class InjuryState(BaseModel):
     input: InjuryInput
     output: InjuryOutput = InjuryOutput(response="")
+    stream: bool = False
+    # time.monotonic() by which the request must be answered (see src.deadline)
+    deadline: Optional[float] = None
+
+
+register_prompt("injury_agent_prompt", ["user_input"])
+
+
+def build_injury_prompt(message: str) -> tuple[str, str]:
+    """Build the (system, user) injury agent messages for a user message"""
+    return load_template("injury_agent_prompt").render(user_input=message)
 
 
 def injury_node(state: InjuryState) -> InjuryState:
     """Injury agent node that processes user input"""
     try:
-        # Load the injury agent prompt
-        injury_prompt = load_prompt("injury_agent_prompt")
+        system, prompt = build_injury_prompt(state.input.message)
+
+        response = generate(
+            prompt, state.stream, state.deadline, agent="injury", system=system
+        )
+        state.output = InjuryOutput(response=response)
+        return state
+    except Exception as e:
+        state.output = InjuryOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
+        return state
 
-        formatted_prompt = injury_prompt.format(user_input=state.input.message)
 
-        response = use_llm_clean(formatted_prompt)
+async def ainjury_node(state: InjuryState) -> InjuryState:
+    """Async injury agent node that processes user input"""
+    try:
+        system, prompt = build_injury_prompt(state.input.message)
+
+        response = await agenerate(
+            prompt, state.stream, state.deadline, agent="injury", system=system
+        )
         state.output = InjuryOutput(response=response)
         return state
     except Exception as e:
         state.output = InjuryOutput(response=f"Error: {str(e)}")
+        emit(state.output.response, state.stream)
         return state
 
 
 def build_injury_graph():
     """Build the injury agent graph"""
     workflow = StateGraph(InjuryState)
-    workflow.add_node("injury", injury_node)
+    workflow.add_node("injury", RunnableLambda(injury_node, afunc=ainjury_node))
     workflow.set_entry_point("injury")
     workflow.set_finish_point("injury")
     return workflow.compile()
 
 
-def run_injury_agent(user_input: str) -> str:
+register_graph("injury", build_injury_graph)
+
+
+def run_injury_agent(
+    user_input: str, stream: bool = False, deadline: Optional[float] = None
+) -> str:
     """Run the injury agent with user input"""
     try:
-        graph = build_injury_graph()
+        graph = get_graph("injury")
         initial_state = InjuryState(
-            input=InjuryInput(message=user_input), output=InjuryOutput(response="")
+            input=InjuryInput(message=user_input),
+            output=InjuryOutput(response=""),
+            stream=stream,
+            deadline=deadline,
         )
         result = graph.invoke(initial_state)
-        return result.output.response
+        return result["output"].response
     except Exception as e:
         return f"Error running injury agent: {str(e)}"
+
+
+async def arun_injury_agent(
+    user_input: str, stream: bool = False, deadline: Optional[float] = None
+) -> str:
+    """Run the injury agent with user input without blocking a worker thread"""
+    try:
+        graph = get_graph("injury")
+        initial_state = InjuryState(
+            input=InjuryInput(message=user_input),
+            output=InjuryOutput(response=""),
+            stream=stream,
+            deadline=deadline,
+        )
+        result = await graph.ainvoke(initial_state)
+        return result["output"].response
+    except Exception as e:
+        return f"Error running injury agent: {str(e)}"
+
+
+def stream_injury_agent(user_input: str) -> Iterator[str]:
+    """Run the injury agent, yielding response tokens as they are generated"""
+    initial_state = InjuryState(input=InjuryInput(message=user_input), stream=True)
+    return stream_graph_tokens(get_graph("injury"), initial_state)
+
+
+def astream_injury_agent(user_input: str) -> AsyncIterator[str]:
+    """Async version of stream_injury_agent"""
+    initial_state = InjuryState(input=InjuryInput(message=user_input), stream=True)
+    return astream_graph_tokens(get_graph("injury"), initial_state)
@@ -1,10 +1,104 @@
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel
-from typing import Optional
-from src.llm_utils import load_prompt, use_llm_clean
-from src.agents.coach_agent import run_coach_agent_with_tools
-from src.agents.game_plan_agent import run_game_plan_agent
-from src.agents.injury_agent import run_injury_agent
+from typing import Any, AsyncIterator, Iterator, Optional, Tuple
+from config import Config
+from src.deadline import has_time, llm_budget, new_deadline
+from src.llm_metrics import track_llm_usage
+from src.llm_utils import load_template, use_llm_clean, use_llm_clean_async
+from src.prompt_template import register_prompt
+from src.database import save_later
+from src.router_model import get_router_model
+from src.agents.coach_agent import (
+    TRACKING_KEYWORDS,
+    arun_coach_agent_with_tools,
+    run_coach_agent_with_tools,
+)
+from src.agents.game_plan_agent import arun_game_plan_agent, run_game_plan_agent
+from src.agents.injury_agent import arun_injury_agent, run_injury_agent
+from src.agents.graph_registry import get_graph, register_graph
+from src.agents.streaming import (
+    astream_graph_events,
+    emit,
+    emit_agent,
+    stream_graph_events,
+)
+
+
+GAME_PLAN_KEYWORDS = [
+    "tournament",
+    "competition",
+    "game plan",
+    "strategy",
+    "division",
+    "weight class",
+    "opponent",
+    "match",
+]
+
+INJURY_KEYWORDS = [
+    "injury",
+    "pain",
+    "hurt",
+    "recovery",
+    "health",
+    "medical",
+    "doctor",
+    "treatment",
+    "rehab",
+]
+
+COACH_KEYWORDS = [
+    "technique",
+    "drill",
+    "escape",
+    "guard",
+    "sweep",
+    "submission",
+    "mount",
+    "armbar",
+    "choke",
+    "takedown",
+    "training",
+    "practice",
+    "learn",
+    "video",
+    "show me",
+    "how do i",
+    "progress",
+]
+
+
+def _keyword_pattern(keywords: list[str]) -> re.Pattern:
+    """Compile a pattern matching words that start with any of the keywords"""
+    return re.compile(
+        r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")"
+    )
+
+
+_ROUTE_PATTERNS = {
+    "game_plan": _keyword_pattern(GAME_PLAN_KEYWORDS),
+    "injury": _keyword_pattern(INJURY_KEYWORDS),
+    "coach": _keyword_pattern(COACH_KEYWORDS),
+}
+
+_route_stats = {"fast_path": 0, "model": 0, "llm": 0, "deadline": 0}
+_route_stats_lock = threading.Lock()
+
+_speculation_stats = {
+    "speculations": 0,
+    "hits": 0,
+    "misses": 0,
+    "cancelled": 0,
+    "wasted_tokens": 0,
+}
+_speculation_stats_lock = threading.Lock()
+_speculation_executor: Optional[ThreadPoolExecutor] = None
 
 
 class TournamentInfo(BaseModel):
@@ -19,30 +113,67 @@ class SharedState(BaseModel):
     output: str = ""
     agent_type: str = ""
     router: str = ""
+    speculated: bool = False
+    stream: bool = False
     tournament_info: Optional[TournamentInfo] = None
+    # Earlier chat messages and the student profile, used as coach context
+    history: list[dict[str, str]] = []
+    profile: dict[str, Any] = {}
+    # time.monotonic() by which the request must be answered (see src.deadline)
+    deadline: Optional[float] = None
+    # time.perf_counter() when the route was decided, if the router node
+    # went on to wait for a speculative answer
+    routed_at: Optional[float] = None
+
+
+register_prompt("router_prompt", ["user_input"])
+
+
+def build_router_prompt(user_input: str) -> tuple[str, str]:
+    """Build the (system, user) routing messages for a user message"""
+    return load_template("router_prompt").render(user_input=user_input)
+
+
+def parse_router_response(response: str) -> str:
+    """Map the router LLM's answer to an agent name"""
+    # Parse the response to determine agent type
+    response_lower = response.lower()
+
+    if "coach" in response_lower:
+        return "coach"
+    elif "game_plan" in response_lower or "tournament" in response_lower:
+        return "game_plan"
+    elif "injury" in response_lower or "health" in response_lower:
+        return "injury"
+    else:
+        return "coach"  # Default to coach
 
 
 def llm_router(state: SharedState) -> SharedState:
     """Use LLM to determine which agent should handle the query"""
     try:
-        router_prompt = load_prompt("router_prompt")
-
-        formatted_prompt = router_prompt.format(user_input=state.input)
+        system, prompt = build_router_prompt(state.input)
 
-        response = use_llm_clean(formatted_prompt)
+        response = use_llm_clean(
+            prompt, agent="router", system=system, **llm_budget(state.deadline)
+        )
 
-        # Parse the response to determine agent type
-        response_lower = response.lower()
+        state.router = parse_router_response(response)
+        return state
+    except Exception as e:
+        print(f"Error in router: {e}")
+        state.router = "coach"
+        return state
 
-        if "coach" in response_lower:
-            state.router = "coach"
-        elif "game_plan" in response_lower or "tournament" in response_lower:
-            state.router = "game_plan"
-        elif "injury" in response_lower or "health" in response_lower:
-            state.router = "injury"
-        else:
-            state.router = "coach"  # Default to coach
 
+async def allm_router(state: SharedState) -> SharedState:
+    """Async version of llm_router"""
+    try:
+        system, prompt = build_router_prompt(state.input)
+        response = await use_llm_clean_async(
+            prompt, agent="router", system=system, **llm_budget(state.deadline)
+        )
+        state.router = parse_router_response(response)
         return state
     except Exception as e:
         print(f"Error in router: {e}")
@@ -50,11 +181,278 @@ def llm_router(state: SharedState) -> SharedState:
         return state
 
 
+def keyword_route(user_input: str) -> tuple[str, float]:
+    """Score a query against the agent keyword sets.
+
+    Returns the best matching agent and a confidence between 0 and 1: the
+    best agent's margin over the runner-up, damped when there is little
+    evidence. Queries without any keyword hits get a confidence of 0.
+    """
+    text = user_input.lower()
+    scores = {
+        agent: len(pattern.findall(text)) for agent, pattern in _ROUTE_PATTERNS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_agent, best), (_, runner_up) = ranked[0], ranked[1]
+    if best == 0:
+        return "coach", 0.0
+    return best_agent, (best - runner_up) / (best + 1)
+
+
+def _record_route(state: SharedState, source: str, started: float) -> None:
+    """Count a routing decision and log it as training data for the router model.
+
+    latency_ms is the time to decide the route; total_ms also includes any
+    wait for a speculative agent answer.
+    """
+    with _route_stats_lock:
+        _route_stats[source] += 1
+
+    if Config.ROUTER_LOG_ENABLED:
+        finished = time.perf_counter()
+        save_later(
+            "routing_log",
+            {
+                "input_text": state.input,
+                "agent_type": state.router,
+                "source": source,
+                "latency_ms": ((state.routed_at or finished) - started) * 1000,
+                "total_ms": (finished - started) * 1000,
+            },
+        )
+
+
+def get_router_stats() -> dict[str, float]:
+    """Get counters for how queries were routed"""
+    with _route_stats_lock:
+        stats = dict(_route_stats)
+    total = sum(stats.values())
+    stats["fast_path_rate"] = stats["fast_path"] / total if total else 0.0
+    stats["local_rate"] = (
+        (stats["fast_path"] + stats["model"] + stats["deadline"]) / total
+        if total
+        else 0.0
+    )
+    return stats
+
+
+def predict_route(user_input: str) -> tuple[str, float]:
+    """Get the best local guess for the agent, without calling the LLM"""
+    agent, confidence = keyword_route(user_input)
+    model = get_router_model()
+    if model is not None:
+        model_agent, probability = model.predict(user_input)
+        if probability > confidence:
+            return model_agent, probability
+    return agent, confidence
+
+
+def _count_speculation(name: str, amount: int = 1) -> None:
+    with _speculation_stats_lock:
+        _speculation_stats[name] += amount
+
+
+def get_speculation_stats() -> dict[str, float]:
+    """Get speculation counters, hit rate and wasted tokens"""
+    with _speculation_stats_lock:
+        stats = dict(_speculation_stats)
+    decided = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / decided if decided else 0.0
+    return stats
+
+
+def _get_speculation_executor() -> ThreadPoolExecutor:
+    global _speculation_executor
+    with _speculation_stats_lock:
+        if _speculation_executor is None:
+            _speculation_executor = ThreadPoolExecutor(
+                max_workers=Config.ROUTER_SPECULATION_WORKERS,
+                thread_name_prefix="router-speculation",
+            )
+        return _speculation_executor
+
+
+def _speculate(node, state: SharedState) -> tuple[SharedState, dict[str, int]]:
+    """Run an agent node on a guess, returning its result and LLM usage"""
+    with track_llm_usage() as usage:
+        return node(state), usage
+
+
+async def _aspeculate(anode, state: SharedState) -> tuple[SharedState, dict[str, int]]:
+    """Async version of _speculate"""
+    with track_llm_usage() as usage:
+        return await anode(state), usage
+
+
+def _count_waste(usage: dict[str, int]) -> None:
+    """Count the tokens a discarded guess was billed for"""
+    _count_speculation(
+        "wasted_tokens", usage["prompt_tokens"] + usage["completion_tokens"]
+    )
+
+
+def _discard_speculation(future: Future) -> None:
+    """Cancel a wrong guess, or count its tokens as wasted once it finishes"""
+    if future.cancel():
+        _count_speculation("cancelled")
+        return
+
+    def count_waste(done: Future) -> None:
+        if done.exception() is None:
+            _count_waste(done.result()[1])
+
+    future.add_done_callback(count_waste)
+
+
+def _should_speculate(state: SharedState) -> Optional[str]:
+    """Get the agent to speculatively run while routing, if any"""
+    guess, confidence = predict_route(state.input)
+    side_effects = guess == "coach" and any(
+        word in state.input.lower() for word in TRACKING_KEYWORDS
+    )
+    if confidence < Config.ROUTER_SPECULATION_MIN_CONFIDENCE or side_effects:
+        return None
+    return guess
+
+
+def _commit_speculation(state: SharedState, result: SharedState) -> SharedState:
+    _count_speculation("hits")
+    state.output = result.output
+    state.agent_type = result.agent_type
+    state.speculated = True
+    # The guess ran without streaming, so its finished answer goes out whole
+    emit_agent(state.router, state.stream)
+    emit(state.output, state.stream)
+    return state
+
+
+def speculative_router(state: SharedState) -> SharedState:
+    """Run the LLM router while speculatively answering with the likely agent.
+
+    If the router agrees with the local guess the speculative answer is
+    committed and the agent node is skipped; otherwise it is discarded and
+    the routed agent runs as usual.
+    """
+    guess = _should_speculate(state)
+    if guess is None:
+        return llm_router(state)
+
+    _count_speculation("speculations")
+    future = _get_speculation_executor().submit(
+        _speculate, AGENT_NODES[guess], state.model_copy(update={"stream": False})
+    )
+    state = llm_router(state)
+    state.routed_at = time.perf_counter()
+
+    if state.router != guess:
+        _count_speculation("misses")
+        _discard_speculation(future)
+        return state
+
+    result, _ = future.result()
+    return _commit_speculation(state, result)
+
+
+async def aspeculative_router(state: SharedState) -> SharedState:
+    """Async version of speculative_router that cancels wrong guesses outright"""
+    guess = _should_speculate(state)
+    if guess is None:
+        return await allm_router(state)
+
+    _count_speculation("speculations")
+    task = asyncio.create_task(
+        _aspeculate(AGENT_ANODES[guess], state.model_copy(update={"stream": False}))
+    )
+    state = await allm_router(state)
+    state.routed_at = time.perf_counter()
+
+    if state.router != guess:
+        _count_speculation("misses")
+        if task.cancel():
+            _count_speculation("cancelled")
+        elif task.exception() is None:
+            # It finished before the router did
+            _count_waste(task.result()[1])
+        return state
+
+    result, _ = await task
+    return _commit_speculation(state, result)
+
+
+def local_route(state: SharedState) -> Optional[str]:
+    """Route without the LLM when confident, returning the source used.
+
+    With too little time left before the request deadline to ask the LLM,
+    the best local guess is taken however confident it is.
+    """
+    if Config.ROUTER_FAST_PATH_ENABLED:
+        agent, confidence = keyword_route(state.input)
+        if confidence >= Config.ROUTER_FAST_PATH_THRESHOLD:
+            state.router = agent
+            return "fast_path"
+
+    model = get_router_model()
+    if model is not None:
+        agent, probability = model.predict(state.input)
+        if probability >= Config.ROUTER_MODEL_THRESHOLD:
+            state.router = agent
+            return "model"
+
+    if not has_time(state.deadline, Config.ROUTER_LLM_MIN_SECONDS):
+        state.router, _ = predict_route(state.input)
+        return "deadline"
+
+    return None
+
+
+def hybrid_router(state: SharedState) -> SharedState:
+    """Route queries locally when confident and fall back to the LLM router.
+
+    Tries the keyword fast path first, then the trained router model, and
+    only calls llm_router when neither clears its confidence threshold and
+    there is time left for it.
+    """
+    started = time.perf_counter()
+    source = local_route(state)
+    if source is None:
+        source = "llm"
+        if Config.ROUTER_SPECULATION_ENABLED:
+            state = speculative_router(state)
+        else:
+            state = llm_router(state)
+    if not state.speculated:
+        emit_agent(state.router, state.stream)
+    _record_route(state, source, started)
+    return state
+
+
+async def ahybrid_router(state: SharedState) -> SharedState:
+    """Async version of hybrid_router"""
+    started = time.perf_counter()
+    source = local_route(state)
+    if source is None:
+        source = "llm"
+        if Config.ROUTER_SPECULATION_ENABLED:
+            state = await aspeculative_router(state)
+        else:
+            state = await allm_router(state)
+    if not state.speculated:
+        emit_agent(state.router, state.stream)
+    await asyncio.to_thread(_record_route, state, source, started)
+    return state
+
+
 def coach_node(state: SharedState) -> SharedState:
     """Coach agent node using the real coach agent with tools"""
     try:
         # You may want to pass a personality from state in the future
-        response = run_coach_agent_with_tools(state.input)
+        response = run_coach_agent_with_tools(
+            state.input,
+            stream=state.stream,
+            history=state.history,
+            profile=state.profile,
+            deadline=state.deadline,
+        )
         state.output = response
         state.agent_type = "coach"
         return state
@@ -68,7 +466,9 @@ def coach_node(state: SharedState) -> SharedState:
 def game_plan_node(state: SharedState) -> SharedState:
     """Game plan agent node using the real game plan agent"""
     try:
-        response = run_game_plan_agent(state.input)
+        response = run_game_plan_agent(
+            state.input, stream=state.stream, deadline=state.deadline
+        )
         state.output = response
         state.agent_type = "game_plan"
         return state
@@ -82,7 +482,9 @@ def game_plan_node(state: SharedState) -> SharedState:
 def injury_node(state: SharedState) -> SharedState:
     """Injury agent node using the real injury agent"""
     try:
-        response = run_injury_agent(state.input)
+        response = run_injury_agent(
+            state.input, stream=state.stream, deadline=state.deadline
+        )
         state.output = response
         state.agent_type = "injury"
         return state
@@ -93,15 +495,67 @@ def injury_node(state: SharedState) -> SharedState:
         return state
 
 
+async def acoach_node(state: SharedState) -> SharedState:
+    """Async coach agent node"""
+    try:
+        state.output = await arun_coach_agent_with_tools(
+            state.input,
+            stream=state.stream,
+            history=state.history,
+            profile=state.profile,
+            deadline=state.deadline,
+        )
+    except Exception as e:
+        state.output = f"Error in coach agent: {str(e)}"
+    state.agent_type = "coach"
+    return state
+
+
+async def agame_plan_node(state: SharedState) -> SharedState:
+    """Async game plan agent node"""
+    try:
+        state.output = await arun_game_plan_agent(
+            state.input, stream=state.stream, deadline=state.deadline
+        )
+    except Exception as e:
+        state.output = f"Error in game plan agent: {str(e)}"
+    state.agent_type = "game_plan"
+    return state
+
+
+async def ainjury_node(state: SharedState) -> SharedState:
+    """Async injury agent node"""
+    try:
+        state.output = await arun_injury_agent(
+            state.input, stream=state.stream, deadline=state.deadline
+        )
+    except Exception as e:
+        state.output = f"Error in injury agent: {str(e)}"
+    state.agent_type = "injury"
+    return state
+
+
+AGENT_NODES = {"coach": coach_node, "game_plan": game_plan_node, "injury": injury_node}
+AGENT_ANODES = {
+    "coach": acoach_node,
+    "game_plan": agame_plan_node,
+    "injury": ainjury_node,
+}
+
+
+def select_agent(state: SharedState) -> str:
+    """Pick the agent node to run, or finish if speculation already answered"""
+    return "done" if state.speculated else state.router
+
+
 def build_router_graph():
     """Build the router graph"""
     workflow = StateGraph(SharedState)
 
     # Add nodes
-    workflow.add_node("router", llm_router)
-    workflow.add_node("coach", coach_node)
-    workflow.add_node("game_plan", game_plan_node)
-    workflow.add_node("injury", injury_node)
+    workflow.add_node("router", RunnableLambda(hybrid_router, afunc=ahybrid_router))
+    for name, node in AGENT_NODES.items():
+        workflow.add_node(name, RunnableLambda(node, afunc=AGENT_ANODES[name]))
 
     # Set entry point
     workflow.set_entry_point("router")
@@ -109,8 +563,8 @@ def build_router_graph():
     # Add conditional edges
     workflow.add_conditional_edges(
         "router",
-        lambda x: x.router,
-        {"coach": "coach", "game_plan": "game_plan", "injury": "injury"},
+        select_agent,
+        {"coach": "coach", "game_plan": "game_plan", "injury": "injury", "done": END},
     )
 
     # Add edges to end
@@ -121,48 +575,94 @@ def build_router_graph():
     return workflow.compile()
 
 
-def run_router(user_input: str) -> str:
-    """Run the router agent"""
+register_graph("router", build_router_graph)
+
+
+def _router_input(
+    user_input: str,
+    history: Optional[list[dict[str, str]]],
+    profile: Optional[dict[str, Any]],
+    timeout: Optional[float],
+    stream: bool = False,
+) -> dict[str, Any]:
+    return {
+        "input": user_input,
+        "history": history or [],
+        "profile": profile or {},
+        "stream": stream,
+        "deadline": new_deadline(timeout),
+    }
+
+
+def run_router(
+    user_input: str,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """Run the router agent.
+
+    The whole request, routing included, must finish within timeout seconds
+    (Config.REQUEST_TIMEOUT by default); each stage gets the time left.
+    """
+    try:
+        graph = get_graph("router")
+        result = graph.invoke(_router_input(user_input, history, profile, timeout))
+        return result["output"]
+    except Exception as e:
+        return f"Error running router: {str(e)}"
+
+
+async def arun_router(
+    user_input: str,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """Run the router agent without blocking a worker thread"""
     try:
-        graph = build_router_graph()
-        result = graph.invoke({"input": user_input})
+        graph = get_graph("router")
+        result = await graph.ainvoke(
+            _router_input(user_input, history, profile, timeout)
+        )
         return result["output"]
     except Exception as e:
         return f"Error running router: {str(e)}"
 
 
+def stream_router(
+    user_input: str,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> Iterator[Tuple[str, str]]:
+    """Run the router, yielding ("agent", name) once routed, then ("token", text)"""
+    graph = get_graph("router")
+    return stream_graph_events(
+        graph, _router_input(user_input, history, profile, timeout, stream=True)
+    )
+
+
+def astream_router(
+    user_input: str,
+    history: Optional[list[dict[str, str]]] = None,
+    profile: Optional[dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[Tuple[str, str]]:
+    """Async version of stream_router"""
+    graph = get_graph("router")
+    return astream_graph_events(
+        graph, _router_input(user_input, history, profile, timeout, stream=True)
+    )
+
+
 def should_delegate_to_game_plan(state: SharedState) -> bool:
     """Determine if query should be delegated to game plan agent"""
     user_input_lower = state.input.lower()
-
-    game_plan_keywords = [
-        "tournament",
-        "competition",
-        "game plan",
-        "strategy",
-        "division",
-        "weight class",
-        "opponent",
-        "match",
-    ]
-
-    return any(keyword in user_input_lower for keyword in game_plan_keywords)
+    return any(keyword in user_input_lower for keyword in GAME_PLAN_KEYWORDS)
 
 
 def should_delegate_to_injury(state: SharedState) -> bool:
     """Determine if query should be delegated to injury agent"""
     user_input_lower = state.input.lower()
-
-    injury_keywords = [
-        "injury",
-        "pain",
-        "hurt",
-        "recovery",
-        "health",
-        "medical",
-        "doctor",
-        "treatment",
-        "rehab",
-    ]
-
-    return any(keyword in user_input_lower for keyword in injury_keywords)
+    return any(keyword in user_input_lower for keyword in INJURY_KEYWORDS)
@@ -0,0 +1,108 @@
+"""
+Helpers for streaming LLM tokens out of agent graph nodes.
+
+Nodes call generate/agenerate instead of use_llm_clean. When the state asks
+for streaming, tokens are forwarded to the graph's "custom" stream as they
+arrive, so callers using graph.stream(..., stream_mode="custom") see them
+immediately; otherwise the call is a plain non-streaming request. A
+request deadline from the graph state sets the call's timeout and
+max_tokens (see src.deadline).
+
+The router graph runs agents as nested graphs, so its stream is read with
+subgraphs=True and carries ("agent", name) events ahead of ("token", text).
+"""
+
+from typing import Any, AsyncIterator, Iterator, Optional, Tuple
+
+from langgraph.config import get_stream_writer
+from src.deadline import llm_budget
+from src.llm_utils import (
+    use_llm_astream,
+    use_llm_clean,
+    use_llm_clean_async,
+    use_llm_stream,
+)
+
+
+def emit(text: str, stream: bool) -> None:
+    """Send non-LLM text, like a canned reply, to the graph's token stream"""
+    if stream:
+        get_stream_writer()({"token": text})
+
+
+def emit_agent(agent: str, stream: bool) -> None:
+    """Announce the agent chosen by the router on the graph's stream"""
+    if stream:
+        get_stream_writer()({"agent": agent})
+
+
+def generate(
+    prompt: str,
+    stream: bool = False,
+    deadline: Optional[float] = None,
+    **llm_kwargs,
+) -> str:
+    """Call the LLM, forwarding tokens to the graph stream when stream is set"""
+    llm_kwargs.update(llm_budget(deadline))
+    if not stream:
+        return use_llm_clean(prompt, **llm_kwargs)
+
+    writer = get_stream_writer()
+    parts = []
+    for chunk in use_llm_stream(prompt, **llm_kwargs):
+        writer({"token": chunk})
+        parts.append(chunk)
+    return "".join(parts).strip()
+
+
+async def agenerate(
+    prompt: str,
+    stream: bool = False,
+    deadline: Optional[float] = None,
+    **llm_kwargs,
+) -> str:
+    """Async version of generate"""
+    llm_kwargs.update(llm_budget(deadline))
+    if not stream:
+        return await use_llm_clean_async(prompt, **llm_kwargs)
+
+    writer = get_stream_writer()
+    parts = []
+    async for chunk in use_llm_astream(prompt, **llm_kwargs):
+        writer({"token": chunk})
+        parts.append(chunk)
+    return "".join(parts).strip()
+
+
+def stream_graph_tokens(graph: Any, initial_state: Any) -> Iterator[str]:
+    """Run a graph in streaming mode and yield the tokens its nodes emit"""
+    for chunk in graph.stream(initial_state, stream_mode="custom"):
+        yield chunk["token"]
+
+
+async def astream_graph_tokens(graph: Any, initial_state: Any) -> AsyncIterator[str]:
+    """Async version of stream_graph_tokens"""
+    async for chunk in graph.astream(initial_state, stream_mode="custom"):
+        yield chunk["token"]
+
+
+def _stream_event(chunk: dict) -> Tuple[str, str]:
+    if "agent" in chunk:
+        return "agent", chunk["agent"]
+    return "token", chunk["token"]
+
+
+def stream_graph_events(graph: Any, initial_state: Any) -> Iterator[Tuple[str, str]]:
+    """Run a graph with nested agent graphs, yielding (kind, text) events"""
+    for _, chunk in graph.stream(initial_state, stream_mode="custom", subgraphs=True):
+        yield _stream_event(chunk)
+
+
+async def astream_graph_events(
+    graph: Any, initial_state: Any
+) -> AsyncIterator[Tuple[str, str]]:
+    """Async version of stream_graph_events"""
+    async for _, chunk in graph.astream(
+        initial_state, stream_mode="custom", subgraphs=True
+    ):
+        yield _stream_event(chunk)
@@ -1,117 +1,70 @@
-import sqlite3
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
+from src.db_migrations import migrate
+from src.db_pool import get_connection, transaction
+from src.db_writer import flush_writes, get_write_queue, insert_many
+from src.profile_cache import get_profile_cache, students_version
 
-def init_database():
-    """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect("bjj_app.db")
-    cursor = conn.cursor()
-
-    # Create students table with new fields
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            age INTEGER,
-            gender TEXT,
-            belt_color TEXT,
-            no_gi_level TEXT,
-            weight INTEGER,
-            goals TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """
-    )
-
-    # Create game_plans table
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS game_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            tournament_name TEXT,
-            division TEXT,
-            weight_class TEXT,
-            opponent_style TEXT,
-            game_plan TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES students (id)
-        )
-    """
-    )
-
-    # Create progress_tracking table
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS progress_tracking (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            technique TEXT NOT NULL,
-            level TEXT NOT NULL,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES students (id)
-        )
-    """
-    )
-
-    # Create evaluation_results table
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS evaluation_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_type TEXT,
-            input_text TEXT,
-            output_text TEXT,
-            score REAL,
-            feedback TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """
-    )
 
-    conn.commit()
-    conn.close()
+def init_database():
+    """Initialize the SQLite database, migrating it to the latest schema"""
+    migrate()
 
 
 def save_data_to_sqlite(table: str, data: dict[str, Any]) -> bool:
     """Save data to SQLite database"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
         columns = ", ".join(data.keys())
         placeholders = ", ".join(["?" for _ in data])
         values = list(data.values())
 
         query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-        cursor.execute(query, values)
-
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute(query, values)
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
         return False
 
 
+def save_many(table: str, rows: list[dict[str, Any]]) -> int:
+    """Save rows to SQLite in one transaction and return how many were saved"""
+    try:
+        with transaction() as conn:
+            return insert_many(conn, table, rows)
+    except Exception as e:
+        print(f"Error saving data: {e}")
+        return 0
+
+
+def save_later(table: str, data: dict[str, Any]) -> bool:
+    """Save data through the write-behind queue, or right away without it"""
+    queue = get_write_queue()
+    if queue is None:
+        return save_data_to_sqlite(table, data)
+    queue.put(table, data)
+    return True
+
+
 def update_data_in_sqlite(
     table: str, data: dict[str, Any], where_clause: str, where_args: tuple
 ) -> bool:
     """Update data in SQLite database"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
         set_clause = ", ".join([f"{key} = ?" for key in data.keys()])
         values = list(data.values()) + list(where_args)
 
         query = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
-        cursor.execute(query, values)
-
-        conn.commit()
-        conn.close()
+        if table != "students":
+            with transaction() as conn:
+                conn.execute(query, values)
+            return True
+
+        with transaction() as conn:
+            before = students_version(conn)
+            updated = [row[0] for row in conn.execute(f"{query} RETURNING id", values)]
+            after = students_version(conn)
+        _invalidate_profiles(updated, before, after)
         return True
     except Exception as e:
         print(f"Error updating data: {e}")
@@ -121,34 +74,166 @@ def update_data_in_sqlite(
 def view_all_rows(table_name: str) -> list[tuple]:
     """View all rows from a table"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
-        cursor.execute(f"SELECT * FROM {table_name}")
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
+        flush_writes(table_name)
+        cursor = get_connection().execute(f"SELECT * FROM {table_name}")
+        return cursor.fetchall()
     except Exception as e:
         print(f"Error viewing data: {e}")
         return []
 
 
-def get_student_by_id(student_id: int) -> Optional[dict[str, Any]]:
-    """Get student information by ID"""
-    try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
+def get_table_columns(table: str) -> dict[str, str]:
+    """Column names of a table, with their declared types"""
+    rows = get_connection().execute(
+        "SELECT name, type FROM pragma_table_info(?)", (table,)
+    )
+    columns = {name: column_type.upper() for name, column_type in rows}
+    if not columns:
+        raise ValueError(f"Unknown table: {table}")
+    return columns
+
+
+def _after_condition(
+    order_by: str, descending: bool, after: tuple[Any, int]
+) -> tuple[str, list[Any]]:
+    """WHERE condition for the rows that sort after the key of a row"""
+    op = "<" if descending else ">"
+    value, last_id = after
+    if order_by == "id":
+        return f"id {op} ?", [last_id]
+    # SQLite sorts NULLs first, so they start an ascending scan and end a
+    # descending one
+    if value is None:
+        if descending:
+            return f"({order_by} IS NULL AND id < ?)", [last_id]
+        return f"({order_by} IS NULL AND id > ? OR {order_by} IS NOT NULL)", [last_id]
+    condition = f"({order_by} {op} ? OR {order_by} = ? AND id {op} ?"
+    if descending:
+        condition += f" OR {order_by} IS NULL"
+    return condition + ")", [value, value, last_id]
+
+
+def read_page(
+    table: str,
+    columns: Optional[list[str]] = None,
+    filters: Optional[dict[str, Any]] = None,
+    order_by: str = "id",
+    descending: bool = False,
+    after: Optional[tuple[Any, int]] = None,
+    limit: int = 50,
+    max_chars: Optional[int] = None,
+) -> tuple[list[dict[str, Any]], Optional[tuple[Any, int]]]:
+    """Read one page of a table's rows, sorted by order_by then id.
+
+    Pages continue from the (order_by, id) key of the previous page's last
+    row rather than an OFFSET, so a deep page costs the same as the first.
+    filters match columns by equality, and text values are cut to max_chars.
+    Returns the rows and the key to pass as after for the next page, which
+    is None on the last page.
+    """
+    known = get_table_columns(table)
+    columns = list(columns or known)
+    for column in [*columns, *(filters or {}), order_by, "id"]:
+        if column not in known:
+            raise ValueError(f"Unknown column for {table}: {column}")
+
+    flush_writes(table)
+    selected = [
+        (
+            f"substr({column}, 1, {int(max_chars)}) AS {column}"
+            if max_chars and "TEXT" in known[column]
+            else column
+        )
+        for column in columns
+    ]
+    conditions, args = [], []
+    for column, value in (filters or {}).items():
+        if value is None:
+            conditions.append(f"{column} IS NULL")
+        else:
+            conditions.append(f"{column} = ?")
+            args.append(value)
+    if after is not None:
+        condition, after_args = _after_condition(order_by, descending, after)
+        conditions.append(condition)
+        args.extend(after_args)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "DESC" if descending else "ASC"
+    order = f"id {direction}"
+    if order_by != "id":
+        order = f"{order_by} {direction}, {order}"
+
+    # The page's sort key comes first, and one extra row tells if there is
+    # a next page
+    rows = (
+        get_connection()
+        .execute(
+            f"SELECT {order_by}, id, {', '.join(selected)} FROM {table} "
+            f"{where} ORDER BY {order} LIMIT ?",
+            [*args, limit + 1],
+        )
+        .fetchall()
+    )
+    next_after = tuple(rows[limit - 1][:2]) if len(rows) > limit else None
+    return [dict(zip(columns, row[2:])) for row in rows[:limit]], next_after
+
+
+def iter_rows(
+    table: str,
+    columns: Optional[list[str]] = None,
+    filters: Optional[dict[str, Any]] = None,
+    order_by: str = "id",
+    descending: bool = False,
+    batch_size: int = 500,
+) -> Iterator[dict[str, Any]]:
+    """Yield a table's rows, reading batch_size at a time"""
+    after = None
+    while True:
+        rows, after = read_page(
+            table, columns, filters, order_by, descending, after, batch_size
+        )
+        yield from rows
+        if after is None:
+            return
 
-        cursor.execute("SELECT * FROM students WHERE id = ?", (student_id,))
-        row = cursor.fetchone()
 
-        conn.close()
+def _invalidate_profiles(student_ids: list[int], before: int, after: int) -> None:
+    cache = get_profile_cache()
+    if cache is not None:
+        cache.invalidate(student_ids, before, after)
 
-        if row:
-            columns = [description[0] for description in cursor.description]
-            return dict(zip(columns, row))
+
+def _get_student(column: str, value: Any) -> Optional[dict[str, Any]]:
+    """Look up a student by id or name, through the profile cache"""
+    cache = get_profile_cache()
+    if cache is not None:
+        if column == "id":
+            student = cache.get(student_id=value)
+        else:
+            student = cache.get(name=value)
+        if student is not None:
+            return student
+        # Read before the query, so a write that lands meanwhile keeps the
+        # row out of the cache
+        version = cache.check_version()
+
+    cursor = get_connection().execute(
+        f"SELECT * FROM students WHERE {column} = ?", (value,)
+    )
+    row = cursor.fetchone()
+    if not row:
         return None
+    columns = [description[0] for description in cursor.description]
+    student = dict(zip(columns, row))
+    if cache is not None:
+        cache.put(student, version)
+    return student
+
+
+def get_student_by_id(student_id: int) -> Optional[dict[str, Any]]:
+    """Get student information by ID"""
+    try:
+        return _get_student("id", student_id)
     except Exception as e:
         print(f"Error getting student: {e}")
         return None
@@ -157,17 +242,13 @@ def get_student_by_id(student_id: int) -> Optional[dict[str, Any]]:
 def get_game_plans_by_user(user_id: int) -> list[dict[str, Any]]:
     """Get all game plans for a specific user"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
-        cursor.execute(
+        flush_writes("game_plans")
+        cursor = get_connection().execute(
             "SELECT * FROM game_plans WHERE user_id = ? ORDER BY created_at DESC",
             (user_id,),
         )
         rows = cursor.fetchall()
 
-        conn.close()
-
         if rows:
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
@@ -180,17 +261,13 @@ def get_game_plans_by_user(user_id: int) -> list[dict[str, Any]]:
 def get_progress_by_user(user_id: int) -> list[dict[str, Any]]:
     """Get all progress tracking entries for a specific user"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
-        cursor.execute(
+        flush_writes("progress_tracking")
+        cursor = get_connection().execute(
             "SELECT * FROM progress_tracking WHERE user_id = ? ORDER BY created_at DESC",
             (user_id,),
         )
         rows = cursor.fetchall()
 
-        conn.close()
-
         if rows:
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
@@ -217,39 +294,20 @@ def save_evaluation_result(
 def save_student_profile(student_data: dict[str, Any]) -> int:
     """Save or update student profile and return student ID"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
-        # Check if student already exists by name
-        cursor.execute(
-            "SELECT id FROM students WHERE name = ?", (student_data.get("name"),)
-        )
-        existing_student = cursor.fetchone()
-
-        if existing_student:
-            # Update existing student
-            student_id = existing_student[0]
-            set_clause = ", ".join(
-                [f"{key} = ?" for key in student_data.keys() if key != "name"]
-            )
-            values = [
-                student_data[key] for key in student_data.keys() if key != "name"
-            ] + [student_id]
-
-            query = f"UPDATE students SET {set_clause} WHERE id = ?"
-            cursor.execute(query, values)
-        else:
-            # Insert new student
-            columns = ", ".join(student_data.keys())
-            placeholders = ", ".join(["?" for _ in student_data])
-            values = list(student_data.values())
-
-            query = f"INSERT INTO students ({columns}) VALUES ({placeholders})"
-            cursor.execute(query, values)
-            student_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
+        columns = ", ".join(student_data.keys())
+        placeholders = ", ".join(["?" for _ in student_data])
+        updates = [f"{key} = excluded.{key}" for key in student_data if key != "name"]
+        # Student names are unique, so an existing profile is updated in place
+        query = f"""
+            INSERT INTO students ({columns}) VALUES ({placeholders})
+            ON CONFLICT (name) DO UPDATE SET {", ".join(updates or ["name = name"])}
+            RETURNING id
+        """
+        with transaction() as conn:
+            before = students_version(conn)
+            (student_id,) = conn.execute(query, list(student_data.values())).fetchone()
+            after = students_version(conn)
+        _invalidate_profiles([student_id], before, after)
         return student_id
     except Exception as e:
         print(f"Error saving student profile: {e}")
@@ -259,18 +317,7 @@ def save_student_profile(student_data: dict[str, Any]) -> int:
 def get_student_by_name(name: str) -> Optional[dict[str, Any]]:
     """Get student information by name"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM students WHERE name = ?", (name,))
-        row = cursor.fetchone()
-
-        conn.close()
-
-        if row:
-            columns = [description[0] for description in cursor.description]
-            return dict(zip(columns, row))
-        return None
+        return _get_student("name", name)
     except Exception as e:
         print(f"Error getting student by name: {e}")
         return None
@@ -279,14 +326,9 @@ def get_student_by_name(name: str) -> Optional[dict[str, Any]]:
 def get_all_students() -> list[dict[str, Any]]:
     """Get all students"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM students ORDER BY name")
+        cursor = get_connection().execute("SELECT * FROM students ORDER BY name")
         rows = cursor.fetchall()
 
-        conn.close()
-
         if rows:
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
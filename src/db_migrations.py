@@ -0,0 +1,260 @@
+"""
+Versioned schema migrations for the app database.
+
+The schema version lives in SQLite's user_version pragma. Each migration
+runs once, in order, in a write transaction that also bumps user_version,
+so a database is always at exactly one version and two processes starting
+at once can't both apply a migration. A database that is already current
+is recognised with one read, without taking the write lock. To change the
+schema, append a migration to MIGRATIONS; never edit one that has shipped.
+"""
+
+import sqlite3
+from typing import Callable, Optional
+
+from src.db_pool import get_connection, transaction
+
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    """The tables as they were before migrations existed"""
+    # Create students table with new fields
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            gender TEXT,
+            belt_color TEXT,
+            no_gi_level TEXT,
+            weight INTEGER,
+            goals TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+    # Create game_plans table
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS game_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            tournament_name TEXT,
+            division TEXT,
+            weight_class TEXT,
+            opponent_style TEXT,
+            game_plan TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES students (id)
+        )
+    """
+    )
+
+    # Create progress_tracking table
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS progress_tracking (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            technique TEXT NOT NULL,
+            level TEXT NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES students (id)
+        )
+    """
+    )
+
+    # Create evaluation_results table
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS evaluation_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_type TEXT,
+            input_text TEXT,
+            output_text TEXT,
+            score REAL,
+            feedback TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+    # Create routing_log table
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS routing_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            input_text TEXT NOT NULL,
+            agent_type TEXT NOT NULL,
+            source TEXT NOT NULL,
+            latency_ms REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+
+def _add_lookup_indexes(conn: sqlite3.Connection) -> None:
+    """Index the per-user history and per-agent evaluation queries"""
+    # Match "WHERE user_id = ? ORDER BY created_at DESC", so the rows come
+    # back in order without a sort
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_game_plans_user_created "
+        "ON game_plans (user_id, created_at DESC)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_progress_tracking_user_created "
+        "ON progress_tracking (user_id, created_at DESC)"
+    )
+    # Covers the average score per agent without reading the table
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_evaluation_results_agent_type "
+        "ON evaluation_results (agent_type, score)"
+    )
+
+
+def _unique_student_names(conn: sqlite3.Connection) -> None:
+    """Make student names unique, so profiles can be saved with an upsert"""
+    # Merge duplicate names into the oldest row, which is the one profile
+    # saves used to update
+    for table in ("game_plans", "progress_tracking"):
+        conn.execute(
+            f"""
+            UPDATE {table} SET user_id = (
+                SELECT MIN(keep.id) FROM students AS keep
+                WHERE keep.name = (SELECT name FROM students WHERE id = {table}.user_id)
+            )
+            WHERE user_id IN (
+                SELECT id FROM students
+                WHERE id NOT IN (SELECT MIN(id) FROM students GROUP BY name)
+            )
+        """
+        )
+    conn.execute(
+        "DELETE FROM students WHERE id NOT IN (SELECT MIN(id) FROM students GROUP BY name)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_students_name ON students (name)"
+    )
+
+
+def _students_version(conn: sqlite3.Connection) -> None:
+    """Count changes to students, so caches in other processes see them"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('students', 0)"
+    )
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS students_version_{event.lower()}
+            AFTER {event} ON students
+            BEGIN
+                UPDATE cache_versions SET version = version + 1
+                WHERE name = 'students';
+            END
+        """
+        )
+
+
+def _routing_total_time(conn: sqlite3.Connection) -> None:
+    """Log the router node's end-to-end time next to the decision latency"""
+    conn.execute("ALTER TABLE routing_log ADD COLUMN total_ms REAL")
+
+
+def _llm_response_cache(conn: sqlite3.Connection) -> None:
+    """Disk tier of the LLM response cache, evicted by last access"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            key TEXT PRIMARY KEY,
+            agent TEXT,
+            response TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_access "
+        "ON llm_response_cache (last_access)"
+    )
+
+
+def _llm_metrics(conn: sqlite3.Connection) -> None:
+    """Per-interval LLM usage, one row per agent, node and model"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent TEXT NOT NULL,
+            node TEXT NOT NULL,
+            model TEXT NOT NULL,
+            calls INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            cached_tokens INTEGER NOT NULL,
+            latency_ms_total REAL NOT NULL,
+            latency_ms_max REAL NOT NULL,
+            period_start REAL NOT NULL,
+            period_end REAL NOT NULL
+        )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_llm_metrics_agent "
+        "ON llm_metrics (agent, period_end)"
+    )
+
+
+Migration = tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+MIGRATIONS: list[Migration] = [
+    (1, "initial schema", _initial_schema),
+    (2, "indexes for per-user history and evaluation summaries", _add_lookup_indexes),
+    (3, "unique student names", _unique_student_names),
+    (4, "students version counter", _students_version),
+    (5, "routing end-to-end time", _routing_total_time),
+    (6, "LLM response cache", _llm_response_cache),
+    (7, "LLM usage metrics", _llm_metrics),
+]
+
+
+def schema_version(db_path: Optional[str] = None) -> int:
+    """The migration a database is at, 0 for a new one"""
+    return get_connection(db_path).execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path: Optional[str] = None, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to target (the latest by default).
+
+    Returns the versions that were applied.
+    """
+    if target is None:
+        target = MIGRATIONS[-1][0]
+    # An up-to-date database, the usual case, needs no write lock
+    if schema_version(db_path) >= target:
+        return []
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version > target:
+            break
+        with transaction(db_path) as conn:
+            # Checked under the write lock, in case another process got here first
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        print(f"Applied database migration {version}: {description}")
+        applied.append(version)
+    return applied
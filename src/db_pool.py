@@ -0,0 +1,137 @@
+"""
+Pooled SQLite connections.
+
+Each thread keeps one open connection per database file instead of
+connecting for every query, so connection setup is paid once and the
+connection's prepared-statement cache is reused across calls. Connections
+are opened in WAL mode, where readers never block the writer and the writer
+never blocks readers, with synchronous=NORMAL, a busy_timeout so concurrent
+writers wait for the lock instead of failing with "database is locked", and
+a page cache of Config.DB_CACHE_SIZE_KB.
+
+Connections run in autocommit mode, so a read never holds a transaction
+open. Group writes in transaction(), which takes the write lock up front
+(BEGIN IMMEDIATE) so it cannot fail halfway on a lock upgrade.
+"""
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import Config
+
+
+class _Connection(sqlite3.Connection):
+    """A connection that can be weakly referenced, so pools can close it"""
+
+
+class ConnectionPool:
+    """Thread-local SQLite connections to one database file"""
+
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout_ms: int = 5000,
+        cache_size_kb: int = 8192,
+        statement_cache_size: int = 128,
+    ):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        # Connections die with their thread; this only lets close() reach them
+        self._connections: weakref.WeakSet = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            cached_statements=self.statement_cache_size,
+            # Only the owning thread uses it, but close() may run elsewhere
+            check_same_thread=False,
+            factory=_Connection,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in a write transaction, committed unless it raises"""
+        conn = self.connection()
+        if conn.in_transaction:
+            # Nested use joins the transaction that is already open
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def close(self) -> None:
+        """Close every connection, so each thread reconnects on next use"""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    """Get the process-wide pool for a database, Config.DATABASE_PATH by default"""
+    db_path = db_path or Config.DATABASE_PATH
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(
+                db_path,
+                busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+                cache_size_kb=Config.DB_CACHE_SIZE_KB,
+                statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+            )
+            _pools[db_path] = pool
+        return pool
+
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Get this thread's pooled connection to a database"""
+    return get_pool(db_path).connection()
+
+
+def transaction(db_path: Optional[str] = None):
+    """Open a write transaction on this thread's pooled connection"""
+    return get_pool(db_path).transaction()
+
+
+def close_pools() -> None:
+    """Close every pooled connection"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,226 @@
+"""
+Batched inserts and an optional write-behind queue for the app database.
+
+insert_many() writes any number of rows with one executemany per column
+set, so a batch costs one transaction and one fsync instead of one per row.
+
+With Config.DB_WRITE_BEHIND_ENABLED, rows saved through save_later() go to
+an in-memory queue that a background thread writes out in batches, when
+DB_WRITE_BATCH_SIZE rows are waiting or DB_WRITE_FLUSH_INTERVAL seconds
+after the first one, so request threads never wait on the disk.
+
+Durability: a queued row is written within one flush interval. When a batch
+fails to write, its rows are written one at a time, so one bad row can't
+hold back the rest; a row that still fails is kept and retried at the next
+flush (up to three times, then it alone is dropped). Everything still
+queued is flushed when the process exits normally; only a crash can lose
+the rows of the current window. Past DB_WRITE_MAX_PENDING queued rows, the
+saving thread writes the queue itself, so memory stays bounded if the disk
+falls behind. Readers of queued tables call flush_writes(table) first, so
+they always see their own writes; it only writes when rows for that table
+are queued, so reading other tables never waits on the queue.
+"""
+
+import atexit
+import sqlite3
+import threading
+from typing import Any, Iterable, Optional
+
+from config import Config
+from src.db_pool import transaction
+
+# A queued row is dropped after this many failed writes
+_MAX_ATTEMPTS = 3
+
+
+def insert_many(
+    conn: sqlite3.Connection, table: str, rows: Iterable[dict[str, Any]]
+) -> int:
+    """Insert rows into a table, one executemany per column set.
+
+    Returns the number of rows inserted.
+    """
+    by_columns: dict[tuple[str, ...], list[list[Any]]] = {}
+    for row in rows:
+        by_columns.setdefault(tuple(row), []).append(list(row.values()))
+    for columns, values in by_columns.items():
+        placeholders = ", ".join(["?" for _ in columns])
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            values,
+        )
+    return sum(len(values) for values in by_columns.values())
+
+
+class WriteBehindQueue:
+    """Queued inserts, written in batches by a background thread"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # (table, row, failed writes so far)
+        self._pending: list[tuple[str, dict[str, Any], int]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._counters = {"queued": 0, "written": 0, "batches": 0, "errors": 0}
+
+    def put(self, table: str, row: dict[str, Any]) -> None:
+        """Queue a row for insertion"""
+        self._ensure_writer()
+        with self._lock:
+            self._pending.append((table, row, 0))
+            self._counters["queued"] += 1
+            pending = len(self._pending)
+            if pending >= self.batch_size:
+                self._wake.notify()
+        if pending > self.max_pending:
+            self.flush()
+
+    def _ensure_writer(self) -> None:
+        """Start the background writer thread on first use"""
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_periodically, name="db-write-behind", daemon=True
+                )
+                self._writer.start()
+                atexit.register(self.stop)
+
+    def _write_periodically(self) -> None:
+        while not self._stopped.is_set():
+            with self._lock:
+                # Sleep until a row arrives, then give the batch one window
+                # to fill up
+                while not self._pending and not self._stopped.is_set():
+                    self._wake.wait()
+                if len(self._pending) < self.batch_size:
+                    self._wake.wait(self.flush_interval)
+            self.flush()
+
+    def stop(self) -> None:
+        """Stop the writer thread, writing out anything still queued"""
+        self._stopped.set()
+        with self._lock:
+            self._wake.notify_all()
+        self.flush()
+
+    def flush(self, table: Optional[str] = None) -> int:
+        """Write every queued row and return the number written.
+
+        With a table, nothing is written unless rows for it are queued.
+        """
+        with self._flush_lock:
+            with self._lock:
+                # Checked after any running flush has finished writing
+                if table is not None and all(
+                    queued != table for queued, _, _ in self._pending
+                ):
+                    return 0
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+
+            by_table: dict[str, list[tuple[dict[str, Any], int]]] = {}
+            for table, row, attempts in pending:
+                by_table.setdefault(table, []).append((row, attempts))
+            written = errors = 0
+            failed: list[tuple[str, dict[str, Any], int]] = []
+            # A transaction per table, so rows that can't be written don't
+            # hold back the other tables
+            for table, entries in by_table.items():
+                try:
+                    with transaction(self.db_path) as conn:
+                        written += insert_many(conn, table, [row for row, _ in entries])
+                except Exception:
+                    # The batch was rolled back; write it row by row so only
+                    # the rows that fail are kept
+                    row_written, row_failed = self._write_rows(table, entries)
+                    written += row_written
+                    errors += len(entries) - row_written
+                    failed.extend(row_failed)
+            with self._lock:
+                # Keep the failed rows, in order, for the next flush
+                self._pending[:0] = failed
+                if failed:
+                    self._wake.notify()
+                self._counters["written"] += written
+                self._counters["batches"] += 1
+                self._counters["errors"] += errors
+            return written
+
+    def _write_rows(
+        self, table: str, entries: list[tuple[dict[str, Any], int]]
+    ) -> tuple[int, list[tuple[str, dict[str, Any], int]]]:
+        """Write rows one transaction each.
+
+        Returns the number written and the failed rows to queue again, with
+        their attempt counts; a row that has failed _MAX_ATTEMPTS times is
+        dropped.
+        """
+        written = 0
+        failed = []
+        for row, attempts in entries:
+            try:
+                with transaction(self.db_path) as conn:
+                    written += insert_many(conn, table, [row])
+            except Exception as e:
+                attempts += 1
+                if attempts < _MAX_ATTEMPTS:
+                    print(f"Error writing queued row to {table}: {e}")
+                    failed.append((table, row, attempts))
+                else:
+                    print(
+                        f"Dropping queued row for {table} "
+                        f"after {attempts} failed writes: {e}"
+                    )
+        return written, failed
+
+    def stats(self) -> dict[str, int]:
+        """Get queued, written and pending rows, batches and failed writes"""
+        with self._lock:
+            return {**self._counters, "pending": len(self._pending)}
+
+
+_write_queue: Optional[WriteBehindQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> Optional[WriteBehindQueue]:
+    """Get the process-wide write-behind queue, or None if it is disabled"""
+    global _write_queue
+    if not Config.DB_WRITE_BEHIND_ENABLED:
+        return None
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteBehindQueue(
+                batch_size=Config.DB_WRITE_BATCH_SIZE,
+                flush_interval=Config.DB_WRITE_FLUSH_INTERVAL,
+                max_pending=Config.DB_WRITE_MAX_PENDING,
+            )
+        return _write_queue
+
+
+def flush_writes(table: Optional[str] = None) -> int:
+    """Write out any queued rows now, or only if rows for table are queued"""
+    if _write_queue is None:
+        return 0
+    return _write_queue.flush(table)
+
+
+def get_write_queue_stats() -> dict[str, int]:
+    if _write_queue is None:
+        return {}
+    return _write_queue.stats()
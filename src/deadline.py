@@ -0,0 +1,68 @@
+"""
+End-to-end deadlines for chat requests.
+
+A request gets one latency budget (Config.REQUEST_TIMEOUT) when it enters
+the router. Its deadline, a time.monotonic() timestamp, is carried in the
+graph state down to the agents and their LLM calls, so each stage only gets
+the time that is left: an LLM call's timeout is the remaining time, and its
+max_tokens is capped at what the model can generate in that time. When
+little time is left the router skips the LLM and takes its best local
+route instead.
+"""
+
+import time
+from typing import Any, Optional
+
+from config import Config
+from src.llm_resilience import LLMCallError
+
+# Round token caps down to a multiple of this, so requests with similar
+# time left still share response cache keys
+_MAX_TOKENS_STEP = 64
+
+
+def new_deadline(timeout: Optional[float] = None) -> Optional[float]:
+    """Deadline for a request starting now, or None if it has no time limit"""
+    timeout = Config.REQUEST_TIMEOUT if timeout is None else timeout
+    if timeout <= 0:
+        return None
+    return time.monotonic() + timeout
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds until the deadline, or None without one"""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def has_time(deadline: Optional[float], seconds: float) -> bool:
+    """Whether at least seconds are left before the deadline"""
+    left = time_left(deadline)
+    return left is None or left >= seconds
+
+
+def llm_budget(deadline: Optional[float]) -> dict[str, Any]:
+    """The timeout and max_tokens for an LLM call that must end by deadline.
+
+    max_tokens is only set when the time left is too short for
+    Config.OPENAI_MAX_TOKENS at the expected generation speed. Raises
+    LLMCallError if the deadline has already passed.
+    """
+    left = time_left(deadline)
+    if left is None:
+        return {}
+    if left <= 0:
+        raise LLMCallError(
+            f"Request deadline passed {-left:.1f}s ago", "timeout", attempts=0
+        )
+
+    budget: dict[str, Any] = {"timeout": left}
+    generating = left - Config.LLM_FIRST_TOKEN_SECONDS
+    affordable = int(generating * Config.LLM_OUTPUT_TOKENS_PER_SECOND)
+    if affordable < Config.OPENAI_MAX_TOKENS:
+        budget["max_tokens"] = max(
+            Config.LLM_MIN_OUTPUT_TOKENS,
+            affordable // _MAX_TOKENS_STEP * _MAX_TOKENS_STEP,
+        )
+    return budget
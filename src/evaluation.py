@@ -1,26 +1,76 @@
-import sqlite3
+from src.db_pool import get_connection
+from src.db_writer import flush_writes
 import pandas as pd
-from src.llm_utils import use_llm_clean
-
-
-def generate_examples(n=5):
-    """Generate training examples for the BJJ AI agents"""
-    try:
-        examples_prompt = f"""
+from src.llm_utils import use_llm_batch, use_llm_clean
+
+
+AGENT_TYPES = ["coach", "game_plan", "injury"]
+# Batches of a large request each cover a different part of the game, so
+# their prompts, and the examples that come back, differ
+SCENARIO_THEMES = [
+    "guard play and sweeps",
+    "guard passing and top pressure",
+    "takedowns and the stand-up game",
+    "submissions and escapes",
+    "competition preparation",
+    "recovery and training around injuries",
+]
+
+
+def build_examples_prompt(n: int, agent_type: str = "", batch: int = 0) -> str:
+    """Build the prompt asking for n training examples.
+
+    With an agent type, batch picks the scenario theme, so batches of one
+    request ask for different examples. Batches cycle through the agent
+    types, then move on to the next theme.
+    """
+    theme = SCENARIO_THEMES[batch // len(AGENT_TYPES) % len(SCENARIO_THEMES)]
+    focus = (
+        f"\n        All examples should be for the {agent_type} agent, with "
+        f"scenarios about {theme} (set {batch + 1}).\n"
+        if agent_type
+        else ""
+    )
+    return f"""
         Generate {n} diverse training examples for BJJ AI agents. 
         Each example should include:
         1. A realistic user query about BJJ
         2. The expected agent response
         3. The type of agent that should handle it (coach, game_plan, injury)
-        
+        {focus}
         Format each example as:
         Query: [user question]
         Expected Response: [detailed response]
         Agent Type: [coach/game_plan/injury]
         ---
         """
-        response = use_llm_clean(examples_prompt)
-        return response
+
+
+def generate_examples(n=5, per_request=5):
+    """Generate training examples for the BJJ AI agents.
+
+    Large requests are split into batches of per_request examples, each
+    focused on one agent type, and generated concurrently.
+    """
+    try:
+        if n <= per_request:
+            return use_llm_clean(
+                build_examples_prompt(n), agent="evaluation", cache=False
+            )
+
+        sizes = [per_request] * (n // per_request)
+        if n % per_request:
+            sizes.append(n % per_request)
+        prompts = [
+            build_examples_prompt(size, AGENT_TYPES[i % len(AGENT_TYPES)], i)
+            for i, size in enumerate(sizes)
+        ]
+        result = use_llm_batch(prompts, agent="evaluation", cache=False)
+        for index, error in result.errors.items():
+            print(f"Error generating examples batch {index}: {error}")
+        return "\n".join(
+            response.strip() for response in result.responses if response is not None
+        )
     except Exception as e:
         return f"Error generating examples: {str(e)}"
 
@@ -128,7 +178,7 @@ def save_evaluation_results(
 ):
     """Save evaluation results to database"""
     try:
-        from src.database import save_data_to_sqlite
+        from src.database import save_later
 
         overall_score = 0.0
         if "coverage" in evaluation_results:
@@ -146,7 +196,7 @@ def save_evaluation_results(
             "feedback": str(evaluation_results),
         }
 
-        return save_data_to_sqlite("evaluation_results", data)
+        return save_later("evaluation_results", data)
     except Exception as e:
         print(f"Error saving evaluation results: {e}")
         return False
@@ -155,7 +205,8 @@ def save_evaluation_results(
 def get_evaluation_summary(agent_type: str = None, limit: int = 10) -> str:
     """Get a summary of evaluation results"""
     try:
-        conn = sqlite3.connect("bjj_app.db")
+        flush_writes("evaluation_results")
+        conn = get_connection()
 
         if agent_type:
             query = """
@@ -173,7 +224,6 @@ def get_evaluation_summary(agent_type: str = None, limit: int = 10) -> str:
             cursor = conn.execute(query)
 
         results = cursor.fetchall()
-        conn.close()
 
         if not results:
             return "No evaluation results found."
@@ -0,0 +1,402 @@
+"""
+Deterministic local stand-in for the OpenAI chat-completions API.
+
+It implements POST /v1/chat/completions the way ChatOpenAI calls it,
+including server-sent-event streaming, so agents, benchmarks and load tests
+can run with no network access or API key. With Config.FAKE_OPENAI_ENABLED,
+use_llm_raw and the other LLM helpers start it in-process and send every
+call to it. It can also run on its own:
+
+    python -m src.fake_openai --port 8000 --latency lognormal:0.4:0.5
+
+and the app pointed at it with OPENAI_BASE_URL=http://127.0.0.1:8000/v1.
+
+Replies come from canned responses matched against the prompt with regular
+expressions (the first match wins); a reply may use the pattern's named
+groups and {user}, the last user message, as str.format fields. Each
+request waits for a latency drawn from a distribution, in seconds: "0.2",
+"uniform:low:high", "normal:mean:stddev" or "lognormal:median:sigma". The
+reply, cut to the request's max_tokens words, is then generated at
+tokens_per_second. Faults can be
+injected: error_rate fails that fraction of requests with error_status,
+fail_next() queues specific failures, and a latency above the client
+deadline makes requests time out. With a seed, latencies and injected
+failures are reproducible.
+
+Usage is reported with prompt tokens estimated at four characters per
+token. A leading system message the server has already seen is reported as
+cached prompt tokens, the way the provider reuses a repeated prompt prefix.
+
+The server runs on its own asyncio event loop in a background thread so a
+single process can hold hundreds of concurrent keep-alive connections.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional, Union
+
+from config import Config
+
+# Canned replies for the app's own prompts, so routing and the agents
+# behave sensibly out of the box
+_ROUTER_QUESTION = r"Answer with just one word: coach, game_plan, or injury"
+DEFAULT_RESPONSES = [
+    (_ROUTER_QUESTION + r"[\s\S]*(injur|hurt|pain|sore)", "injury"),
+    (_ROUTER_QUESTION + r"[\s\S]*(tournament|competition|game plan)", "game_plan"),
+    (_ROUTER_QUESTION, "coach"),
+    (
+        r"^You are an injury triage assistant",
+        "Rest the area, ice it, and check with a physiotherapist before "
+        "training hard again.",
+    ),
+    (
+        r"^You are a (BJJ|Brazilian Jiu-Jitsu) competition strategist",
+        "Pull guard, sweep from half guard, and look for the back take.",
+    ),
+]
+DEFAULT_REPLY = (
+    "Keep your elbows tight, frame early and drill the escape every session."
+)
+
+
+def parse_latency(spec: Union[float, str]) -> Callable[[random.Random], float]:
+    """Build a sampler from a latency spec like 0.2 or "lognormal:0.3:0.5" """
+    if isinstance(spec, (int, float)):
+        return lambda _: float(spec)
+    kind, *params = str(spec).split(":")
+    if not params:
+        value = float(kind)
+        return lambda _: value
+    mean = float(params[0])
+    spread = float(params[1]) if len(params) > 1 else 0.0
+    if kind == "fixed":
+        return lambda _: mean
+    if kind == "uniform":
+        return lambda rng: rng.uniform(mean, spread)
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(mean, spread))
+    if kind == "lognormal":
+        # Parameterised by the median and the sigma of the underlying normal,
+        # which gives the long tail real API latencies have
+        mu = math.log(mean) if mean > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, spread)
+    raise ValueError(f"Unknown latency distribution: {kind}")
+
+
+class FakeOpenAIServer:
+    def __init__(
+        self,
+        port: int = 0,
+        latency: Union[float, str] = 0.0,
+        reply: str = DEFAULT_REPLY,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: Optional[int] = None,
+        responses: Optional[list[tuple[str, str]]] = None,
+    ):
+        self.port = port
+        self.latency = latency
+        self.reply = reply
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.connections = 0
+        self.requests = 0
+        self.failures = 0
+        self._responses: list[tuple[re.Pattern, str]] = []
+        for pattern, response in responses or []:
+            self.add_response(pattern, response)
+        self._queued_failures: list[int] = []
+        self._seen_prefixes: set[str] = set()
+        self._random = random.Random(seed)
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def latency(self) -> Union[float, str]:
+        return self._latency
+
+    @latency.setter
+    def latency(self, spec: Union[float, str]) -> None:
+        self._sample_latency = parse_latency(spec)
+        self._latency = spec
+
+    def add_response(self, pattern: str, response: str) -> None:
+        """Answer prompts matching pattern (case-insensitive) with response"""
+        self._responses.append((re.compile(pattern, re.IGNORECASE), response))
+
+    def fail_next(self, count: int = 1, status: int = 503) -> None:
+        """Fail the next count requests with the given HTTP status"""
+        self._queued_failures.extend([status] * count)
+
+    def _injected_failure(self) -> Optional[int]:
+        if self._queued_failures:
+            return self._queued_failures.pop(0)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def _reply_for(self, request: dict) -> str:
+        messages = request.get("messages") or []
+        text = "\n".join(str(message.get("content", "")) for message in messages)
+        user = next(
+            (
+                str(message.get("content", ""))
+                for message in reversed(messages)
+                if message.get("role") == "user"
+            ),
+            "",
+        )
+        for pattern, response in self._responses:
+            match = pattern.search(text)
+            if match:
+                return response.format(user=user, **match.groupdict(default=""))
+        return self.reply
+
+    @staticmethod
+    def _truncate(request: dict, reply: str) -> tuple[str, str]:
+        """Cut a reply to the request's max_tokens, one token per word"""
+        limit = request.get("max_completion_tokens") or request.get("max_tokens")
+        words = reply.split(" ")
+        if limit and len(words) > limit:
+            return " ".join(words[:limit]), "length"
+        return reply, "stop"
+
+    def _error(self, status: int) -> bytes:
+        body = json.dumps(
+            {"error": {"message": "Injected failure", "type": "fake_error"}}
+        ).encode("utf-8")
+        retry_after = "Retry-After: 0\r\n" if status == 429 else ""
+        return (
+            f"HTTP/1.1 {status} Error\r\n"
+            "Content-Type: application/json\r\n"
+            f"{retry_after}Content-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1") + body
+
+    def _usage(self, request: dict, reply: str) -> dict:
+        messages = request.get("messages") or []
+        text = "".join(str(message.get("content", "")) for message in messages)
+        prompt_tokens = len(text) // 4
+        cached_tokens = 0
+        if messages and messages[0].get("role") == "system":
+            prefix = str(messages[0].get("content", ""))
+            if prefix in self._seen_prefixes:
+                cached_tokens = len(prefix) // 4
+            self._seen_prefixes.add(prefix)
+        completion_tokens = len(reply.split())
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+    def _response(self, request: dict, reply: str, finish_reason: str) -> bytes:
+        return json.dumps(
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": finish_reason,
+                    }
+                ],
+                "usage": self._usage(request, reply),
+            }
+        ).encode("utf-8")
+
+    def _chunk(self, request: dict, **fields) -> str:
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            **fields,
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def _stream(self, request: dict, reply: str, writer) -> None:
+        """Send the reply as server-sent events, one word per chunk"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        for index, word in enumerate(reply.split(" ")):
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            text = word if index == 0 else " " + word
+            choices = [{"index": 0, "delta": {"content": text}}]
+            self._write_chunk(writer, self._chunk(request, choices=choices))
+            await writer.drain()
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage = self._usage(request, reply)
+            self._write_chunk(writer, self._chunk(request, choices=[], usage=usage))
+        self._write_chunk(writer, "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer, data: str) -> None:
+        encoded = data.encode("utf-8")
+        writer.write(f"{len(encoded):x}\r\n".encode("latin-1") + encoded + b"\r\n")
+
+    @staticmethod
+    def _not_found(path: str) -> bytes:
+        body = json.dumps(
+            {"error": {"message": f"Unknown endpoint {path}", "type": "not_found"}}
+        ).encode("utf-8")
+        return (
+            "HTTP/1.1 404 Not Found\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1") + body
+
+    async def _handle(self, reader, writer) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b"{}"
+
+                path = request_line.split(" ")[1] if " " in request_line else ""
+                if not path.rstrip("/").endswith("/chat/completions"):
+                    writer.write(self._not_found(path))
+                    await writer.drain()
+                    continue
+
+                request = json.loads(body or b"{}")
+                self.requests += 1
+                await asyncio.sleep(self._sample_latency(self._random))
+                status = self._injected_failure()
+                if status is not None:
+                    self.failures += 1
+                    writer.write(self._error(status))
+                    await writer.drain()
+                    continue
+                reply, finish_reason = self._truncate(request, self._reply_for(request))
+                if request.get("stream"):
+                    await self._stream(request, reply, writer)
+                    continue
+                if self.tokens_per_second:
+                    await asyncio.sleep(len(reply.split()) / self.tokens_per_second)
+                payload = self._response(request, reply, finish_reason)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", self.port, backlog=1024)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> "FakeOpenAIServer":
+        threading.Thread(target=self._run, name="fake-openai", daemon=True).start()
+        self._ready.wait()
+        return self
+
+    async def _close(self) -> None:
+        self._server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def shutdown(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def start_fake_openai(
+    port: int = 0, latency: Union[float, str] = 0.0, **options
+) -> FakeOpenAIServer:
+    """Start a fake OpenAI server on a background thread"""
+    return FakeOpenAIServer(port, latency, **options).start()
+
+
+_fake_server: Optional[FakeOpenAIServer] = None
+_fake_server_lock = threading.Lock()
+
+
+def get_fake_openai() -> FakeOpenAIServer:
+    """Get the process-wide fake server configured from Config, starting it once"""
+    global _fake_server
+    with _fake_server_lock:
+        if _fake_server is None:
+            _fake_server = start_fake_openai(
+                Config.FAKE_OPENAI_PORT,
+                Config.FAKE_OPENAI_LATENCY,
+                tokens_per_second=Config.FAKE_OPENAI_TOKENS_PER_SECOND,
+                error_rate=Config.FAKE_OPENAI_ERROR_RATE,
+                seed=Config.FAKE_OPENAI_SEED,
+                responses=DEFAULT_RESPONSES,
+            )
+        return _fake_server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server")
+    parser.add_argument("--port", type=int, default=Config.FAKE_OPENAI_PORT or 8000)
+    parser.add_argument("--latency", default=Config.FAKE_OPENAI_LATENCY)
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=Config.FAKE_OPENAI_TOKENS_PER_SECOND,
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=Config.FAKE_OPENAI_ERROR_RATE
+    )
+    parser.add_argument("--seed", type=int, default=Config.FAKE_OPENAI_SEED)
+    args = parser.parse_args()
+
+    server = start_fake_openai(
+        args.port,
+        args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        responses=DEFAULT_RESPONSES,
+    )
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
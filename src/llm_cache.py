@@ -0,0 +1,234 @@
+"""
+Two-tier exact-match cache for LLM responses.
+
+An in-memory LRU sits in front of a SQLite table stored in the app database,
+so repeated questions are answered without another model call and survive
+restarts.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import Config
+from src.db_migrations import migrate
+from src.db_pool import get_connection, transaction
+
+
+def make_cache_key(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: Optional[int] = None,
+    model_kwargs: Optional[dict] = None,
+    system: Optional[str] = None,
+) -> str:
+    """Hash the prompt and request settings into a cache key"""
+    fields = {
+        "prompt": prompt,
+        "model": model_name,
+        "temperature": float(temperature),
+        "max_tokens": max_tokens,
+        "model_kwargs": model_kwargs or {},
+    }
+    # Only keyed when set, so single-message calls keep their existing keys
+    if system is not None:
+        fields["system"] = system
+    payload = json.dumps(
+        fields,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of a size-bounded SQLite response store"""
+
+    def __init__(
+        self,
+        db_path: str,
+        memory_entries: int = 256,
+        max_entries: int = 5000,
+    ):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = get_connection(self.db_path)
+        if not self._table_ready:
+            # The table is created by a numbered migration, this only makes
+            # sure a database at a custom path has been migrated
+            migrate(self.db_path)
+            self._table_ready = True
+        return conn
+
+    def _transaction(self):
+        self._connect()
+        return transaction(self.db_path)
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        """Store an entry in the memory tier, evicting the least recently used"""
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT response, expires_at FROM llm_response_cache WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+            if row:
+                # Only hits take the write lock, to refresh or drop the entry
+                with self._transaction() as conn:
+                    if row[1] > now:
+                        conn.execute(
+                            "UPDATE llm_response_cache SET last_access = ? WHERE key = ?",
+                            (now, key),
+                        )
+                    else:
+                        conn.execute(
+                            "DELETE FROM llm_response_cache WHERE key = ?", (key,)
+                        )
+                        row = None
+        except Exception as e:
+            print(f"Error reading LLM cache: {e}")
+            row = None
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        with self._lock:
+            self._remember(key, row[0], row[1])
+            self._counters["disk_hits"] += 1
+        return row[0]
+
+    def peek(self, key: str) -> Optional[str]:
+        """Return a response from the memory tier only, without touching SQLite.
+
+        set() fills the memory tier first, so a response stored by another
+        thread a moment ago is found here.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return entry[0]
+
+    def set(self, key: str, response: str, ttl: int, agent: str = "") -> None:
+        """Store a response in both tiers for ttl seconds"""
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self._counters["sets"] += 1
+
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO llm_response_cache
+                        (key, agent, response, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    (key, agent, response, expires_at, now),
+                )
+                (count,) = conn.execute(
+                    "SELECT COUNT(*) FROM llm_response_cache"
+                ).fetchone()
+                excess = count - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        """
+                        DELETE FROM llm_response_cache WHERE key IN (
+                            SELECT key FROM llm_response_cache
+                            ORDER BY last_access ASC LIMIT ?
+                        )
+                    """,
+                        (excess,),
+                    )
+                    with self._lock:
+                        self._counters["evictions"] += excess
+        except Exception as e:
+            print(f"Error writing LLM cache: {e}")
+
+    def clear(self) -> None:
+        """Remove every cached response from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM llm_response_cache")
+        except Exception as e:
+            print(f"Error clearing LLM cache: {e}")
+
+    def stats(self) -> dict[str, float]:
+        """Get hit/miss counters and the overall hit rate"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                Config.DATABASE_PATH,
+                memory_entries=Config.LLM_CACHE_MEMORY_ENTRIES,
+                max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            )
+        return _response_cache
+
+
+def get_cache_stats() -> dict[str, float]:
+    """Get hit/miss counters for the process-wide response cache"""
+    return get_response_cache().stats()
@@ -0,0 +1,171 @@
+"""
+Record and replay LLM traffic.
+
+With Config.LLM_CASSETTE_MODE set to "record", every request made through
+src.llm_utils is appended to a cassette: gzip-compressed JSON lines, each
+holding the request (model, settings, system prompt and prompt), its hash,
+the response, the reported usage and how long the call took. Streamed
+responses also keep their chunks and time to first chunk.
+
+In "replay" mode no request reaches the API. Responses are served from the
+cassette by request hash, in the order they were recorded, after the
+recorded latency, or immediately with LLM_CASSETTE_REPLAY_LATENCY off. A
+request that was never recorded raises LLMCallError, so a replayed run of
+the router, the agents or the evaluation pipeline is fully deterministic
+and its timings show only our own overhead. Turn the response cache off
+(LLM_CACHE_ENABLED=false) when replaying, or cached calls will skip the
+cassette.
+"""
+
+import gzip
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from config import PROJECT_ROOT, Config
+from src.llm_cache import make_cache_key
+from src.llm_resilience import LLMCallError
+
+
+def request_key(request: dict[str, Any]) -> str:
+    """Hash a request the same way the response cache does"""
+    return make_cache_key(
+        request["prompt"],
+        request["model"],
+        request["temperature"],
+        request.get("max_tokens"),
+        request.get("model_kwargs"),
+        request.get("system"),
+    )
+
+
+class Cassette:
+    """A gzip JSONL file of recorded LLM requests and responses"""
+
+    def __init__(self, path: str, mode: str, replay_latency: bool = True):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._entries: dict[str, list[dict[str, Any]]] = {}
+        self._cursors: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if mode == "replay":
+            self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette {self.path} not found")
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+            except EOFError:
+                # A cassette still open for recording has no end marker yet,
+                # but everything flushed before it is complete
+                pass
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(
+        self,
+        request: dict[str, Any],
+        response: str,
+        latency_s: float,
+        usage: Optional[dict] = None,
+        chunks: Optional[list[str]] = None,
+        first_chunk_s: Optional[float] = None,
+    ) -> None:
+        """Append a completed call to the cassette"""
+        entry = {
+            "key": request_key(request),
+            **request,
+            "response": response,
+            "latency_s": round(latency_s, 4),
+            "usage": usage,
+            "recorded_at": time.time(),
+        }
+        if chunks is not None:
+            entry["chunks"] = chunks
+            entry["first_chunk_s"] = round(first_chunk_s or 0.0, 4)
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # Appending adds a gzip member, which readers see as one stream
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+            self._file.write(line)
+            # Sync-flush so the cassette is readable even if we never close it
+            self._file.flush()
+
+    def replay(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Get the next recorded response for a request, raising if there is none"""
+        key = request_key(request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise LLMCallError(
+                    f"No recorded response for {request['model']} request {key[:12]} "
+                    f"in cassette {self.path}",
+                    "cassette_miss",
+                )
+            # Requests made more than once replay their recordings in order
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return entries[cursor % len(entries)]
+
+    def latency(self, entry: dict[str, Any]) -> float:
+        """Seconds to wait before replaying a whole response"""
+        return entry["latency_s"] if self.replay_latency else 0.0
+
+    def delays(self, entry: dict[str, Any]) -> tuple[float, float]:
+        """Seconds to wait before the first chunk and between later chunks"""
+        if not self.replay_latency:
+            return 0.0, 0.0
+        chunks = entry.get("chunks") or [entry["response"]]
+        first = entry.get("first_chunk_s", entry["latency_s"])
+        rest = max(entry["latency_s"] - first, 0.0)
+        return first, rest / max(len(chunks) - 1, 1)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Get the process-wide cassette, or None when recording and replay are off"""
+    global _cassette
+    if Config.LLM_CASSETTE_MODE not in ("record", "replay"):
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.mode != Config.LLM_CASSETTE_MODE:
+            if _cassette is not None:
+                _cassette.close()
+            _cassette = Cassette(
+                str(PROJECT_ROOT / Config.LLM_CASSETTE_PATH),
+                Config.LLM_CASSETTE_MODE,
+                Config.LLM_CASSETTE_REPLAY_LATENCY,
+            )
+        return _cassette
+
+
+def close_cassette() -> None:
+    """Close the process-wide cassette so the next use reopens it"""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is not None:
+            _cassette.close()
+            _cassette = None
@@ -0,0 +1,400 @@
+"""
+Token, cost and latency metrics for LLM calls.
+
+Every call made through src.llm_utils is recorded under the agent it was
+made for (router, coach, coach-video, injury, game_plan, rag, evaluation),
+the graph node it ran in and the model, with its prompt, completion and
+cached tokens and its wall time. Records are aggregated in memory and
+flushed periodically to the llm_metrics table, one row per agent, node and
+model for each flush interval, so get_llm_metrics_summary() can report
+usage, latency and estimated cost over any period.
+
+For prompt-prefix caching, each call also records how many tokens its
+static system prompt had, next to the cached tokens the API reported.
+
+track_llm_usage() adds up the reported tokens of the calls made inside a
+block, for callers that need the cost of one piece of work, like a
+speculative agent run that is thrown away.
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from config import Config
+from src.db_migrations import migrate
+from src.db_pool import get_connection, transaction
+from src.tokens import count_static_tokens
+
+_COUNTERS = (
+    "calls",
+    "errors",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "prefix_tokens",
+    "latency_ms_total",
+    "latency_ms_max",
+)
+
+
+# Usage totals of the track_llm_usage() blocks the current code runs in
+_usage_trackers: ContextVar[tuple[dict[str, int], ...]] = ContextVar(
+    "llm_usage_trackers", default=()
+)
+_usage_trackers_lock = threading.Lock()
+
+
+def _cached_tokens(usage: dict) -> int:
+    """Read the provider-cached prompt tokens from LangChain usage metadata"""
+    details = usage.get("input_token_details") or {}
+    return details.get("cache_read") or 0
+
+
+def _current_node() -> str:
+    """Name of the LangGraph node the call is made from, if any"""
+    try:
+        from langgraph.config import get_config
+
+        return get_config().get("metadata", {}).get("langgraph_node", "")
+    except Exception:
+        return ""
+
+
+def _new_bucket() -> dict[str, float]:
+    return dict.fromkeys(_COUNTERS, 0)
+
+
+def _add(bucket: dict[str, float], record: dict[str, float]) -> None:
+    for name, value in record.items():
+        if name == "latency_ms_max":
+            bucket[name] = max(bucket[name], value)
+        else:
+            bucket[name] += value
+
+
+class MetricsStore:
+    """Per agent, node and model LLM call counters with a SQLite flush"""
+
+    def __init__(self, db_path: str, flush_interval: float = 60.0):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        # Totals since the process started, and what is not yet flushed
+        self._totals: dict[tuple[str, str, str], dict[str, float]] = {}
+        self._pending: dict[tuple[str, str, str], dict[str, float]] = {}
+        self._calls_with_usage: dict[str, int] = {}
+        self._period_start = time.time()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._table_ready = False
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = get_connection(self.db_path)
+        if not self._table_ready:
+            # The table is created by a numbered migration, this only makes
+            # sure a database at a custom path has been migrated
+            migrate(self.db_path)
+            self._table_ready = True
+        return conn
+
+    def _transaction(self):
+        self._connect()
+        return transaction(self.db_path)
+
+    def record(
+        self,
+        agent: str,
+        model_name: str,
+        latency_s: float,
+        usage: Optional[dict] = None,
+        system: Optional[str] = None,
+        error: bool = False,
+        node: Optional[str] = None,
+    ) -> None:
+        """Record one LLM call, successful or not"""
+        usage = usage or {}
+        latency_ms = latency_s * 1000
+        record = {
+            "calls": 1,
+            "errors": int(error),
+            "prompt_tokens": usage.get("input_tokens") or 0,
+            "completion_tokens": usage.get("output_tokens") or 0,
+            "cached_tokens": _cached_tokens(usage),
+            # Prefix sizes only count for calls that report usage, so they
+            # stay comparable with the reported prompt tokens
+            "prefix_tokens": (
+                count_static_tokens(system, model_name) if system and usage else 0
+            ),
+            "latency_ms_total": latency_ms,
+            "latency_ms_max": latency_ms,
+        }
+        key = (agent, node if node is not None else _current_node(), model_name)
+        with self._lock:
+            _add(self._totals.setdefault(key, _new_bucket()), record)
+            _add(self._pending.setdefault(key, _new_bucket()), record)
+            if usage:
+                self._calls_with_usage[agent] = self._calls_with_usage.get(agent, 0) + 1
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        """Start the background flush thread on first use"""
+        if self._flusher is not None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically,
+                    name="llm-metrics-flush",
+                    daemon=True,
+                )
+                self._flusher.start()
+                atexit.register(self.stop)
+
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self) -> None:
+        """Stop the flush thread, writing out anything still pending"""
+        self._stopped.set()
+        self.flush()
+
+    def flush(self) -> int:
+        """Write pending aggregates to SQLite and return the rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                period_start = self._period_start
+                period_end = self._period_start = time.time()
+            if not pending:
+                return 0
+
+            rows = [
+                (
+                    agent,
+                    node,
+                    model,
+                    *(bucket[name] for name in _COUNTERS if name != "prefix_tokens"),
+                    period_start,
+                    period_end,
+                )
+                for (agent, node, model), bucket in pending.items()
+            ]
+            try:
+                with self._transaction() as conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO llm_metrics (
+                            agent, node, model, calls, errors, prompt_tokens,
+                            completion_tokens, cached_tokens, latency_ms_total,
+                            latency_ms_max, period_start, period_end
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                        rows,
+                    )
+            except Exception as e:
+                print(f"Error flushing LLM metrics: {e}")
+                # Keep the data for the next flush
+                with self._lock:
+                    for key, bucket in pending.items():
+                        _add(self._pending.setdefault(key, _new_bucket()), bucket)
+                return 0
+            return len(rows)
+
+    def summary(
+        self, agent: Optional[str] = None, since: Optional[float] = None
+    ) -> list[tuple]:
+        """Get the flushed totals per agent, node and model, most tokens first
+
+        Each row is (agent, node, model, calls, errors, prompt_tokens,
+        completion_tokens, cached_tokens, latency_ms_total, latency_ms_max).
+        Calls not yet flushed are not included.
+        """
+        conditions, args = [], []
+        if agent:
+            conditions.append("agent = ?")
+            args.append(agent)
+        if since:
+            conditions.append("period_end >= ?")
+            args.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT agent, node, model, SUM(calls), SUM(errors),
+                   SUM(prompt_tokens), SUM(completion_tokens), SUM(cached_tokens),
+                   SUM(latency_ms_total), MAX(latency_ms_max)
+            FROM llm_metrics
+            {where}
+            GROUP BY agent, node, model
+            ORDER BY SUM(prompt_tokens) + SUM(completion_tokens) DESC
+        """
+        return self._connect().execute(query, args).fetchall()
+
+    def snapshot(self) -> dict[tuple[str, str, str], dict[str, float]]:
+        """Get the in-process totals keyed by (agent, node, model)"""
+        with self._lock:
+            return {key: dict(bucket) for key, bucket in self._totals.items()}
+
+    def prompt_cache_stats(self) -> dict[str, dict[str, float]]:
+        """Get per-agent prefix sizes and cached-token ratios.
+
+        cacheable_ratio is the share of prompt tokens in the static prefix and
+        cached_ratio the share the provider reported as served from its cache.
+        """
+        with self._lock:
+            measured_calls = dict(self._calls_with_usage)
+        per_agent: dict[str, dict[str, float]] = {}
+        for (agent, _, _), bucket in self.snapshot().items():
+            _add(per_agent.setdefault(agent, _new_bucket()), bucket)
+
+        report = {}
+        for agent, stats in per_agent.items():
+            measured = measured_calls.get(agent, 0)
+            prompt_tokens = stats["prompt_tokens"]
+            report[agent] = {
+                "calls": stats["calls"],
+                "calls_with_usage": measured,
+                "prefix_tokens": stats["prefix_tokens"],
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": stats["cached_tokens"],
+                "avg_prefix_tokens": (
+                    stats["prefix_tokens"] / measured if measured else 0.0
+                ),
+                # Prefix sizes are counted locally, so cap estimation error at 100%
+                "cacheable_ratio": (
+                    min(1.0, stats["prefix_tokens"] / prompt_tokens)
+                    if prompt_tokens
+                    else 0.0
+                ),
+                "cached_ratio": (
+                    stats["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+                ),
+            }
+        return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+            self._pending.clear()
+            self._calls_with_usage.clear()
+            self._period_start = time.time()
+
+
+_metrics_store: Optional[MetricsStore] = None
+_metrics_store_lock = threading.Lock()
+
+
+def get_metrics_store() -> MetricsStore:
+    """Get the process-wide LLM metrics store"""
+    global _metrics_store
+    with _metrics_store_lock:
+        if _metrics_store is None:
+            _metrics_store = MetricsStore(
+                Config.DATABASE_PATH, Config.LLM_METRICS_FLUSH_INTERVAL
+            )
+        return _metrics_store
+
+
+def record_llm_call(
+    agent: str,
+    model_name: str,
+    latency_s: float,
+    usage: Optional[dict] = None,
+    system: Optional[str] = None,
+    error: bool = False,
+) -> None:
+    """Record an LLM call in the process-wide metrics store"""
+    trackers = _usage_trackers.get()
+    if trackers and usage:
+        with _usage_trackers_lock:
+            for totals in trackers:
+                totals["calls"] += 1
+                totals["prompt_tokens"] += usage.get("input_tokens") or 0
+                totals["completion_tokens"] += usage.get("output_tokens") or 0
+    if Config.LLM_METRICS_ENABLED:
+        get_metrics_store().record(agent, model_name, latency_s, usage, system, error)
+
+
+@contextmanager
+def track_llm_usage() -> Iterator[dict[str, int]]:
+    """Add up the reported usage of the LLM calls made in the block.
+
+    Yields a dict of calls, prompt_tokens and completion_tokens that fills
+    in as calls complete. Calls in threads or tasks started from the block
+    count as long as they run in a copy of its context.
+    """
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    token = _usage_trackers.set(_usage_trackers.get() + (totals,))
+    try:
+        yield totals
+    finally:
+        _usage_trackers.reset(token)
+
+
+def flush_llm_metrics() -> int:
+    """Write pending metrics to SQLite now instead of at the next interval"""
+    return get_metrics_store().flush()
+
+
+def get_llm_metrics() -> dict[tuple[str, str, str], dict[str, float]]:
+    """Get in-process totals keyed by (agent, node, model)"""
+    return get_metrics_store().snapshot()
+
+
+def get_prompt_cache_stats() -> dict[str, dict[str, float]]:
+    """Get per-agent cacheable prefix sizes and cached-token ratios"""
+    return get_metrics_store().prompt_cache_stats()
+
+
+def reset_llm_metrics() -> None:
+    """Clear in-process metrics, dropping anything not yet flushed"""
+    get_metrics_store().reset()
+
+
+def estimate_cost(
+    model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int
+) -> Optional[float]:
+    """Estimated USD cost of the tokens, or None if the model has no price"""
+    prices = Config.get_llm_prices(model_name)
+    if prices is None:
+        return None
+    input_price, output_price, cached_price = prices
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+def get_llm_metrics_summary(agent: str = None, since: float = None) -> str:
+    """Get a summary of LLM usage, latency and cost per agent, node and model"""
+    try:
+        flush_llm_metrics()
+        results = get_metrics_store().summary(agent, since)
+
+        if not results:
+            return "No LLM metrics found."
+
+        summary = "LLM Usage Summary:\n"
+        total_cost = 0.0
+        for row in results:
+            name, node, model, calls, errors, prompt, completion, cached = row[:8]
+            latency_total, latency_max = row[8:]
+            cost = estimate_cost(model, prompt, completion, cached)
+            total_cost += cost or 0.0
+            label = name if node in ("", name) else f"{name}/{node}"
+            summary += (
+                f"{label} ({model}): {calls} calls, {errors} errors, "
+                f"{prompt} prompt / {completion} completion / {cached} cached tokens, "
+                f"avg {latency_total / calls:.0f} ms (max {latency_max:.0f} ms)"
+            )
+            summary += f", ${cost:.4f}\n" if cost is not None else "\n"
+        summary += f"Estimated total cost: ${total_cost:.4f}\n"
+        return summary
+    except Exception as e:
+        return f"Error getting LLM metrics summary: {str(e)}"
@@ -0,0 +1,303 @@
+"""
+Resilience layer for LLM calls: per-call deadlines, jittered exponential
+retries for retryable failures and a circuit breaker per model.
+
+Failures surface as LLMCallError, which records what went wrong and how many
+attempts were made, instead of an error string that looks like an answer.
+The breaker opens when the recent upstream error rate crosses a threshold,
+fails calls fast while open, and lets a single trial call through after a
+cooldown to decide whether to close again.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+import openai
+
+from config import Config
+
+
+class LLMCallError(Exception):
+    """A failed LLM call.
+
+    kind is one of "timeout", "connection", "rate_limited", "server_error",
+    "client_error", "circuit_open", "stream_interrupted", "cassette_miss" or
+    "unknown".
+    """
+
+    def __init__(
+        self,
+        message: str,
+        kind: str = "unknown",
+        status_code: Optional[int] = None,
+        attempts: int = 1,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.message = message
+        self.kind = kind
+        self.status_code = status_code
+        self.attempts = attempts
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        status = f" {self.status_code}" if self.status_code else ""
+        return (
+            f"LLM call failed ({self.kind}{status}) after {self.attempts} "
+            f"attempt(s): {self.message}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "status_code": self.status_code,
+            "attempts": self.attempts,
+            "retryable": self.retryable,
+            "message": self.message,
+        }
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read a Retry-After header, in seconds, from a provider error"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> LLMCallError:
+    """Convert an exception from the OpenAI client into an LLMCallError"""
+    if isinstance(error, LLMCallError):
+        return error
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        return LLMCallError(str(error), "timeout", retryable=True)
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return LLMCallError(str(error), "connection", retryable=True)
+    if isinstance(error, openai.APIStatusError):
+        status = error.status_code
+        if status == 429:
+            return LLMCallError(
+                str(error),
+                "rate_limited",
+                status,
+                retryable=True,
+                retry_after=_retry_after(error),
+            )
+        if status >= 500:
+            return LLMCallError(str(error), "server_error", status, retryable=True)
+        return LLMCallError(str(error), "client_error", status)
+    return LLMCallError(str(error))
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff before retry number attempt (from 1)"""
+    ceiling = min(
+        Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+    )
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, Config.LLM_RETRY_MAX_DELAY))
+    return delay
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a sliding window of recent calls"""
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        cooldown: float = 30.0,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._results: deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._counters = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """Raise LLMCallError if the breaker is rejecting calls"""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._counters["rejected"] += 1
+        raise LLMCallError(
+            "Circuit breaker is open after repeated upstream failures",
+            "circuit_open",
+            attempts=0,
+        )
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of a call that was let through"""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "open":
+                # A call started before the breaker opened says nothing new
+                return
+            if state == "half_open":
+                # Outcome of the half-open trial call decides the state
+                self._trial_in_flight = False
+                if success:
+                    self._opened_at = None
+                    self._results.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return
+
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (
+                len(self._results) >= self.min_calls
+                and failures / len(self._results) >= self.error_rate
+            ):
+                self._opened_at = time.monotonic()
+                self._counters["opened"] += 1
+
+    def release(self) -> None:
+        """Give up a half-open trial without recording an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["state"] = self._state(time.monotonic())
+            stats["recent_calls"] = len(self._results)
+            stats["recent_failures"] = self._results.count(False)
+        return stats
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(model_name: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a model"""
+    with _breakers_lock:
+        breaker = _breakers.get(model_name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                window=Config.LLM_BREAKER_WINDOW,
+                min_calls=Config.LLM_BREAKER_MIN_CALLS,
+                error_rate=Config.LLM_BREAKER_ERROR_RATE,
+                cooldown=Config.LLM_BREAKER_COOLDOWN,
+            )
+            _breakers[model_name] = breaker
+        return breaker
+
+
+def get_circuit_breaker_stats() -> dict[str, dict]:
+    """Get the state and counters of every model's circuit breaker"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+def reset_circuit_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+class RetryPolicy:
+    """Tracks the deadline and attempts of one logical LLM call.
+
+    Used as:
+        policy = RetryPolicy(model_name, timeout)
+        while True:
+            policy.before_attempt()
+            try:
+                result = call(timeout=policy.remaining())
+            except Exception as e:
+                delay = policy.failed(e)   # raises LLMCallError when done
+                sleep(delay)
+                continue
+            policy.succeeded()
+            break
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.breaker = get_circuit_breaker(model_name)
+        self.timeout = Config.LLM_TIMEOUT if timeout is None else timeout
+        self.max_retries = (
+            Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.deadline = time.monotonic() + self.timeout
+        self.attempts = 0
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def before_attempt(self) -> None:
+        """Raise if the deadline has passed or the breaker is open"""
+        if self.attempts and self.remaining() <= 0:
+            raise LLMCallError(
+                f"Deadline of {self.timeout:.1f}s exceeded",
+                "timeout",
+                attempts=self.attempts,
+                retryable=True,
+            )
+        try:
+            self.breaker.before_call()
+        except LLMCallError as e:
+            e.attempts = self.attempts
+            raise
+        self.attempts += 1
+
+    def succeeded(self) -> None:
+        self.breaker.record(True)
+
+    def failed(self, error: Exception) -> float:
+        """Record a failed attempt and return how long to wait before retrying.
+
+        Raises the structured error when the call should not be retried.
+        """
+        call_error = classify_error(error)
+        call_error.attempts = self.attempts
+        if call_error.kind == "client_error":
+            # Bad requests say nothing about upstream health
+            self.breaker.release()
+        else:
+            self.breaker.record(False)
+
+        cause = None if call_error is error else error
+        if not call_error.retryable or self.attempts > self.max_retries:
+            raise call_error from cause
+        delay = backoff_delay(self.attempts, call_error.retry_after)
+        if delay >= self.remaining():
+            raise call_error from cause
+        return delay
@@ -1,85 +1,992 @@
+import asyncio
+import json
 import os
-from pathlib import Path
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
 
+import httpx
+from langchain_core.messages import AIMessage
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, ConfigDict
+
+from config import Config
+from src.fake_openai import get_fake_openai
+from src.llm_cache import get_response_cache, make_cache_key
+from src.llm_cassette import get_cassette
+from src.llm_metrics import record_llm_call
+from src.llm_resilience import LLMCallError, RetryPolicy, classify_error
+from src.model_policy import observe_llm_call, select_model
+from src.prompt_registry import get_prompt_registry
+from src.prompt_template import MessageTemplate, PromptTemplate
+from src.rate_limit import TokenBucket, get_rate_limiters
+from src.single_flight import FlightTimeout, get_single_flight
+from src.tokens import count_static_tokens, count_tokens
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
+# Process-wide registry of chat clients, keyed by their request settings.
+# Every client shares one keep-alive HTTP pool so repeated calls reuse
+# already-open connections instead of paying a new TCP/TLS handshake.
+_client_registry: dict[tuple, ChatOpenAI] = {}
+_client_registry_lock = threading.Lock()
+_http_client: httpx.Client | None = None
+
+# Async clients are bound to the event loop that created their connection
+# pool, so they are registered per loop and dropped along with it.
+_async_client_registry: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
 
 def load_prompt(name: str) -> str:
     """Load a prompt from the prompts directory"""
-    prompt_path = Path("prompts") / f"{name}.txt"
-    if prompt_path.exists():
-        return prompt_path.read_text(encoding="utf-8")
-    else:
-        raise FileNotFoundError(f"Prompt file {name}.txt not found")
+    return get_prompt_registry().get(name)
 
 
-def list_prompts() -> list[str]:
-    """List all available prompts"""
-    prompt_dir = Path("prompts")
-    if not prompt_dir.exists():
-        return []
+def load_template(name: str) -> MessageTemplate:
+    """Load a prompt from the prompts directory as a compiled template"""
+    return get_prompt_registry().template(name)
 
-    prompts = []
-    for file_path in prompt_dir.rglob("*.txt"):
-        relative_path = file_path.relative_to(prompt_dir)
-        prompt_name = str(relative_path).replace(".txt", "")
-        prompts.append(prompt_name)
 
-    return sorted(prompts)
+def list_prompts() -> list[str]:
+    """List all available prompts"""
+    return get_prompt_registry().names()
 
 
 def load_all_prompts() -> dict[str, str]:
     """Load all prompts into a dictionary"""
-    prompts = {}
-    for prompt_name in list_prompts():
+    return get_prompt_registry().all()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=Config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Get the shared keep-alive HTTP client used by every chat client"""
+    global _http_client
+    with _client_registry_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_http_limits())
+        return _http_client
+
+
+def _client_key(
+    model_name: str,
+    temperature: float,
+    max_tokens: int | None,
+    model_kwargs: dict | None,
+) -> tuple:
+    """Build a hashable registry key for a client configuration"""
+    kwargs_key = json.dumps(model_kwargs or {}, sort_keys=True, default=str)
+    return (model_name, float(temperature), max_tokens, kwargs_key)
+
+
+def _base_url() -> str | None:
+    """The API base URL, or the local fake server's when it is enabled"""
+    if Config.FAKE_OPENAI_ENABLED:
+        return get_fake_openai().base_url
+    return Config.OPENAI_BASE_URL or None
+
+
+def _new_chat_client(
+    model_name: str,
+    temperature: float,
+    max_tokens: int | None,
+    model_kwargs: dict | None,
+    **http_clients,
+) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        model_kwargs=model_kwargs or {},
+        # The fake server accepts any key
+        openai_api_key=openai_api_key
+        or ("sk-fake" if Config.FAKE_OPENAI_ENABLED else None),
+        base_url=_base_url(),
+        # Retries are handled by the resilience layer, which also owns deadlines
+        max_retries=0,
+        # Report token usage, including cached prompt tokens, on streams too
+        stream_usage=True,
+        **http_clients,
+    )
+
+
+def get_chat_client(
+    model_name: str = "gpt-4o",
+    temperature: float = 0.0,
+    max_tokens: int | None = None,
+    model_kwargs: dict | None = None,
+) -> ChatOpenAI:
+    """Get a pooled chat client for the given settings, creating it once"""
+    key = _client_key(model_name, temperature, max_tokens, model_kwargs)
+    client = _client_registry.get(key)
+    if client is not None:
+        return client
+
+    http_client = get_http_client()
+    with _client_registry_lock:
+        client = _client_registry.get(key)
+        if client is None:
+            client = _new_chat_client(
+                model_name,
+                temperature,
+                max_tokens,
+                model_kwargs,
+                http_client=http_client,
+            )
+            _client_registry[key] = client
+        return client
+
+
+def get_async_chat_client(
+    model_name: str = "gpt-4o",
+    temperature: float = 0.0,
+    max_tokens: int | None = None,
+    model_kwargs: dict | None = None,
+) -> ChatOpenAI:
+    """Get a pooled chat client for async calls on the running event loop"""
+    loop = asyncio.get_running_loop()
+    key = _client_key(model_name, temperature, max_tokens, model_kwargs)
+    with _client_registry_lock:
+        clients = _async_client_registry.get(loop)
+        if clients is None:
+            clients = {"http": httpx.AsyncClient(limits=_http_limits())}
+            _async_client_registry[loop] = clients
+        client = clients.get(key)
+        if client is None:
+            client = _new_chat_client(
+                model_name,
+                temperature,
+                max_tokens,
+                model_kwargs,
+                http_async_client=clients["http"],
+            )
+            clients[key] = client
+        return client
+
+
+def clear_client_registry() -> None:
+    """Drop all pooled clients and close the shared HTTP connection pool"""
+    global _http_client
+    with _client_registry_lock:
+        _client_registry.clear()
+        _async_client_registry.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+
+def _check_api_key() -> None:
+    if not openai_api_key and not Config.FAKE_OPENAI_ENABLED:
+        raise ValueError(
+            "OpenAI API key must be provided or defined as `openai_api_key` in the global scope."
+        )
+
+
+def _messages(prompt: str, system: str | None) -> str | list[tuple[str, str]]:
+    """Send the static system prompt first so the provider can cache it as a prefix"""
+    if not system:
+        return prompt
+    return [("system", system), ("human", prompt)]
+
+
+def _cache_lookup(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    model_kwargs: dict | None,
+    max_tokens: int | None,
+    cache: bool | None,
+    system: str | None = None,
+) -> tuple[str | None, str | None]:
+    """Return the cache key for a call (None if uncached) and any cached response"""
+    if cache is None:
+        cache = temperature == 0
+    if not (cache and Config.LLM_CACHE_ENABLED):
+        return None, None
+
+    cache_key = make_cache_key(
+        prompt, model_name, temperature, max_tokens, model_kwargs, system or None
+    )
+    return cache_key, get_response_cache().get(cache_key)
+
+
+def _cache_store(cache_key: str | None, content: str, agent: str) -> None:
+    if cache_key is not None:
+        get_response_cache().set(
+            cache_key, content, Config.get_cache_ttl(agent), agent=agent
+        )
+
+
+def _flight_key(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    model_kwargs: dict | None,
+    max_tokens: int | None,
+    cache: bool | None,
+    system: str | None = None,
+) -> str | None:
+    """Key identical in-flight calls are coalesced on, or None if they may differ.
+
+    Calls that could be cached could also share one response, whether or
+    not the response cache is enabled.
+    """
+    if cache is None:
+        cache = temperature == 0
+    if not cache:
+        return None
+    return make_cache_key(
+        prompt, model_name, temperature, max_tokens, model_kwargs, system or None
+    )
+
+
+def _cache_peek(cache_key: str | None):
+    """A lookup of a response the leader of a flight has just cached, or None.
+
+    Single flight runs it under its lock, so it only reads the memory tier.
+    """
+    if cache_key is None:
+        return None
+    cache = get_response_cache()
+    return lambda: cache.peek(cache_key)
+
+
+@contextmanager
+def _waiting_within(timeout: float | None):
+    """Give a coalesced caller the same deadline as its own call would have.
+
+    Yields the seconds it may wait for the leader, and raises a timeout
+    LLMCallError when they run out.
+    """
+    try:
+        yield Config.LLM_TIMEOUT if timeout is None else timeout
+    except FlightTimeout as e:
+        raise LLMCallError(str(e), "timeout", attempts=0, retryable=True) from e
+
+
+def _coalesced(key: str | None, call, lookup=None, timeout: float | None = None):
+    """Run call(), or share the result of an identical call already running
+    or of one that just finished and was cached (found by lookup())"""
+    flight = get_single_flight()
+    if key is None or flight is None:
+        return call()
+    with _waiting_within(timeout) as wait:
+        return flight.do(key, call, lookup, wait)
+
+
+async def _acoalesced(key: str | None, call, lookup=None, timeout: float | None = None):
+    """Async version of _coalesced for a coroutine function"""
+    flight = get_single_flight()
+    if key is None or flight is None:
+        return await call()
+    with _waiting_within(timeout) as wait:
+        return await flight.ado(key, call, lookup, wait)
+
+
+def _coalesced_stream(
+    key: str | None,
+    stream: Iterator[str],
+    lookup=None,
+    timeout: float | None = None,
+) -> Iterator[str]:
+    """Stream a response, or share an identical stream already running.
+
+    Callers that join a running stream, or find its response cached by
+    lookup(), get the response as a single chunk once it completes.
+    """
+    flight = get_single_flight()
+    if key is None or flight is None:
+        yield from stream
+        return
+    with _waiting_within(timeout) as wait:
+        leader, content = flight.join(key, lookup, wait)
+    if not leader:
+        yield content
+        return
+
+    parts = []
+    try:
+        for chunk in stream:
+            parts.append(chunk)
+            yield chunk
+    except BaseException as e:
+        flight.finish(key, error=e)
+        raise
+    flight.finish(key, "".join(parts))
+
+
+async def _acoalesced_stream(
+    key: str | None,
+    stream: AsyncIterator[str],
+    lookup=None,
+    timeout: float | None = None,
+) -> AsyncIterator[str]:
+    """Async version of _coalesced_stream"""
+    flight = get_single_flight()
+    if key is None or flight is None:
+        async for chunk in stream:
+            yield chunk
+        return
+    with _waiting_within(timeout) as wait:
+        leader, content = await flight.ajoin(key, lookup, wait)
+    if not leader:
+        yield content
+        return
+
+    parts = []
+    try:
+        async for chunk in stream:
+            parts.append(chunk)
+            yield chunk
+    except BaseException as e:
+        flight.finish(key, error=e)
+        raise
+    flight.finish(key, "".join(parts))
+
+
+@contextmanager
+def _metered(agent: str, model_name: str, system: str | None):
+    """Record the wall time and reported usage of an LLM call in the metrics
+    and the model policy.
+
+    The body stores the response's usage_metadata under "usage".
+    """
+    call = {"usage": None}
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        elapsed = time.perf_counter() - started
+        record_llm_call(agent, model_name, elapsed, call["usage"], system, error=True)
+        observe_llm_call(model_name, elapsed, call["usage"], error=True)
+        raise
+    elapsed = time.perf_counter() - started
+    record_llm_call(agent, model_name, elapsed, call["usage"], system)
+    observe_llm_call(model_name, elapsed, call["usage"])
+
+
+def _llm_request(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: int | None,
+    model_kwargs: dict | None,
+    system: str | None,
+) -> dict:
+    """Describe a request for the cassette"""
+    return {
+        "model": model_name,
+        "temperature": float(temperature),
+        "max_tokens": max_tokens,
+        "model_kwargs": model_kwargs or {},
+        "system": system or None,
+        "prompt": prompt,
+    }
+
+
+def _recorded_invoke(request: dict, call) -> AIMessage:
+    """Run call() through the cassette, if one is active.
+
+    In replay mode the recorded response is returned instead of calling the
+    model; in record mode the live response is appended to the cassette.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return call()
+    if cassette.mode == "replay":
+        entry = cassette.replay(request)
+        time.sleep(cassette.latency(entry))
+        return AIMessage(content=entry["response"], usage_metadata=entry["usage"])
+
+    started = time.perf_counter()
+    message = call()
+    elapsed = time.perf_counter() - started
+    cassette.record(request, message.content, elapsed, message.usage_metadata)
+    return message
+
+
+async def _arecorded_invoke(request: dict, call) -> AIMessage:
+    """Async version of _recorded_invoke for a coroutine function"""
+    cassette = get_cassette()
+    if cassette is None:
+        return await call()
+    if cassette.mode == "replay":
+        entry = cassette.replay(request)
+        await asyncio.sleep(cassette.latency(entry))
+        return AIMessage(content=entry["response"], usage_metadata=entry["usage"])
+
+    started = time.perf_counter()
+    message = await call()
+    elapsed = time.perf_counter() - started
+    cassette.record(request, message.content, elapsed, message.usage_metadata)
+    return message
+
+
+def _replayed_chunks(cassette, entry: dict) -> Iterator[tuple[float, str]]:
+    """(delay, chunk) pairs to replay a recorded stream"""
+    first_delay, chunk_delay = cassette.delays(entry)
+    for index, chunk in enumerate(entry.get("chunks") or [entry["response"]]):
+        yield (chunk_delay if index else first_delay), chunk
+
+
+def _call_with_retries(model_name: str, timeout: float | None, call):
+    """Run call(remaining_seconds) under the deadline, retry and breaker policy"""
+    policy = RetryPolicy(model_name, timeout)
+    while True:
+        policy.before_attempt()
         try:
-            prompts[prompt_name] = load_prompt(prompt_name)
+            result = call(policy.remaining())
         except Exception as e:
-            print(f"Error loading prompt {prompt_name}: {e}")
-    return prompts
+            time.sleep(policy.failed(e))
+            continue
+        except BaseException:
+            policy.breaker.release()
+            raise
+        policy.succeeded()
+        return result
+
+
+async def _acall_with_retries(model_name: str, timeout: float | None, call):
+    """Async version of _call_with_retries for coroutine functions"""
+    policy = RetryPolicy(model_name, timeout)
+    while True:
+        policy.before_attempt()
+        try:
+            result = await call(policy.remaining())
+        except Exception as e:
+            await asyncio.sleep(policy.failed(e))
+            continue
+        except BaseException:
+            policy.breaker.release()
+            raise
+        policy.succeeded()
+        return result
 
 
 def use_llm_raw(
     prompt: str,
-    model_name: str = "gpt-4o",
+    model_name: str | None = None,
     temperature: float = 0.0,
     model_kwargs: dict | None = None,
+    max_tokens: int | None = None,
+    agent: str = "default",
+    cache: bool | None = None,
+    timeout: float | None = None,
+    system: str | None = None,
 ) -> str:
-    """Send a prompt to the specified OpenAI model and return the response content."""
-    if not openai_api_key:
-        raise ValueError(
-            "OpenAI API key must be provided or defined as `openai_api_key` in the global scope."
+    """Send a prompt to the specified OpenAI model and return the response content.
+
+    Without a ``model_name`` the agent's configured model is used, and a
+    cheaper fallback while that model is under pressure (see
+    src.model_policy).
+
+    Deterministic (temperature 0) calls are served from the response cache
+    when possible; pass ``cache=True`` to opt other calls in, or
+    ``cache=False`` to bypass it.
+
+    The call, including retries of timeouts, 429s and 5xx responses, must
+    finish within ``timeout`` seconds (Config.LLM_TIMEOUT by default).
+    Failures raise LLMCallError. Identical cacheable calls made while one is
+    in flight wait for it and share its response (see src.single_flight).
+
+    A ``system`` prompt is sent as a separate system message ahead of the
+    prompt. Keep it identical across calls and put everything that varies
+    in ``prompt``, so the provider can reuse it as a cached prefix.
+    """
+    _check_api_key()
+    model_name = select_model(agent, model_name)
+    cache_key, cached = _cache_lookup(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    if cached is not None:
+        return cached
+
+    llm = get_chat_client(model_name, temperature, max_tokens, model_kwargs)
+    messages = _messages(prompt, system)
+    request = _llm_request(
+        prompt, model_name, temperature, max_tokens, model_kwargs, system
+    )
+
+    def call() -> str:
+        with _metered(agent, model_name, system) as metrics:
+            message = _recorded_invoke(
+                request,
+                lambda: _call_with_retries(
+                    model_name,
+                    timeout,
+                    lambda remaining: llm.invoke(messages, timeout=remaining),
+                ),
+            )
+            metrics["usage"] = message.usage_metadata
+        _cache_store(cache_key, message.content, agent)
+        return message.content
+
+    flight_key = cache_key or _flight_key(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    return _coalesced(flight_key, call, _cache_peek(cache_key), timeout)
+
+
+async def use_llm_async(
+    prompt: str,
+    model_name: str | None = None,
+    temperature: float = 0.0,
+    model_kwargs: dict | None = None,
+    max_tokens: int | None = None,
+    agent: str = "default",
+    cache: bool | None = None,
+    timeout: float | None = None,
+    system: str | None = None,
+) -> str:
+    """Async version of use_llm_raw that awaits the model without blocking a thread"""
+    _check_api_key()
+    model_name = select_model(agent, model_name)
+    cache_key, cached = _cache_lookup(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    if cached is not None:
+        return cached
+
+    llm = get_async_chat_client(model_name, temperature, max_tokens, model_kwargs)
+    messages = _messages(prompt, system)
+
+    request = _llm_request(
+        prompt, model_name, temperature, max_tokens, model_kwargs, system
+    )
+
+    async def invoke(remaining: float):
+        return await llm.ainvoke(messages, timeout=remaining)
+
+    async def call() -> str:
+        with _metered(agent, model_name, system) as metrics:
+            message = await _arecorded_invoke(
+                request, lambda: _acall_with_retries(model_name, timeout, invoke)
+            )
+            metrics["usage"] = message.usage_metadata
+        _cache_store(cache_key, message.content, agent)
+        return message.content
+
+    flight_key = cache_key or _flight_key(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    return await _acoalesced(flight_key, call, _cache_peek(cache_key), timeout)
+
+
+def _stream_uncached(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    model_kwargs: dict | None,
+    max_tokens: int | None,
+    agent: str,
+    timeout: float | None,
+    system: str | None,
+    cache_key: str | None,
+) -> Iterator[str]:
+    """Stream a response from the model and store it in the cache"""
+    llm = get_chat_client(model_name, temperature, max_tokens, model_kwargs)
+    messages = _messages(prompt, system)
+    request = _llm_request(
+        prompt, model_name, temperature, max_tokens, model_kwargs, system
+    )
+    cassette = get_cassette()
+    policy = RetryPolicy(model_name, timeout)
+    parts = []
+    with _metered(agent, model_name, system) as metrics:
+        if cassette is not None and cassette.mode == "replay":
+            entry = cassette.replay(request)
+            metrics["usage"] = entry["usage"]
+            for delay, chunk in _replayed_chunks(cassette, entry):
+                time.sleep(delay)
+                parts.append(chunk)
+                yield chunk
+        else:
+            started = time.perf_counter()
+            first_chunk_s = None
+            while True:
+                policy.before_attempt()
+                try:
+                    for chunk in llm.stream(messages, timeout=policy.remaining()):
+                        if chunk.usage_metadata:
+                            metrics["usage"] = chunk.usage_metadata
+                        if chunk.content:
+                            if first_chunk_s is None:
+                                first_chunk_s = time.perf_counter() - started
+                            parts.append(chunk.content)
+                            yield chunk.content
+                except Exception as e:
+                    if parts:
+                        policy.breaker.record(False)
+                        raise LLMCallError(str(e), "stream_interrupted") from e
+                    time.sleep(policy.failed(e))
+                    continue
+                except BaseException:
+                    policy.breaker.release()
+                    raise
+                policy.succeeded()
+                break
+
+            if cassette is not None:
+                cassette.record(
+                    request,
+                    "".join(parts),
+                    time.perf_counter() - started,
+                    metrics["usage"],
+                    chunks=parts,
+                    first_chunk_s=first_chunk_s,
+                )
+
+    _cache_store(cache_key, "".join(parts), agent)
+
+
+def use_llm_stream(
+    prompt: str,
+    model_name: str | None = None,
+    temperature: float = 0.0,
+    model_kwargs: dict | None = None,
+    max_tokens: int | None = None,
+    agent: str = "default",
+    cache: bool | None = None,
+    timeout: float | None = None,
+    system: str | None = None,
+) -> Iterator[str]:
+    """Stream the response to a prompt as it is generated, chunk by chunk.
+
+    Cached responses, and those of an identical stream that was already
+    running, are yielded as a single chunk. A completed stream is stored in
+    the cache exactly like use_llm_raw. Failures are retried
+    only until the first chunk has been yielded; after that they raise
+    LLMCallError.
+    """
+    _check_api_key()
+    model_name = select_model(agent, model_name)
+    cache_key, cached = _cache_lookup(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    if cached is not None:
+        yield cached
+        return
+
+    flight_key = cache_key or _flight_key(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    yield from _coalesced_stream(
+        flight_key,
+        _stream_uncached(
+            prompt,
+            model_name,
+            temperature,
+            model_kwargs,
+            max_tokens,
+            agent,
+            timeout,
+            system,
+            cache_key,
+        ),
+        _cache_peek(cache_key),
+        timeout,
+    )
+
+
+async def _astream_uncached(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    model_kwargs: dict | None,
+    max_tokens: int | None,
+    agent: str,
+    timeout: float | None,
+    system: str | None,
+    cache_key: str | None,
+) -> AsyncIterator[str]:
+    """Stream a response from the model and store it in the cache"""
+    llm = get_async_chat_client(model_name, temperature, max_tokens, model_kwargs)
+    messages = _messages(prompt, system)
+    request = _llm_request(
+        prompt, model_name, temperature, max_tokens, model_kwargs, system
+    )
+    cassette = get_cassette()
+    policy = RetryPolicy(model_name, timeout)
+    parts = []
+    with _metered(agent, model_name, system) as metrics:
+        if cassette is not None and cassette.mode == "replay":
+            entry = cassette.replay(request)
+            metrics["usage"] = entry["usage"]
+            for delay, chunk in _replayed_chunks(cassette, entry):
+                await asyncio.sleep(delay)
+                parts.append(chunk)
+                yield chunk
+        else:
+            started = time.perf_counter()
+            first_chunk_s = None
+            while True:
+                policy.before_attempt()
+                try:
+                    async for chunk in llm.astream(
+                        messages, timeout=policy.remaining()
+                    ):
+                        if chunk.usage_metadata:
+                            metrics["usage"] = chunk.usage_metadata
+                        if chunk.content:
+                            if first_chunk_s is None:
+                                first_chunk_s = time.perf_counter() - started
+                            parts.append(chunk.content)
+                            yield chunk.content
+                except Exception as e:
+                    if parts:
+                        policy.breaker.record(False)
+                        raise LLMCallError(str(e), "stream_interrupted") from e
+                    await asyncio.sleep(policy.failed(e))
+                    continue
+                except BaseException:
+                    policy.breaker.release()
+                    raise
+                policy.succeeded()
+                break
+
+            if cassette is not None:
+                cassette.record(
+                    request,
+                    "".join(parts),
+                    time.perf_counter() - started,
+                    metrics["usage"],
+                    chunks=parts,
+                    first_chunk_s=first_chunk_s,
+                )
+
+    _cache_store(cache_key, "".join(parts), agent)
+
+
+async def use_llm_astream(
+    prompt: str,
+    model_name: str | None = None,
+    temperature: float = 0.0,
+    model_kwargs: dict | None = None,
+    max_tokens: int | None = None,
+    agent: str = "default",
+    cache: bool | None = None,
+    timeout: float | None = None,
+    system: str | None = None,
+) -> AsyncIterator[str]:
+    """Async version of use_llm_stream"""
+    _check_api_key()
+    model_name = select_model(agent, model_name)
+    cache_key, cached = _cache_lookup(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    if cached is not None:
+        yield cached
+        return
+
+    flight_key = cache_key or _flight_key(
+        prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
+    )
+    async for chunk in _acoalesced_stream(
+        flight_key,
+        _astream_uncached(
+            prompt,
+            model_name,
+            temperature,
+            model_kwargs,
+            max_tokens,
+            agent,
+            timeout,
+            system,
+            cache_key,
+        ),
+        _cache_peek(cache_key),
+        timeout,
+    ):
+        yield chunk
+
+
+class BatchResult(BaseModel):
+    """Responses in input order (None where a call failed), per-item errors
+    keyed by input index, and aggregate throughput stats"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    responses: list[Optional[str]]
+    errors: dict[int, LLMCallError] = {}
+    stats: dict[str, float] = {}
+
+
+def _estimate_tokens(
+    prompt: str, system: str | None, model_name: str, max_tokens: int | None
+) -> int:
+    """Token cost of a request, reserved before it is sent: its prompt
+    tokens plus the most it can generate"""
+    prompt_tokens = count_tokens(prompt, model_name)
+    if system:
+        # Shared by the whole batch, so counted once
+        prompt_tokens += count_static_tokens(system, model_name)
+    return prompt_tokens + (max_tokens or Config.OPENAI_MAX_TOKENS)
+
+
+def use_llm_batch(
+    prompts: list[str],
+    model_name: str | None = None,
+    temperature: float = 0.0,
+    model_kwargs: dict | None = None,
+    max_tokens: int | None = None,
+    agent: str = "default",
+    cache: bool | None = None,
+    max_workers: int | None = None,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+    timeout: float | None = None,
+    system: str | None = None,
+) -> BatchResult:
+    """Send many prompts concurrently over a bounded worker pool.
+
+    Requests are admitted through requests-per-minute and tokens-per-minute
+    token buckets, shared process-wide unless limits are passed for this
+    batch. Each attempt, retries included, reserves a request and an
+    estimate of its tokens, and the token bucket is corrected with the
+    reported usage once the request completes. Each prompt gets
+    the same deadline and retries as use_llm_raw; a prompt that still fails
+    does not stop the batch, and its LLMCallError is reported under its
+    input index. A ``system`` prompt is shared by every prompt in the batch.
+    At temperature 0, identical prompts would get the same answer, so each
+    is sent once and its response (or error) is reported for every copy.
+    """
+    _check_api_key()
+    model_name = select_model(agent, model_name)
+    if requests_per_minute is None and tokens_per_minute is None:
+        request_bucket, token_bucket = get_rate_limiters()
+    else:
+        request_bucket = TokenBucket(requests_per_minute or 0)
+        token_bucket = TokenBucket(tokens_per_minute or 0)
+    llm = get_chat_client(model_name, temperature, max_tokens, model_kwargs)
+
+    def call(prompt: str) -> tuple[str, int, bool, float]:
+        """Return the response, tokens used, whether it was cached and time waited"""
+        cache_key, cached = _cache_lookup(
+            prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
         )
+        if cached is not None:
+            return cached, 0, True, 0.0
 
-    try:
-        llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            model_kwargs=model_kwargs or {},
-            openai_api_key=openai_api_key,
+        def send() -> tuple[str, int, float]:
+            estimate = _estimate_tokens(prompt, system, model_name, max_tokens)
+            waited = 0.0
+
+            def attempt(remaining: float) -> AIMessage:
+                # Every attempt is a request upstream, so retries are paced
+                # by the buckets too
+                nonlocal waited
+                waited += request_bucket.acquire() + token_bucket.acquire(estimate)
+                return llm.invoke(_messages(prompt, system), timeout=remaining)
+
+            request = _llm_request(
+                prompt, model_name, temperature, max_tokens, model_kwargs, system
+            )
+            with _metered(agent, model_name, system) as metrics:
+                message = _recorded_invoke(
+                    request,
+                    lambda: _call_with_retries(model_name, timeout, attempt),
+                )
+                metrics["usage"] = message.usage_metadata
+            used = (message.usage_metadata or {}).get("total_tokens", estimate)
+            token_bucket.debit(used - estimate)
+
+            _cache_store(cache_key, message.content, agent)
+            return message.content, used, waited
+
+        flight_key = cache_key or _flight_key(
+            prompt, model_name, temperature, model_kwargs, max_tokens, cache, system
         )
-        return llm.invoke(prompt).content
-    except Exception as e:
-        return f"Error calling LLM: {str(e)}"
+        peek = _cache_peek(cache_key)
+
+        def lookup() -> tuple[str, int, float] | None:
+            content = peek()
+            return None if content is None else (content, 0, 0.0)
+
+        content, used, waited = _coalesced(
+            flight_key, send, lookup if peek else None, timeout
+        )
+        return content, used, False, waited
+
+    # The request each input is answered by
+    if temperature == 0:
+        first: dict[str, int] = {}
+        slots = [first.setdefault(prompt, len(first)) for prompt in prompts]
+        unique = list(first)
+    else:
+        slots = list(range(len(prompts)))
+        unique = prompts
+
+    started = time.perf_counter()
+    workers = max(1, min(max_workers or Config.LLM_BATCH_WORKERS, len(unique) or 1))
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="llm-batch"
+    ) as pool:
+        futures = [pool.submit(call, prompt) for prompt in unique]
+
+    result = BatchResult(responses=[None] * len(prompts))
+    tokens = cached = 0
+    waited = 0.0
+    counted = set()
+    for index, slot in enumerate(slots):
+        try:
+            content, used, hit, wait = futures[slot].result()
+        except Exception as e:
+            result.errors[index] = classify_error(e)
+            continue
+        result.responses[index] = content
+        if slot not in counted:
+            counted.add(slot)
+            tokens += used
+            cached += hit
+            waited += wait
+
+    elapsed = time.perf_counter() - started
+    result.stats = {
+        "items": len(prompts),
+        "succeeded": len(prompts) - len(result.errors),
+        "failed": len(result.errors),
+        "cached": cached,
+        "deduplicated": len(prompts) - len(unique),
+        "total_tokens": tokens,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(prompts) / elapsed if elapsed else 0.0,
+        "tokens_per_s": tokens / elapsed if elapsed else 0.0,
+        "rate_limit_wait_s": waited,
+    }
+    return result
 
 
 def use_llm_clean(prompt: str, **kwargs) -> str:
     return use_llm_raw(prompt, **kwargs).strip()
 
 
+async def use_llm_clean_async(prompt: str, **kwargs) -> str:
+    return (await use_llm_async(prompt, **kwargs)).strip()
+
+
 def get_llm_instance(
-    model_name: str = "gpt-4o", temperature: float = 0.7, max_tokens: int = 1000
+    model_name: str | None = None,
+    temperature: float | None = None,
+    max_tokens: int | None = None,
 ) -> ChatOpenAI:
-    """Get a configured LLM instance"""
-    return ChatOpenAI(model=model_name, temperature=temperature, max_tokens=max_tokens)
+    """Get an LLM instance, with the OPENAI_* settings as defaults"""
+    defaults = Config.get_openai_config()
+    return get_chat_client(
+        model_name or defaults["model"],
+        defaults["temperature"] if temperature is None else temperature,
+        max_tokens or defaults["max_tokens"],
+    )
 
 
 def format_prompt_with_context(base_prompt: str, context: dict[str, str]) -> str:
-    """Format a prompt with context variables"""
-    formatted_prompt = base_prompt
-    for key, value in context.items():
-        placeholder = f"{{{key}}}"
-        formatted_prompt = formatted_prompt.replace(placeholder, str(value))
-    return formatted_prompt
+    """Format a prompt with context variables, leaving unknown placeholders as is"""
+    return PromptTemplate(base_prompt).render(context, strict=False)
@@ -0,0 +1,177 @@
+"""
+Model tiering for LLM calls.
+
+Each agent (router, coach, coach-video, injury, game_plan, rag, evaluation)
+calls the model configured for it in Config.LLM_MODELS, or OPENAI_MODEL, so
+routing and tool nodes can use a small fast model while game plans keep a
+large one.
+
+A model with a cheaper fallback in Config.LLM_FALLBACK_MODELS is swapped for
+it while it is under pressure:
+
+- its circuit breaker is open,
+- its recent latency, a moving average over successful calls, is above
+  LLM_FALLBACK_LATENCY_MS, or
+- the estimated spend on all models over the last hour is above
+  LLM_HOURLY_BUDGET_USD.
+
+A model that was too slow is tried again after LLM_FALLBACK_COOLDOWN
+seconds, with its latency measured afresh.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from config import Config
+from src.llm_metrics import estimate_cost
+from src.llm_resilience import get_circuit_breaker
+
+# Weight of the newest call in the latency moving average
+_LATENCY_SMOOTHING = 0.2
+_BUDGET_WINDOW = 3600.0
+
+
+class ModelPolicy:
+    """Chooses the model for each call and tracks the pressure on models"""
+
+    def __init__(
+        self,
+        latency_ms_threshold: float = 0.0,
+        hourly_budget: float = 0.0,
+        cooldown: float = 60.0,
+    ):
+        self.latency_ms_threshold = latency_ms_threshold
+        self.hourly_budget = hourly_budget
+        self.cooldown = cooldown
+        self._latency_ms: dict[str, float] = {}
+        self._slow_until: dict[str, float] = {}
+        self._spending: deque[tuple[float, float]] = deque()
+        self._spent = 0.0
+        self._fallbacks: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        model_name: str,
+        latency_s: float,
+        usage: Optional[dict] = None,
+        error: bool = False,
+    ) -> None:
+        """Update a model's latency and the hourly spend with a finished call"""
+        now = time.monotonic()
+        cost = None
+        if usage:
+            details = usage.get("input_token_details") or {}
+            cost = estimate_cost(
+                model_name,
+                usage.get("input_tokens") or 0,
+                usage.get("output_tokens") or 0,
+                details.get("cache_read") or 0,
+            )
+        with self._lock:
+            if cost:
+                self._spending.append((now, cost))
+                self._spent += cost
+            if error or self.latency_ms_threshold <= 0:
+                return
+            latency_ms = latency_s * 1000
+            average = self._latency_ms.get(model_name, latency_ms)
+            average += _LATENCY_SMOOTHING * (latency_ms - average)
+            self._latency_ms[model_name] = average
+            if average > self.latency_ms_threshold:
+                self._slow_until[model_name] = now + self.cooldown
+                del self._latency_ms[model_name]
+
+    def _hourly_spend(self, now: float) -> float:
+        while self._spending and now - self._spending[0][0] > _BUDGET_WINDOW:
+            self._spent -= self._spending.popleft()[1]
+        return max(self._spent, 0.0)
+
+    def pressure(self, model_name: str) -> Optional[str]:
+        """Why a model should not be used right now, or None"""
+        if get_circuit_breaker(model_name).state == "open":
+            return "circuit_open"
+        now = time.monotonic()
+        with self._lock:
+            if self._slow_until.get(model_name, 0.0) > now:
+                return "latency"
+            if self.hourly_budget > 0 and self._hourly_spend(now) > self.hourly_budget:
+                return "budget"
+        return None
+
+    def select(self, agent: str, model_name: Optional[str] = None) -> str:
+        """Pick the model for an agent's call.
+
+        model_name overrides the agent's configured model, but still falls
+        back under pressure.
+        """
+        model_name = model_name or Config.get_model(agent)
+        fallback = Config.get_fallback_model(model_name)
+        if not fallback or fallback == model_name:
+            return model_name
+        reason = self.pressure(model_name)
+        if reason is None:
+            return model_name
+        with self._lock:
+            counts = self._fallbacks.setdefault(agent, {})
+            counts[reason] = counts.get(reason, 0) + 1
+        return fallback
+
+    def stats(self) -> dict:
+        """Get per-agent fallback counts by reason, model latencies and spend"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "fallbacks": {
+                    agent: dict(counts) for agent, counts in self._fallbacks.items()
+                },
+                "latency_ms": dict(self._latency_ms),
+                "slow_models": [
+                    model for model, until in self._slow_until.items() if until > now
+                ],
+                "hourly_spend_usd": self._hourly_spend(now),
+            }
+
+
+_model_policy: Optional[ModelPolicy] = None
+_model_policy_lock = threading.Lock()
+
+
+def get_model_policy() -> ModelPolicy:
+    """Get the process-wide model policy"""
+    global _model_policy
+    with _model_policy_lock:
+        if _model_policy is None:
+            _model_policy = ModelPolicy(
+                Config.LLM_FALLBACK_LATENCY_MS,
+                Config.LLM_HOURLY_BUDGET_USD,
+                Config.LLM_FALLBACK_COOLDOWN,
+            )
+        return _model_policy
+
+
+def select_model(agent: str, model_name: Optional[str] = None) -> str:
+    """Pick the model for an agent's call, falling back under pressure"""
+    return get_model_policy().select(agent, model_name)
+
+
+def observe_llm_call(
+    model_name: str,
+    latency_s: float,
+    usage: Optional[dict] = None,
+    error: bool = False,
+) -> None:
+    get_model_policy().observe(model_name, latency_s, usage, error)
+
+
+def get_model_policy_stats() -> dict:
+    return get_model_policy().stats()
+
+
+def reset_model_policy() -> None:
+    """Drop the policy so it is rebuilt from Config on next use"""
+    global _model_policy
+    with _model_policy_lock:
+        _model_policy = None
@@ -0,0 +1,175 @@
+"""
+In-process read-through cache for student profiles.
+
+get_student_by_id() and get_student_by_name() are asked for the same few
+profiles on every message, so the rows are kept in a size-bounded LRU.
+Profile writes in this process (save_student_profile() and
+update_data_in_sqlite() on students) drop exactly the rows they changed.
+
+Writes from other processes sharing the database are caught with a
+version counter: triggers bump cache_versions.version on every insert,
+update or delete on students, and the cache is cleared when the version
+differs from the one its entries were read at. Each thread reads the
+counter at most every Config.PROFILE_CACHE_CHECK_INTERVAL seconds, so a
+cache hit usually costs no query, and a profile saved by another process
+is seen within that interval. An interval of 0 checks on every lookup.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from config import Config
+from src.db_pool import get_connection
+
+
+def students_version(conn: sqlite3.Connection) -> int:
+    """The students version counter, bumped by every change to the table"""
+    return conn.execute(
+        "SELECT version FROM cache_versions WHERE name = 'students'"
+    ).fetchone()[0]
+
+
+class ProfileCache:
+    """LRU of student rows by id, with a name index"""
+
+    def __init__(self, max_entries: int = 1024, check_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._rows: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self._ids_by_name: dict[str, int] = {}
+        # The students version the cached rows were read at
+        self._version: Optional[int] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0, "clears": 0}
+
+    def _clear(self) -> None:
+        self._rows.clear()
+        self._ids_by_name.clear()
+        self._counters["clears"] += 1
+
+    def _drop(self, student_id: int) -> None:
+        row = self._rows.pop(student_id, None)
+        if row is not None:
+            self._ids_by_name.pop(row.get("name"), None)
+            self._counters["invalidations"] += 1
+
+    def check_version(self) -> int:
+        """Clear the cache if students changed outside this process.
+
+        Returns the version to pass to put() for rows read after this call.
+        """
+        now = time.monotonic()
+        checked_at = getattr(self._local, "checked_at", None)
+        if (
+            self._version is not None
+            and checked_at is not None
+            and now - checked_at < self.check_interval
+        ):
+            return self._version
+        version = students_version(get_connection())
+        self._local.checked_at = now
+        with self._lock:
+            # The counter only grows; an older value was read before a write
+            # this process has already applied
+            if self._version is None or version > self._version:
+                if self._version is not None:
+                    self._clear()
+                self._version = version
+            return self._version
+
+    def get(
+        self, student_id: Optional[int] = None, name: Optional[str] = None
+    ) -> Optional[dict[str, Any]]:
+        """A copy of the cached row for a student id or name, or None"""
+        self.check_version()
+        with self._lock:
+            if student_id is None:
+                student_id = self._ids_by_name.get(name)
+            row = self._rows.get(student_id)
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            self._rows.move_to_end(student_id)
+            self._counters["hits"] += 1
+            return dict(row)
+
+    def put(self, row: dict[str, Any], version: int) -> None:
+        """Cache a row that was read at version"""
+        with self._lock:
+            # A write since the read may have made the row stale
+            if version != self._version:
+                return
+            previous = self._rows.pop(row["id"], None)
+            if previous is not None:
+                self._ids_by_name.pop(previous.get("name"), None)
+            self._rows[row["id"]] = dict(row)
+            self._ids_by_name[row["name"]] = row["id"]
+            while len(self._rows) > self.max_entries:
+                _, evicted = self._rows.popitem(last=False)
+                self._ids_by_name.pop(evicted.get("name"), None)
+
+    def invalidate(
+        self, student_ids: Iterable[int], version_before: int, version_after: int
+    ) -> None:
+        """Drop rows changed by a write in this process.
+
+        The versions are read before and after the write, in its
+        transaction. If the cache had not seen version_before, something
+        else changed students too, and everything is dropped.
+        """
+        with self._lock:
+            if self._version is not None and version_before != self._version:
+                self._clear()
+            else:
+                for student_id in student_ids:
+                    self._drop(student_id)
+            self._version = max(version_after, self._version or 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict[str, float]:
+        """Get hit, miss, invalidation and clear counts and the hit rate"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._rows),
+                "version": self._version,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+_profile_cache: Optional[ProfileCache] = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> Optional[ProfileCache]:
+    """Get the process-wide profile cache, or None if it is disabled"""
+    global _profile_cache
+    if not Config.PROFILE_CACHE_ENABLED:
+        return None
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = ProfileCache(
+                Config.PROFILE_CACHE_SIZE, Config.PROFILE_CACHE_CHECK_INTERVAL
+            )
+        return _profile_cache
+
+
+def get_profile_cache_stats() -> dict[str, float]:
+    if _profile_cache is None:
+        return {}
+    return _profile_cache.stats()
+
+
+def reset_profile_cache() -> None:
+    """Drop the cache so it is rebuilt from Config on next use"""
+    global _profile_cache
+    with _profile_cache_lock:
+        _profile_cache = None
@@ -0,0 +1,138 @@
+"""
+In-memory registry of prompt templates.
+
+Every .txt file under Config.PROMPTS_DIR, including subdirectories such as
+advanced/ and personalities/, is read once and served from memory by name
+("router_prompt", "personalities/james", ...). With Config.PROMPTS_HOT_RELOAD
+enabled, a prompt is re-read when its file's mtime changes and the directory
+is rescanned for added or removed prompts, so edits show up without a
+restart during development.
+
+Prompts are also available as compiled templates (see src/prompt_template),
+checked against the variables their agent declares whenever they are
+compiled, including after a hot reload.
+"""
+
+import threading
+from pathlib import Path
+from typing import Optional
+
+from config import Config
+from src.prompt_template import (
+    MessageTemplate,
+    compile_template,
+    declared_prompts,
+    declared_variables,
+)
+
+
+class PromptRegistry:
+    """Prompt templates indexed by name, relative to a root directory"""
+
+    def __init__(self, root: str, hot_reload: bool = False):
+        self.root = Path(root)
+        self.hot_reload = hot_reload
+        self._prompts: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.txt"
+
+    def _read(self, path: Path) -> tuple[float, str]:
+        return path.stat().st_mtime, path.read_text(encoding="utf-8")
+
+    def _scan(self) -> None:
+        """Index every prompt file under the root, re-reading changed ones"""
+        prompts = {}
+        if self.root.exists():
+            for path in self.root.rglob("*.txt"):
+                name = path.relative_to(self.root).with_suffix("").as_posix()
+                cached = self._prompts.get(name)
+                try:
+                    if cached and cached[0] == path.stat().st_mtime:
+                        prompts[name] = cached
+                    else:
+                        prompts[name] = self._read(path)
+                except OSError as e:
+                    print(f"Error loading prompt {name}: {e}")
+        with self._lock:
+            self._prompts = prompts
+
+    def get(self, name: str) -> str:
+        """Get a prompt by name, raising FileNotFoundError if it does not exist"""
+        entry = self._prompts.get(name)
+        if self.hot_reload:
+            entry = self._refresh(name, entry)
+        if entry is None:
+            raise FileNotFoundError(f"Prompt file {name}.txt not found")
+        return entry[1]
+
+    def _refresh(
+        self, name: str, entry: Optional[tuple[float, str]]
+    ) -> Optional[tuple[float, str]]:
+        """Re-read a prompt whose file changed, appeared or disappeared"""
+        path = self._path(name)
+        if not path.resolve().is_relative_to(self.root.resolve()):
+            return None
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            with self._lock:
+                self._prompts.pop(name, None)
+            return None
+
+        if entry is None or entry[0] != mtime:
+            entry = self._read(path)
+            with self._lock:
+                self._prompts[name] = entry
+        return entry
+
+    def template(self, name: str) -> MessageTemplate:
+        """Get a prompt compiled into a template, validating its variables"""
+        template = compile_template(self.get(name), name)
+        variables = declared_variables(name)
+        if variables is not None:
+            template.validate(variables)
+        return template
+
+    def names(self) -> list[str]:
+        """List the names of all prompts"""
+        if self.hot_reload:
+            self._scan()
+        return sorted(self._prompts)
+
+    def all(self) -> dict[str, str]:
+        """Get every prompt keyed by name"""
+        if self.hot_reload:
+            self._scan()
+        return {name: text for name, (_, text) in sorted(self._prompts.items())}
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Get the process-wide prompt registry, loading it on first use"""
+    global _registry
+    if _registry is not None:
+        return _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry(Config.PROMPTS_DIR, Config.PROMPTS_HOT_RELOAD)
+        return _registry
+
+
+def reload_prompts() -> None:
+    """Drop the registry so prompts are read again from disk on next use"""
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+
+def validate_prompts() -> None:
+    """Compile every prompt an agent has declared, raising on bad variables"""
+    registry = get_prompt_registry()
+    for name in declared_prompts():
+        registry.template(name)
@@ -0,0 +1,166 @@
+"""
+Precompiled prompt templates.
+
+A template is parsed once into alternating literal and placeholder segments
+and rendered in a single pass with a join, instead of one string copy per
+variable. Placeholders use str.format syntax ({user_input}, {info.name}) and
+{{ / }} are literal braces, but any other brace, like a JSON example inside
+a prompt, is kept as literal text instead of breaking the render.
+
+A prompt file can be split into a system part and a user part by a line
+containing only [user]. The system part holds the static instructions and is
+sent first, byte for byte the same on every call, so the provider can cache
+it as a prompt prefix; everything that changes per request goes in the user
+part.
+
+Agents declare the variables they supply for each prompt with
+register_prompt(), so a prompt that uses a variable its agent never
+provides fails when it is loaded rather than on a user's request.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+_TOKEN = re.compile(
+    r"\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)\}"
+)
+
+USER_MARKER = "[user]"
+
+# Variables each agent supplies, keyed by prompt name
+_declared_variables: dict[str, tuple[str, ...]] = {}
+
+
+def _resolve(values: dict[str, Any], field: str) -> Any:
+    """Look up a possibly dotted field, like info.name, in the values"""
+    if field in values:
+        return values[field]
+    root, *attributes = field.split(".")
+    value = values[root]
+    for attribute in attributes:
+        value = (
+            value[attribute] if isinstance(value, dict) else getattr(value, attribute)
+        )
+    return value
+
+
+class PromptTemplate:
+    """A prompt parsed into literal text and placeholders"""
+
+    def __init__(self, text: str, name: str = ""):
+        self.name = name
+        self._literals: list[str] = []
+        self._fields: list[str] = []
+
+        literal = []
+        position = 0
+        for match in _TOKEN.finditer(text):
+            literal.append(text[position : match.start()])
+            position = match.end()
+            if match.group(1) is None:
+                literal.append(match.group(0)[0])
+                continue
+            self._literals.append("".join(literal))
+            self._fields.append(match.group(1))
+            literal = []
+        literal.append(text[position:])
+        self._literals.append("".join(literal))
+
+        # Top-level names the caller has to supply, in order of appearance
+        self.variables = tuple(
+            dict.fromkeys(field.split(".")[0] for field in self._fields)
+        )
+
+    def render(
+        self, values: Optional[dict[str, Any]] = None, strict: bool = True, **kwargs
+    ) -> str:
+        """Fill in the placeholders.
+
+        Raises KeyError naming every missing variable; with strict=False
+        placeholders without a value are left in the output unchanged.
+        """
+        values = {**(values or {}), **kwargs}
+        if strict:
+            missing = [name for name in self.variables if name not in values]
+            if missing:
+                raise KeyError(
+                    f"Prompt '{self.name}' is missing variables: {', '.join(missing)}"
+                )
+
+        parts = [self._literals[0]]
+        for field, literal in zip(self._fields, self._literals[1:]):
+            if strict or field in values or field.split(".")[0] in values:
+                parts.append(str(_resolve(values, field)))
+            else:
+                parts.append(f"{{{field}}}")
+            parts.append(literal)
+        return "".join(parts)
+
+    def validate(self, variables: Iterable[str]) -> None:
+        """Raise ValueError if the template uses a variable not in variables"""
+        supplied = set(variables)
+        unknown = [name for name in self.variables if name not in supplied]
+        if unknown:
+            raise ValueError(
+                f"Prompt '{self.name}' uses variables its agent does not supply: "
+                f"{', '.join(unknown)}"
+            )
+
+
+class MessageTemplate:
+    """A prompt split into a static system template and a user template.
+
+    Prompts without a [user] line are sent whole as the user message.
+    """
+
+    def __init__(self, text: str, name: str = ""):
+        self.name = name
+        lines = text.split("\n")
+        if USER_MARKER in lines:
+            split = lines.index(USER_MARKER)
+            system = "\n".join(lines[:split]).strip("\n")
+            user = "\n".join(lines[split + 1 :]).strip("\n")
+        else:
+            system, user = "", text
+        self.system = PromptTemplate(system, name)
+        self.user = PromptTemplate(user, name)
+        self.variables = tuple(
+            dict.fromkeys(self.system.variables + self.user.variables)
+        )
+
+    def render(
+        self, values: Optional[dict[str, Any]] = None, **kwargs
+    ) -> tuple[str, str]:
+        """Render the (system, user) messages"""
+        values = {**(values or {}), **kwargs}
+        missing = [name for name in self.variables if name not in values]
+        if missing:
+            raise KeyError(
+                f"Prompt '{self.name}' is missing variables: {', '.join(missing)}"
+            )
+        return self.system.render(values), self.user.render(values)
+
+    def validate(self, variables: Iterable[str]) -> None:
+        """Raise ValueError if the prompt uses a variable not in variables"""
+        self.system.validate(variables)
+        self.user.validate(variables)
+
+
+@lru_cache(maxsize=128)
+def compile_template(text: str, name: str = "") -> MessageTemplate:
+    """Parse a prompt, reusing the result for identical text"""
+    return MessageTemplate(text, name)
+
+
+def register_prompt(name: str, variables: Iterable[str]) -> None:
+    """Declare the variables an agent supplies when rendering a prompt"""
+    _declared_variables[name] = tuple(variables)
+
+
+def declared_variables(name: str) -> Optional[tuple[str, ...]]:
+    return _declared_variables.get(name)
+
+
+def declared_prompts() -> list[str]:
+    return sorted(_declared_variables)
@@ -0,0 +1,91 @@
+"""
+Token-bucket rate limiting for outgoing LLM requests.
+
+Two process-wide buckets mirror the provider's limits: one counts requests
+per minute and one counts tokens per minute. Callers block in acquire()
+until the bucket has capacity, so bursts are smoothed instead of rejected.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from config import Config
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    The default capacity allows a burst of one second's worth of the rate,
+    which keeps traffic smooth rather than front-loading a whole minute. A
+    rate of 0 disables the limit. Requests larger than the capacity, or that
+    cost more than reserved (see debit), drive the bucket negative and later
+    acquirers wait for the debt to be repaid.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else rate_per_minute / 60
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(
+            self.capacity, self._tokens + elapsed * self.rate_per_minute / 60
+        )
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """Wait until amount tokens are available and take them.
+
+        Returns the number of seconds spent waiting.
+        """
+        if self.rate_per_minute <= 0:
+            return 0.0
+
+        # A request larger than the bucket could never be admitted otherwise,
+        # so it only waits for a full bucket and goes into debt for the rest
+        needed = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                delay = (needed - self._tokens) * 60 / self.rate_per_minute
+            time.sleep(delay)
+            waited += delay
+
+    def debit(self, amount: float) -> None:
+        """Adjust the bucket by the difference between reserved and actual use"""
+        if self.rate_per_minute <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+_request_bucket: Optional[TokenBucket] = None
+_token_bucket: Optional[TokenBucket] = None
+_bucket_lock = threading.Lock()
+
+
+def get_rate_limiters() -> tuple[TokenBucket, TokenBucket]:
+    """Get the process-wide requests-per-minute and tokens-per-minute buckets"""
+    global _request_bucket, _token_bucket
+    with _bucket_lock:
+        if _request_bucket is None:
+            _request_bucket = TokenBucket(Config.LLM_RATE_LIMIT_RPM)
+            _token_bucket = TokenBucket(Config.LLM_RATE_LIMIT_TPM)
+        return _request_bucket, _token_bucket
+
+
+def reset_rate_limiters() -> None:
+    """Drop the buckets so they are rebuilt from Config on next use"""
+    global _request_bucket, _token_bucket
+    with _bucket_lock:
+        _request_bucket = None
+        _token_bucket = None
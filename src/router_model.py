@@ -0,0 +1,274 @@
+"""
+Lightweight trainable intent classifier for routing queries to agents.
+
+A multinomial naive Bayes model over TF-IDF weighted unigrams and bigrams,
+trained offline from logged (input, chosen agent) pairs in the routing_log
+table and stored as a small JSON artifact. The artifact records which rows
+were held out and the last row the model saw, so evaluation only ever uses
+rows the model was not trained on, however much has been logged since.
+
+Train and evaluate with:
+    python -m src.router_model train --out models/router_model.json
+    python -m src.router_model evaluate --model models/router_model.json
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from config import Config
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase unigrams and bigrams"""
+    words = _TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class RouterModel:
+    """Naive Bayes router over TF-IDF weighted token counts"""
+
+    def __init__(
+        self,
+        labels: list[str],
+        vocab: dict[str, int],
+        idf: np.ndarray,
+        class_log_prior: np.ndarray,
+        feature_log_prob: np.ndarray,
+        held_out_ids: Optional[list[int]] = None,
+        trained_through_id: Optional[int] = None,
+    ):
+        self.labels = labels
+        self.vocab = vocab
+        self.idf = idf
+        self.class_log_prior = class_log_prior
+        self.feature_log_prob = feature_log_prob
+        # routing_log ids held out from training, and the last id loaded
+        # for it; both None for a model not trained from the log
+        self.held_out_ids = held_out_ids
+        self.trained_through_id = trained_through_id
+
+    @classmethod
+    def fit(
+        cls, texts: list[str], labels: list[str], alpha: float = 0.5
+    ) -> "RouterModel":
+        """Train a model from example queries and their agent labels"""
+        label_names = sorted(set(labels))
+        documents = [tokenize(text) for text in texts]
+        vocab = {
+            token: index
+            for index, token in enumerate(
+                sorted({token for tokens in documents for token in tokens})
+            )
+        }
+
+        counts = np.zeros((len(documents), len(vocab)))
+        for row, tokens in enumerate(documents):
+            for token in tokens:
+                counts[row, vocab[token]] += 1
+
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        weighted = counts * idf
+
+        label_index = np.array([label_names.index(label) for label in labels])
+        class_counts = np.bincount(label_index, minlength=len(label_names))
+        class_log_prior = np.log(class_counts / class_counts.sum())
+
+        feature_totals = np.zeros((len(label_names), len(vocab)))
+        for index in range(len(label_names)):
+            feature_totals[index] = weighted[label_index == index].sum(axis=0)
+        smoothed = feature_totals + alpha
+        feature_log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+
+        return cls(label_names, vocab, idf, class_log_prior, feature_log_prob)
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        """Get the probability of each agent for a query"""
+        scores = self.class_log_prior.copy()
+        for token in tokenize(text):
+            index = self.vocab.get(token)
+            if index is not None:
+                scores += self.idf[index] * self.feature_log_prob[:, index]
+        scores = np.exp(scores - scores.max())
+        probabilities = scores / scores.sum()
+        return dict(zip(self.labels, probabilities.tolist()))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Get the most likely agent and its probability"""
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def save(self, path: str) -> None:
+        """Write the model to a JSON artifact"""
+        artifact = {
+            "labels": self.labels,
+            "vocab": sorted(self.vocab, key=self.vocab.get),
+            "idf": np.round(self.idf, 5).tolist(),
+            "class_log_prior": np.round(self.class_log_prior, 5).tolist(),
+            "feature_log_prob": np.round(self.feature_log_prob, 5).tolist(),
+            "held_out_ids": self.held_out_ids,
+            "trained_through_id": self.trained_through_id,
+        }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(artifact), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str) -> "RouterModel":
+        """Read a model from a JSON artifact"""
+        artifact = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(
+            artifact["labels"],
+            {token: index for index, token in enumerate(artifact["vocab"])},
+            np.array(artifact["idf"]),
+            np.array(artifact["class_log_prior"]),
+            np.array(artifact["feature_log_prob"]),
+            artifact.get("held_out_ids"),
+            artifact.get("trained_through_id"),
+        )
+
+
+_router_model: Optional[RouterModel] = None
+_router_model_loaded = False
+_router_model_lock = threading.Lock()
+
+
+def get_router_model() -> Optional[RouterModel]:
+    """Get the trained router model, or None if no artifact exists"""
+    global _router_model, _router_model_loaded
+    if _router_model_loaded:
+        return _router_model
+
+    with _router_model_lock:
+        if not _router_model_loaded:
+            try:
+                if Path(Config.ROUTER_MODEL_PATH).exists():
+                    _router_model = RouterModel.load(Config.ROUTER_MODEL_PATH)
+            except Exception as e:
+                print(f"Error loading router model: {e}")
+            _router_model_loaded = True
+        return _router_model
+
+
+def load_routing_examples(
+    db_path: str, sources: tuple[str, ...] = ("llm",)
+) -> list[tuple[int, str, str, Optional[float]]]:
+    """Load logged (id, input, agent, latency_ms) routing decisions"""
+    conn = sqlite3.connect(db_path)
+    placeholders = ", ".join("?" for _ in sources)
+    rows = conn.execute(
+        f"SELECT id, input_text, agent_type, latency_ms FROM routing_log "
+        f"WHERE source IN ({placeholders}) ORDER BY id",
+        sources,
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def split_examples(examples: list, test_size: float, seed: int) -> tuple[list, list]:
+    """Shuffle and split examples into training and held-out sets"""
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    cut = len(shuffled) - max(1, math.ceil(len(shuffled) * test_size))
+    return shuffled[:cut], shuffled[cut:]
+
+
+def unseen_examples(model: RouterModel, examples: list) -> list:
+    """The examples a model was not trained on: its held-out rows and any
+    logged after it was trained"""
+    held_out = set(model.held_out_ids or ())
+    return [
+        example
+        for example in examples
+        if example[0] in held_out or example[0] > model.trained_through_id
+    ]
+
+
+def evaluate_model(model: RouterModel, examples: list) -> dict[str, float]:
+    """Compare the model with the logged LLM router decisions"""
+    correct = 0
+    confident = 0
+    confident_correct = 0
+    start = time.perf_counter()
+    for _, text, label, _ in examples:
+        predicted, probability = model.predict(text)
+        correct += predicted == label
+        if probability >= Config.ROUTER_MODEL_THRESHOLD:
+            confident += 1
+            confident_correct += predicted == label
+    model_ms = (time.perf_counter() - start) * 1000 / max(1, len(examples))
+
+    latencies = [latency for _, _, _, latency in examples if latency]
+    llm_ms = sum(latencies) / len(latencies) if latencies else 0.0
+    coverage = confident / max(1, len(examples))
+    return {
+        "examples": len(examples),
+        "accuracy": correct / max(1, len(examples)),
+        "coverage": coverage,
+        "accuracy_above_threshold": confident_correct / max(1, confident),
+        "model_latency_ms": model_ms,
+        "llm_router_latency_ms": llm_ms,
+        "latency_saved_ms": coverage * (llm_ms - model_ms),
+    }
+
+
+def print_report(report: dict[str, float]) -> None:
+    threshold = Config.ROUTER_MODEL_THRESHOLD
+    print(f"Held-out examples:          {report['examples']}")
+    print(f"Agreement with LLM router:  {report['accuracy']:.3f}")
+    print(
+        f"Above threshold ({threshold:.2f}):   {report['coverage']:.1%} of queries, "
+        f"{report['accuracy_above_threshold']:.3f} agreement"
+    )
+    print(f"Model latency:              {report['model_latency_ms']:.3f} ms")
+    print(f"LLM router latency:         {report['llm_router_latency_ms']:.1f} ms")
+    print(f"Latency saved per request:  {report['latency_saved_ms']:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train or evaluate the router model")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--db", default=Config.DATABASE_PATH)
+    parser.add_argument("--model", default=Config.ROUTER_MODEL_PATH)
+    parser.add_argument("--out", default=Config.ROUTER_MODEL_PATH)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    examples = load_routing_examples(args.db)
+    if args.command == "train":
+        if len(examples) < 2:
+            print("Not enough logged LLM routing decisions to train on.")
+            return
+        train, held_out = split_examples(examples, args.test_size, args.seed)
+        model = RouterModel.fit([e[1] for e in train], [e[2] for e in train])
+        model.held_out_ids = sorted(e[0] for e in held_out)
+        model.trained_through_id = examples[-1][0]
+        model.save(args.out)
+        print(f"Trained on {len(train)} examples, saved to {args.out}")
+    else:
+        model = RouterModel.load(args.model)
+        if model.trained_through_id is None:
+            print("The model does not record its training rows; retrain it.")
+            return
+        held_out = unseen_examples(model, examples)
+        if not held_out:
+            print("No logged LLM routing decisions the model was not trained on.")
+            return
+    print_report(evaluate_model(model, held_out))
+
+
+if __name__ == "__main__":
+    main()
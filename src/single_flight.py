@@ -0,0 +1,229 @@
+"""
+Single-flight coalescing of identical in-flight LLM calls.
+
+When many users send the same deterministic request at once, like a class
+asking for the same warm-up drill, only the first caller (the leader) calls
+the model. Everyone who asks for the same key while that call is running
+waits for it and gets its result, or its error. Keys are response cache
+keys, and callers can pass a lookup of the cache that is checked under the
+same lock as the running calls: a leader stores its response before it
+ends its flight, so a caller arriving in between gets the stored response
+instead of starting a second call.
+
+Calls are joined through a concurrent.futures.Future, so threads and
+coroutines on any event loop can wait on the same leader. If a leader is
+cancelled or its caller stops reading a stream, its waiters start over and
+one of them becomes the new leader. Waiters pass their own timeout, so a
+slow leader can't hold them past their deadline.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+from config import Config
+
+
+class _Abandoned(Exception):
+    """Set on a flight whose leader gave up without a result"""
+
+
+class FlightTimeout(TimeoutError):
+    """Raised to a waiter whose timeout ran out before the leader finished"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one call"""
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "leaders": 0,
+            "coalesced": 0,
+            "cached": 0,
+            "abandoned": 0,
+            "timed_out": 0,
+        }
+
+    def _begin(
+        self, key: str, lookup: Optional[Callable[[], Any]] = None
+    ) -> Optional[Future]:
+        """Start a flight for key and return None, or return a future for
+        the running call or the looked-up result"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                return future
+            result = lookup() if lookup is not None else None
+            if result is not None:
+                self._counters["cached"] += 1
+                future = Future()
+                future.set_result(result)
+                return future
+            self._calls[key] = Future()
+            self._counters["leaders"] += 1
+            return None
+
+    def _timed_out(self, timeout: float) -> FlightTimeout:
+        with self._lock:
+            self._counters["timed_out"] += 1
+        return FlightTimeout(
+            f"Waited {timeout:.1f}s for an identical call that is still running"
+        )
+
+    def join(
+        self,
+        key: str,
+        lookup: Optional[Callable[[], Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> tuple[bool, Any]:
+        """Wait for the running call for key and return (False, its result).
+
+        With no call running, lookup() is checked under the lock and a
+        result other than None is returned as (False, result). Otherwise
+        return (True, None): the caller leads a new flight and must end it
+        with finish(). A leader's error is raised, and FlightTimeout if
+        timeout seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            future = self._begin(key, lookup)
+            if future is None:
+                return True, None
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            try:
+                return False, future.result(remaining)
+            except _Abandoned:
+                continue
+            except TimeoutError:
+                if not future.done():
+                    raise self._timed_out(timeout) from None
+                raise
+
+    async def ajoin(
+        self,
+        key: str,
+        lookup: Optional[Callable[[], Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> tuple[bool, Any]:
+        """Async version of join"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            future = self._begin(key, lookup)
+            if future is None:
+                return True, None
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            try:
+                # Shielded so a cancelled waiter doesn't cancel the shared future
+                return False, await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)), remaining
+                )
+            except _Abandoned:
+                continue
+            except TimeoutError:
+                if not future.done():
+                    raise self._timed_out(timeout) from None
+                raise
+
+    def finish(
+        self,
+        key: str,
+        result: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """End the leader's flight, handing its result or error to the waiters.
+
+        An error that is not an Exception, like a cancellation or a stream
+        closed early, abandons the flight instead, and the waiters retry on
+        their own.
+        """
+        with self._lock:
+            future = self._calls.pop(key)
+            if error is not None and not isinstance(error, Exception):
+                self._counters["abandoned"] += 1
+                error = _Abandoned()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        lookup: Optional[Callable[[], Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Call fn, or wait up to timeout for the result of the running call
+        for key"""
+        leader, result = self.join(key, lookup, timeout)
+        if not leader:
+            return result
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+    async def ado(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Async version of do for a coroutine function"""
+        leader, result = await self.ajoin(key, lookup, timeout)
+        if not leader:
+            return result
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict[str, float]:
+        """Get the counts of leading, coalesced, cached, abandoned and timed
+        out calls"""
+        with self._lock:
+            stats = dict(self._counters)
+        total = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_ratio"] = stats["coalesced"] / total if total else 0.0
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self._counters, 0)
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """Get the process-wide single-flight group, or None when it is disabled"""
+    return _single_flight if Config.LLM_SINGLE_FLIGHT_ENABLED else None
+
+
+def get_single_flight_stats() -> dict[str, float]:
+    """Get the counts of leading, coalesced and abandoned LLM calls"""
+    return _single_flight.stats()
+
+
+def reset_single_flight_stats() -> None:
+    _single_flight.reset_stats()
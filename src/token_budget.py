@@ -0,0 +1,163 @@
+"""
+Token budgets for prompt context.
+
+Variable context like chat history, retrieved examples and the student
+profile is passed as sections in priority order. Each agent has an input
+token budget (Config.LLM_INPUT_TOKEN_BUDGETS). Whatever the fixed parts of
+the prompt leave of that budget is given to the sections in turn, and each
+section keeps as many whole items as fit. Ranked items, like examples, keep
+their first items. Chat history keeps its most recent turns. An item that
+does not fit on its own is truncated, and everything after it in its
+section is dropped so the section stays contiguous.
+
+Tokens are counted with src.tokens, and the tokens dropped per agent are
+counted like the router stats.
+"""
+
+import threading
+from typing import Literal
+
+from pydantic import BaseModel
+
+from config import Config
+from src.tokens import count_tokens, truncate_to_tokens
+
+# Don't bother keeping a truncated item shorter than this
+_MIN_TRUNCATED_TOKENS = 32
+
+_budget_stats: dict[str, dict[str, int]] = {}
+_budget_stats_lock = threading.Lock()
+
+
+class ContextSection(BaseModel):
+    """A trimmable part of a prompt, made of items in their prompt order"""
+
+    name: str
+    items: list[str]
+    title: str = ""
+    separator: str = "\n"
+    # "first" keeps leading items (ranked results), "last" trailing ones (history)
+    keep: Literal["first", "last"] = "first"
+
+
+class BudgetedContext(BaseModel):
+    """The sections trimmed to a budget, with the tokens dropped from each"""
+
+    sections: list[ContextSection]
+    tokens: int = 0
+    dropped_tokens: dict[str, int] = {}
+
+    @property
+    def total_dropped(self) -> int:
+        return sum(self.dropped_tokens.values())
+
+    def text(self, name: str) -> str:
+        """The kept items of one section, joined by its separator"""
+        for section in self.sections:
+            if section.name == name:
+                return section.separator.join(section.items)
+        return ""
+
+    def render(self) -> str:
+        """Every non-empty section under its title, each followed by a blank line"""
+        parts = []
+        for section in self.sections:
+            if section.items:
+                title = f"{section.title}:\n" if section.title else ""
+                parts.append(f"{title}{section.separator.join(section.items)}\n\n")
+        return "".join(parts)
+
+
+def _fit_section(
+    section: ContextSection, budget: int, model_name: str
+) -> tuple[ContextSection, int, int]:
+    """Return the trimmed section, the tokens it uses and the tokens dropped"""
+    items = section.items if section.keep == "first" else section.items[::-1]
+    counts = [count_tokens(item, model_name) for item in items]
+    overhead = count_tokens(section.title, model_name) + 1 if section.title else 0
+    separator = count_tokens(section.separator, model_name)
+
+    kept = []
+    used = overhead
+    dropped = 0
+    for index, (item, tokens) in enumerate(zip(items, counts)):
+        cost = tokens + (separator if kept else 0)
+        if used + cost <= budget:
+            kept.append(item)
+            used += cost
+            continue
+        room = budget - used - (separator if kept else 0)
+        if room >= _MIN_TRUNCATED_TOKENS:
+            kept.append(truncate_to_tokens(item, room, model_name))
+            used = budget
+            tokens -= room
+        dropped = tokens + sum(counts[index + 1 :])
+        break
+
+    if not kept:
+        # Nothing fit, so the title is not sent either
+        used = 0
+    if section.keep == "last":
+        kept.reverse()
+    return section.model_copy(update={"items": kept}), used, dropped
+
+
+def fit_context(
+    sections: list[ContextSection], budget: int, model_name: str = "gpt-4o"
+) -> BudgetedContext:
+    """Trim sections, given in priority order, to fit in budget tokens"""
+    remaining = max(budget, 0)
+    result = BudgetedContext(sections=[])
+    for section in sections:
+        trimmed, used, dropped = _fit_section(section, remaining, model_name)
+        remaining -= used
+        result.sections.append(trimmed)
+        result.tokens += used
+        if dropped:
+            result.dropped_tokens[section.name] = dropped
+    return result
+
+
+def budget_context(
+    agent: str,
+    sections: list[ContextSection],
+    fixed: list[str],
+    model_name: str = "gpt-4o",
+) -> BudgetedContext:
+    """Fit sections into the agent's input budget after the fixed prompt text.
+
+    fixed holds the parts of the prompt that are always sent, like the
+    system prompt and the user's message.
+    """
+    fixed_tokens = sum(count_tokens(text, model_name) for text in fixed)
+    budget = Config.get_input_token_budget(agent) - fixed_tokens
+    result = fit_context(sections, budget, model_name)
+    _record_budget(agent, result)
+    return result
+
+
+def _record_budget(agent: str, result: BudgetedContext) -> None:
+    with _budget_stats_lock:
+        stats = _budget_stats.setdefault(
+            agent, {"requests": 0, "trimmed_requests": 0, "dropped_tokens": 0}
+        )
+        stats["requests"] += 1
+        if result.dropped_tokens:
+            stats["trimmed_requests"] += 1
+            stats["dropped_tokens"] += result.total_dropped
+
+
+def get_token_budget_stats() -> dict[str, dict[str, float]]:
+    """Get per-agent counts of trimmed requests and dropped context tokens"""
+    with _budget_stats_lock:
+        stats = {agent: dict(counts) for agent, counts in _budget_stats.items()}
+    for counts in stats.values():
+        counts["avg_dropped_tokens"] = (
+            counts["dropped_tokens"] / counts["requests"] if counts["requests"] else 0.0
+        )
+    return stats
+
+
+def reset_token_budget_stats() -> None:
+    with _budget_stats_lock:
+        _budget_stats.clear()
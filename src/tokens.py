@@ -0,0 +1,56 @@
+"""
+Token counting for prompts.
+
+Uses the model's tiktoken encoding when it can be loaded (tiktoken ships
+with langchain-openai but downloads encodings on first use), and otherwise
+falls back to the usual estimate of four characters per token. Encodings
+and counts for repeated text, like static system prompts, are cached.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str) -> Optional[Any]:
+    """Get the tiktoken encoding for a model, or None if unavailable"""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    """Count the tokens in text for a model"""
+    if not text:
+        return 0
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=256)
+def count_static_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    """count_tokens for text that repeats across calls, like system prompts"""
+    return count_tokens(text, model_name)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = "gpt-4o") -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return text[: max_tokens * _CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
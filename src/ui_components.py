@@ -2,9 +2,28 @@
 Gradio UI components for the BJJ AI Agents System
 """
 
+from functools import lru_cache
+
 import gradio as gr
+import pandas as pd
+from src.agents.graph_registry import warm_up_graphs
+from src.agents.router_agent import arun_router, astream_router
+from src.database import get_table_columns, init_database, read_page
 from src.user_guide import USER_GUIDE_CONTENT
 
+VIEWER_TABLES = ["students", "progress_tracking", "game_plans", "evaluation_results"]
+VIEWER_PAGE_SIZE = 50
+# Long prompts and responses are cut to this many characters in the viewer
+VIEWER_MAX_CHARS = 500
+
+
+@lru_cache(maxsize=None)
+def start_up() -> None:
+    """Create the tables and compile the agent graphs, once per process,
+    while the app is built instead of on the first request"""
+    init_database()
+    warm_up_graphs()
+
 
 def create_help_section():
     """Create the help section with accordion"""
@@ -27,6 +46,22 @@ def _routing_badge():
     return _create_agent_badge("⏳ Routing...", "#ffc107", "#212529")
 
 
+# Badge label and colors for each agent the router can pick
+AGENT_BADGES = {
+    "coach": ("👨‍🏫 Coach Agent", "#d1ecf1", "#0c5460"),
+    "game_plan": ("📋 Game Plan Agent", "#d4edda", "#155724"),
+    "injury": ("🏥 Injury Agent", "#f8d7da", "#721c24"),
+}
+
+
+def _agent_badge(agent: str) -> str:
+    """Badge for the agent chosen by the router."""
+    label, color, text_color = AGENT_BADGES.get(
+        agent, ("🤖 AI Assistant", "#e2e3e5", "#383d41")
+    )
+    return _create_agent_badge(label, color, text_color)
+
+
 def _determine_agent_type(response: str) -> tuple:
     """Determine which agent was used based on response content"""
     response_lower = response.lower()
@@ -54,6 +89,7 @@ def _determine_agent_type(response: str) -> tuple:
 
 
 def create_enhanced_ai_chat_tab():
+    start_up()
     with gr.Tab("🤖 Enhanced AI Chat"):
         gr.Markdown("## 💬 Enhanced AI Chat with Agent Routing")
         gr.Markdown(
@@ -297,19 +333,54 @@ def create_database_viewer_tab():
     with gr.Tab("🗃️ Database Viewer"):
         gr.Markdown("## 🔍 View Database Tables")
         gr.Markdown("Inspect the raw data stored in the application's database.")
+        # The column pickers are filled from the schema, so a new database
+        # needs its tables first
+        start_up()
+        table_columns = list(get_table_columns(VIEWER_TABLES[0]))
         with gr.Row():
             table_name = gr.Dropdown(
-                label="Select Table",
-                choices=[
-                    "students",
-                    "progress_tracking",
-                    "game_plans",
-                ],
+                label="Select Table", choices=VIEWER_TABLES, value=VIEWER_TABLES[0]
             )
+            order_by = gr.Dropdown(label="Sort by", choices=table_columns, value="id")
+            descending = gr.Checkbox(label="Descending")
+        with gr.Row():
+            columns = gr.CheckboxGroup(
+                label="Columns", choices=table_columns, value=table_columns
+            )
+        with gr.Row():
+            filter_column = gr.Dropdown(label="Filter by", choices=table_columns)
+            filter_value = gr.Textbox(label="Equal to", lines=1)
             view_button = gr.Button("View Table", variant="primary")
         with gr.Row():
-            db_output = gr.Textbox(label="Table Data", lines=20, interactive=False)
-        view_button.click(fn=view_database, inputs=[table_name], outputs=db_output)
+            db_output = gr.Dataframe(label="Table Data", interactive=False, wrap=True)
+        with gr.Row():
+            prev_button = gr.Button("Previous page")
+            page_label = gr.Markdown()
+            next_button = gr.Button("Next page")
+        pages = gr.State({"pages": [None], "next": None})
+
+        view_inputs = [
+            table_name,
+            columns,
+            filter_column,
+            filter_value,
+            order_by,
+            descending,
+            pages,
+        ]
+        view_outputs = [db_output, pages, page_label]
+        table_name.change(
+            fn=table_column_choices,
+            inputs=[table_name],
+            outputs=[order_by, columns, filter_column],
+        )
+        view_button.click(fn=view_database, inputs=view_inputs, outputs=view_outputs)
+        next_button.click(
+            fn=next_database_page, inputs=view_inputs, outputs=view_outputs
+        )
+        prev_button.click(
+            fn=previous_database_page, inputs=view_inputs, outputs=view_outputs
+        )
 
 
 def create_training_examples_tab():
@@ -352,15 +423,67 @@ def create_resources_tab():
         )
 
 
+async def route_query(user_message: str) -> str:
+    """Route a chat message to the best agent without blocking a worker thread"""
+    return await arun_router(user_message)
+
+
+def table_column_choices(table: str):
+    """Point the viewer's column pickers at a table's columns"""
+    table_columns = list(get_table_columns(table))
+    return (
+        gr.update(choices=table_columns, value="id"),
+        gr.update(choices=table_columns, value=table_columns),
+        gr.update(choices=table_columns, value=None),
+    )
+
+
+def _show_page(
+    table, columns, filter_column, filter_value, order_by, descending, pages
+):
+    """Read the page that starts after the last key in pages["pages"]"""
+    filters = {filter_column: filter_value} if filter_column and filter_value else None
+    columns = columns or list(get_table_columns(table))
+    rows, next_after = read_page(
+        table,
+        columns,
+        filters,
+        order_by or "id",
+        descending,
+        after=pages["pages"][-1],
+        limit=VIEWER_PAGE_SIZE,
+        max_chars=VIEWER_MAX_CHARS,
+    )
+    pages = {"pages": pages["pages"], "next": next_after}
+    label = f"Page {len(pages['pages'])}" + ("" if next_after else " (last)")
+    return pd.DataFrame(rows, columns=columns), pages, label
+
+
+def view_database(*view):
+    """Show the first page of a table"""
+    *view, _ = view
+    return _show_page(*view, {"pages": [None], "next": None})
+
+
+def next_database_page(*view):
+    *view, pages = view
+    if pages["next"] is None:
+        return _show_page(*view, pages)
+    return _show_page(*view, {"pages": pages["pages"] + [pages["next"]]})
+
+
+def previous_database_page(*view):
+    *view, pages = view
+    return _show_page(*view, {"pages": pages["pages"][:-1] or [None]})
+
+
 # Placeholder functions for Gradio callbacks
-route_query = lambda x: "Routing..."
 chat_with_coach = lambda x, y, z: "Coach says hi"
 get_game_plan = lambda x, y: "Here's your game plan"
 track_progress = lambda w, x, y, z: "Progress tracked"
 save_student_info = lambda a, b, c, d, e, f: "Profile saved"
 load_student_info = lambda x: "Student loaded"
 list_all_students = lambda: "All students listed"
-view_database = lambda x: "Database view"
 generate_training_examples = lambda: "Here are some examples"
 
 
@@ -376,10 +499,11 @@ def add_message(chatbot, chat_history, txt):
     return chat_history, chat_history
 
 
-def bot(chatbot, chat_history):
-    """Get AI response and update chat"""
+async def bot(chatbot, chat_history):
+    """Stream the AI response into the chat as it is generated"""
     if not chat_history:
-        return chatbot, chat_history, "**Agent:** 🤖 AI Assistant"
+        yield chatbot, chat_history, "**Agent:** 🤖 AI Assistant"
+        return
 
     # Get the latest user message from the last tuple
     last_message = chat_history[-1]
@@ -390,19 +514,32 @@ def bot(chatbot, chat_history):
         user_message = last_message.get("content", "")
 
     if not user_message or not user_message.strip():
-        return chatbot, chat_history, "**Agent:** 🤖 AI Assistant"
+        yield chatbot, chat_history, "**Agent:** 🤖 AI Assistant"
+        return
 
-    # Get AI response using the router
-    try:
-        response = route_query(user_message)
-    except Exception as e:
-        response = f"Error: {str(e)}"
-
-    # Add AI response to chat history
-    chat_history.append((user_message, response))
+    # Earlier answered turns, as context for the agent
+    history = []
+    for user_turn, ai_turn in (
+        turn for turn in chat_history[:-1] if isinstance(turn, tuple)
+    ):
+        if ai_turn:
+            history.append({"role": "user", "content": user_turn})
+            history.append({"role": "assistant", "content": ai_turn})
 
-    # Determine agent type for badge
-    agent_type, badge_color, text_color = _determine_agent_type(response)
-    badge_html = _create_agent_badge(agent_type, badge_color, text_color)
+    # Add an AI response to chat history and fill it in as tokens arrive
+    chat_history.append((user_message, ""))
+    badge_html = _routing_badge()
+    yield chat_history, chat_history, badge_html
 
-    return chat_history, chat_history, badge_html
+    response = ""
+    try:
+        async for kind, text in astream_router(user_message, history):
+            if kind == "agent":
+                badge_html = _agent_badge(text)
+            else:
+                response += text
+                chat_history[-1] = (user_message, response)
+            yield chat_history, chat_history, badge_html
+    except Exception as e:
+        chat_history[-1] = (user_message, f"Error: {str(e)}")
+        yield chat_history, chat_history, badge_html
@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+# Config reads the environment once, on import
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_METRICS_FLUSH_INTERVAL"] = "0"
+os.environ["LLM_CASSETTE_MODE"] = "off"
+os.environ["ROUTER_LOG_ENABLED"] = "false"
+os.environ["FAKE_OPENAI_ENABLED"] = "false"
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
+
+import pytest
+
+from config import Config
+from src.fake_openai import start_fake_openai
+from src.llm_resilience import reset_circuit_breakers
+from src.llm_utils import clear_client_registry
+from src.model_policy import reset_model_policy
+from src.rate_limit import reset_rate_limiters
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """A fault-injecting fake OpenAI server that every LLM call goes to"""
+    server = start_fake_openai(seed=0)
+    monkeypatch.setattr(Config, "OPENAI_BASE_URL", server.base_url)
+    # Keep every call on one model, so it has one circuit breaker
+    monkeypatch.setattr(Config, "LLM_FALLBACK_MODELS", "")
+    monkeypatch.setattr(Config, "LLM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(Config, "LLM_RETRY_MAX_DELAY", 0.05)
+    monkeypatch.setattr(Config, "LLM_RATE_LIMIT_RPM", 0)
+    monkeypatch.setattr(Config, "LLM_RATE_LIMIT_TPM", 0)
+    clear_client_registry()
+    reset_circuit_breakers()
+    reset_model_policy()
+    reset_rate_limiters()
+    yield server
+    server.shutdown()
+    clear_client_registry()
+    reset_circuit_breakers()
+    reset_model_policy()
+    reset_rate_limiters()
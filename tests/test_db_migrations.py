@@ -0,0 +1,53 @@
+import os
+
+from src import db_migrations
+from src.db_migrations import MIGRATIONS, migrate, schema_version
+from src.db_pool import get_connection
+from src.llm_metrics import MetricsStore
+
+
+def test_migrates_new_database_in_steps(tmp_path):
+    path = os.path.join(tmp_path, "app.db")
+
+    assert migrate(path, target=2) == [1, 2]
+    assert schema_version(path) == 2
+    latest = MIGRATIONS[-1][0]
+    assert migrate(path) == list(range(3, latest + 1))
+    assert schema_version(path) == latest
+
+
+def test_current_database_takes_no_write_lock(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "app.db")
+    migrate(path)
+
+    def no_transaction(db_path=None):
+        raise AssertionError("migrate() opened a write transaction")
+
+    monkeypatch.setattr(db_migrations, "transaction", no_transaction)
+    assert migrate(path) == []
+    assert migrate(path, target=1) == []
+
+
+def test_llm_tables_are_created_by_migrations(tmp_path):
+    path = os.path.join(tmp_path, "app.db")
+    migrate(path)
+
+    tables = {
+        name
+        for (name,) in get_connection(path).execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+    assert {"llm_response_cache", "llm_metrics"} <= tables
+
+
+def test_metrics_store_migrates_its_database(tmp_path):
+    store = MetricsStore(os.path.join(tmp_path, "metrics.db"), flush_interval=60)
+    store.record("coach", "gpt-4o-mini", 0.2, {"input_tokens": 10})
+    store.record("coach", "gpt-4o-mini", 0.4, {"input_tokens": 5})
+
+    assert store.flush() == 1
+    [row] = store.summary(agent="coach")
+    assert row[:4] == ("coach", "", "gpt-4o-mini", 2)
+    assert row[5] == 15
+    store.stop()
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from src.db_pool import get_connection
+from src.db_writer import WriteBehindQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = os.path.join(tmp_path, "writes.db")
+    conn = get_connection(path)
+    conn.execute("CREATE TABLE notes (text TEXT NOT NULL)")
+    conn.commit()
+    return path
+
+
+def test_flush_writes_queued_rows_in_order(db_path):
+    queue = WriteBehindQueue(db_path, flush_interval=60)
+    for text in ("guard", "mount", "back"):
+        queue.put("notes", {"text": text})
+
+    assert queue.flush() == 3
+    rows = get_connection(db_path).execute("SELECT text FROM notes").fetchall()
+    assert [text for (text,) in rows] == ["guard", "mount", "back"]
+    queue.stop()
+
+
+def test_bad_row_does_not_hold_back_its_batch(db_path):
+    queue = WriteBehindQueue(db_path, flush_interval=60)
+    for text in ("guard", None, "back"):
+        queue.put("notes", {"text": text})
+
+    assert queue.flush() == 2
+    # The bad row alone is retried, then dropped
+    while queue.stats()["pending"]:
+        queue.flush()
+    queue.stop()
+
+    rows = get_connection(db_path).execute("SELECT text FROM notes").fetchall()
+    assert [text for (text,) in rows] == ["guard", "back"]
+    stats = queue.stats()
+    assert stats["written"] == 2
+    assert stats["errors"] == 3
+
+
+def test_flush_for_a_table_skips_when_none_of_its_rows_are_queued(db_path):
+    get_connection(db_path).execute("CREATE TABLE drills (name TEXT)")
+    queue = WriteBehindQueue(db_path, flush_interval=60)
+    queue.put("notes", {"text": "guard"})
+
+    assert queue.flush("drills") == 0
+    assert queue.stats()["pending"] == 1
+    assert queue.flush("notes") == 1
+    assert queue.stats()["pending"] == 0
+    queue.stop()
@@ -0,0 +1,11 @@
+from src.evaluation import AGENT_TYPES, SCENARIO_THEMES, build_examples_prompt
+
+
+def test_example_batches_ask_for_different_examples():
+    batches = len(AGENT_TYPES) * len(SCENARIO_THEMES)
+    prompts = [
+        build_examples_prompt(5, AGENT_TYPES[i % len(AGENT_TYPES)], i)
+        for i in range(batches)
+    ]
+
+    assert len(set(prompts)) == batches
@@ -0,0 +1,76 @@
+import time
+
+from src.llm_utils import use_llm_batch
+
+
+def test_responses_keep_input_order(fake_openai):
+    fake_openai.add_response(r"item (?P<n>\d+)", "answer {n}")
+    # Random latencies so the requests finish out of order
+    fake_openai.latency = "uniform:0:0.05"
+    prompts = [f"item {n}" for n in range(20)]
+
+    result = use_llm_batch(prompts, max_workers=8)
+
+    assert result.responses == [f"answer {n}" for n in range(20)]
+    assert result.errors == {}
+    assert result.stats["succeeded"] == 20
+
+
+def test_failed_item_does_not_stop_the_batch(fake_openai):
+    fake_openai.fail_next(1, 400)
+    prompts = [f"item {n}" for n in range(4)]
+
+    result = use_llm_batch(prompts, max_workers=1)
+
+    assert list(result.errors) == [0]
+    assert result.errors[0].kind == "client_error"
+    assert result.errors[0].status_code == 400
+    assert result.responses[0] is None
+    assert result.responses[1:] == [fake_openai.reply] * 3
+    assert result.stats["failed"] == 1
+
+
+def test_requests_are_paced_by_the_rate_limit(fake_openai):
+    # A bucket of 20 requests, refilled at 20 a second
+    prompts = [f"item {n}" for n in range(30)]
+
+    start = time.monotonic()
+    result = use_llm_batch(prompts, max_workers=8, requests_per_minute=1200)
+    elapsed = time.monotonic() - start
+
+    assert result.errors == {}
+    assert fake_openai.requests == 30
+    assert elapsed >= 0.4
+    assert result.stats["rate_limit_wait_s"] > 0
+
+
+def test_retries_are_paced_by_the_rate_limit(fake_openai):
+    # A bucket of 2 requests, refilled at 2 a second: the second retry has
+    # to wait for the bucket
+    fake_openai.fail_next(2, 429)
+
+    result = use_llm_batch(["item 0"], requests_per_minute=120)
+
+    assert result.responses == [fake_openai.reply]
+    assert fake_openai.requests == 3
+    assert result.stats["rate_limit_wait_s"] >= 0.4
+
+
+def test_identical_prompts_are_sent_once(fake_openai):
+    fake_openai.add_response(r"item (?P<n>\d+)", "answer {n}")
+    prompts = ["item 0", "item 1", "item 0", "item 0"]
+
+    result = use_llm_batch(prompts, max_workers=4, cache=False)
+
+    assert result.responses == ["answer 0", "answer 1", "answer 0", "answer 0"]
+    assert fake_openai.requests == 2
+    assert result.stats["deduplicated"] == 2
+
+
+def test_identical_prompts_are_sampled_separately_above_temperature_zero(
+    fake_openai,
+):
+    result = use_llm_batch(["item 0"] * 3, temperature=0.7, cache=False)
+
+    assert result.errors == {}
+    assert fake_openai.requests == 3
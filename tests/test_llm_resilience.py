@@ -0,0 +1,186 @@
+import time
+
+import pytest
+
+from config import Config
+from src import llm_resilience
+from src.llm_resilience import (
+    CircuitBreaker,
+    LLMCallError,
+    backoff_delay,
+    get_circuit_breaker,
+)
+from src.llm_utils import use_llm_raw
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """The (attempt, retry_after) of every backoff the retry loop asks for"""
+    calls = []
+
+    def recording_backoff(attempt, retry_after=None):
+        calls.append((attempt, retry_after))
+        return backoff_delay(attempt, retry_after)
+
+    monkeypatch.setattr(llm_resilience, "backoff_delay", recording_backoff)
+    return calls
+
+
+def call_error(**kwargs) -> LLMCallError:
+    with pytest.raises(LLMCallError) as excinfo:
+        use_llm_raw("What should I drill today?", **kwargs)
+    return excinfo.value
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_transient_failures(fake_openai, backoffs, status):
+    fake_openai.fail_next(2, status)
+
+    assert use_llm_raw("What should I drill today?") == fake_openai.reply
+    assert fake_openai.requests == 3
+    assert [attempt for attempt, _ in backoffs] == [1, 2]
+
+
+def test_gives_up_after_max_retries(fake_openai, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 2)
+    fake_openai.fail_next(5, 503)
+
+    error = call_error()
+    assert error.kind == "server_error"
+    assert error.attempts == 3
+    assert fake_openai.requests == 3
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_does_not_retry_client_errors(fake_openai, backoffs, status):
+    fake_openai.fail_next(1, status)
+
+    error = call_error()
+    assert error.kind == "client_error"
+    assert error.status_code == status
+    assert not error.retryable
+    assert error.attempts == 1
+    assert fake_openai.requests == 1
+    assert backoffs == []
+
+
+@pytest.mark.parametrize(
+    "status, kind",
+    [(429, "rate_limited"), (500, "server_error"), (503, "server_error")],
+)
+def test_classifies_retryable_failures(fake_openai, monkeypatch, status, kind):
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 0)
+    fake_openai.fail_next(1, status)
+
+    error = call_error()
+    assert error.kind == kind
+    assert error.status_code == status
+    assert error.retryable
+
+
+def test_rate_limited_error_reads_retry_after(fake_openai, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 0)
+    fake_openai.fail_next(1, 429)
+
+    assert call_error().retry_after == 0
+
+
+def test_backoff_is_full_jitter(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(Config, "LLM_RETRY_MAX_DELAY", 3.0)
+    bounds = []
+    monkeypatch.setattr(
+        llm_resilience.random,
+        "uniform",
+        lambda low, high: bounds.append((low, high)) or high,
+    )
+
+    delays = [backoff_delay(attempt) for attempt in range(1, 6)]
+    assert bounds == [(0, 0.5), (0, 1.0), (0, 2.0), (0, 3.0), (0, 3.0)]
+    assert delays == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_waits_at_least_retry_after(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(Config, "LLM_RETRY_MAX_DELAY", 3.0)
+    monkeypatch.setattr(llm_resilience.random, "uniform", lambda low, high: low)
+
+    assert backoff_delay(1, retry_after=2.0) == 2.0
+    assert backoff_delay(1, retry_after=60.0) == 3.0
+
+
+def test_times_out_against_slow_upstream(fake_openai):
+    fake_openai.latency = 2.0
+
+    start = time.monotonic()
+    error = call_error(timeout=0.3)
+    elapsed = time.monotonic() - start
+
+    assert error.kind == "timeout"
+    assert error.retryable
+    assert elapsed < 1.5
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(llm_resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(window=4, min_calls=4, error_rate=0.5, cooldown=10)
+
+    for success in (True, True, False, False):
+        breaker.before_call()
+        breaker.record(success)
+    assert breaker.state == "open"
+    with pytest.raises(LLMCallError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.kind == "circuit_open"
+
+    now[0] += 10
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    # Only one trial call is let through
+    with pytest.raises(LLMCallError):
+        breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_breaker(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(llm_resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(window=2, min_calls=2, error_rate=0.5, cooldown=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(False)
+
+    now[0] += 10
+    breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == "open"
+    now[0] += 9
+    assert breaker.state == "open"
+
+
+def test_open_breaker_fails_fast_without_calling_upstream(fake_openai, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(Config, "LLM_BREAKER_WINDOW", 4)
+    monkeypatch.setattr(Config, "LLM_BREAKER_MIN_CALLS", 4)
+    monkeypatch.setattr(Config, "LLM_BREAKER_COOLDOWN", 0.5)
+    fake_openai.latency = 0.05
+    fake_openai.error_rate = 1.0
+
+    for _ in range(4):
+        assert call_error().kind == "server_error"
+    requests = fake_openai.requests
+
+    start = time.monotonic()
+    error = call_error()
+    assert error.kind == "circuit_open"
+    assert time.monotonic() - start < 0.05
+    assert fake_openai.requests == requests
+
+    # After the cooldown a successful trial call closes the breaker
+    time.sleep(0.5)
+    fake_openai.error_rate = 0.0
+    assert use_llm_raw("What should I drill today?") == fake_openai.reply
+    assert get_circuit_breaker(Config.OPENAI_MODEL).state == "closed"
@@ -0,0 +1,48 @@
+import os
+import sys
+
+from src import router_model
+from src.db_migrations import migrate
+from src.db_pool import get_connection
+from src.router_model import RouterModel, load_routing_examples, unseen_examples
+
+QUERIES = [
+    ("How do I finish an armbar from guard?", "coach"),
+    ("Plan my matches for the regional open", "game_plan"),
+    ("My knee hurts after rolling", "injury"),
+]
+
+
+def log_routes(db_path, count, start=0):
+    conn = get_connection(db_path)
+    conn.executemany(
+        "INSERT INTO routing_log (input_text, agent_type, source, latency_ms) "
+        "VALUES (?, ?, 'llm', 500)",
+        [
+            (f"{QUERIES[i % 3][0]} #{i}", QUERIES[i % 3][1])
+            for i in range(start, start + count)
+        ],
+    )
+    conn.commit()
+
+
+def test_evaluation_uses_only_rows_the_model_did_not_train_on(tmp_path, monkeypatch):
+    db_path = os.path.join(tmp_path, "app.db")
+    model_path = os.path.join(tmp_path, "router_model.json")
+    migrate(db_path)
+    log_routes(db_path, 30)
+    monkeypatch.setattr(
+        sys, "argv", ["router_model", "train", "--db", db_path, "--out", model_path]
+    )
+    router_model.main()
+
+    model = RouterModel.load(model_path)
+    assert len(model.held_out_ids) == 6
+    assert model.trained_through_id == 30
+
+    # Routing keeps being logged after training
+    log_routes(db_path, 10, start=30)
+    unseen = unseen_examples(model, load_routing_examples(db_path))
+    assert [example[0] for example in unseen] == model.held_out_ids + list(
+        range(31, 41)
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from src.agents import router_agent
+from src.agents.router_agent import SharedState, get_speculation_stats
+from src.llm_metrics import track_llm_usage
+from src.llm_utils import use_llm_async, use_llm_raw
+
+
+def guessing_node(state: SharedState) -> SharedState:
+    state.output = use_llm_raw(state.input, agent="injury")
+    state.agent_type = "injury"
+    return state
+
+
+async def aguessing_node(state: SharedState) -> SharedState:
+    state.output = await use_llm_async(state.input, agent="injury")
+    state.agent_type = "injury"
+    return state
+
+
+@pytest.fixture
+def wrong_guess(fake_openai, monkeypatch):
+    """Speculate on the injury agent while the router picks the coach"""
+    fake_openai.reply = "Ice it and rest for a week before rolling again"
+
+    def route_to_coach(state):
+        state.router = "coach"
+        return state
+
+    async def aroute_to_coach(state):
+        return route_to_coach(state)
+
+    monkeypatch.setattr(router_agent, "_should_speculate", lambda state: "injury")
+    monkeypatch.setattr(router_agent, "llm_router", route_to_coach)
+    monkeypatch.setattr(router_agent, "allm_router", aroute_to_coach)
+    monkeypatch.setitem(router_agent.AGENT_NODES, "injury", guessing_node)
+    monkeypatch.setitem(router_agent.AGENT_ANODES, "injury", aguessing_node)
+    monkeypatch.setattr(
+        router_agent, "_speculation_stats", dict.fromkeys(get_speculation_stats(), 0)
+    )
+    with track_llm_usage() as usage:
+        guessing_node(SharedState(input="My knee hurts"))
+    return usage["prompt_tokens"] + usage["completion_tokens"]
+
+
+def test_track_llm_usage_adds_up_reported_tokens(fake_openai):
+    with track_llm_usage() as outer:
+        use_llm_raw("Plan my first tournament")
+        with track_llm_usage() as inner:
+            use_llm_raw("My knee hurts")
+
+    assert outer["calls"] == 2
+    assert inner["calls"] == 1
+    assert inner["prompt_tokens"] > 0
+    assert inner["completion_tokens"] > 0
+    assert outer["prompt_tokens"] > inner["prompt_tokens"]
+
+
+def test_discarded_guess_counts_its_billed_tokens(wrong_guess):
+    state = router_agent.speculative_router(SharedState(input="My knee hurts"))
+
+    assert state.router == "coach"
+    deadline = time.monotonic() + 5
+    while get_speculation_stats()["wasted_tokens"] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert get_speculation_stats()["wasted_tokens"] == wrong_guess
+
+
+def test_async_guess_finished_before_routing_counts_its_tokens(
+    wrong_guess, monkeypatch
+):
+    async def route_late(state):
+        # Let the guess finish first, so it can't be cancelled
+        await asyncio.sleep(0.5)
+        state.router = "coach"
+        return state
+
+    monkeypatch.setattr(router_agent, "allm_router", route_late)
+    state = asyncio.run(
+        router_agent.aspeculative_router(SharedState(input="My knee hurts"))
+    )
+
+    assert state.router == "coach"
+    assert get_speculation_stats()["wasted_tokens"] == wrong_guess
+
+
+def test_route_latency_excludes_the_wait_for_the_speculative_answer(monkeypatch):
+    def slow_guess(state):
+        time.sleep(0.3)
+        state.output = "Ice it"
+        state.agent_type = "injury"
+        return state
+
+    def route_to_injury(state):
+        state.router = "injury"
+        return state
+
+    logged = []
+    monkeypatch.setattr(router_agent.Config, "ROUTER_LOG_ENABLED", True)
+    monkeypatch.setattr(router_agent.Config, "ROUTER_SPECULATION_ENABLED", True)
+    monkeypatch.setattr(
+        router_agent, "save_later", lambda table, row: logged.append(row)
+    )
+    monkeypatch.setattr(router_agent, "local_route", lambda state: None)
+    monkeypatch.setattr(router_agent, "_should_speculate", lambda state: "injury")
+    monkeypatch.setattr(router_agent, "llm_router", route_to_injury)
+    monkeypatch.setitem(router_agent.AGENT_NODES, "injury", slow_guess)
+
+    state = router_agent.hybrid_router(SharedState(input="My knee hurts"))
+
+    assert state.speculated
+    (row,) = logged
+    assert row["latency_ms"] < 100
+    assert row["total_ms"] >= 300
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.llm_resilience import LLMCallError
+from src.llm_utils import use_llm_raw
+from src.single_flight import FlightTimeout, SingleFlight
+
+
+def test_waiters_share_the_leaders_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "armbar"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", call)))
+    leader.start()
+    started.wait()
+    waiters = [
+        threading.Thread(target=lambda: results.append(flight.do("k", call)))
+        for _ in range(3)
+    ]
+    for waiter in waiters:
+        waiter.start()
+    while flight.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join()
+
+    assert results == ["armbar"] * 4
+    assert len(calls) == 1
+
+
+def test_caller_after_the_flight_ends_gets_the_cached_result():
+    flight = SingleFlight()
+    cache = {}
+
+    def lookup():
+        return cache.get("k")
+
+    # The leader caches its response, then ends its flight
+    assert flight.join("k", lookup) == (True, None)
+    cache["k"] = "armbar"
+    flight.finish("k", "armbar")
+
+    # A caller that missed the cache before the response was stored
+    assert flight.join("k", lookup) == (False, "armbar")
+    assert flight.in_flight() == 0
+    stats = flight.stats()
+    assert stats["leaders"] == 1
+    assert stats["cached"] == 1
+
+
+def test_lookup_is_not_used_while_a_call_is_running():
+    flight = SingleFlight()
+    assert flight.join("k") == (True, None)
+
+    result = []
+    waiter = threading.Thread(
+        target=lambda: result.append(flight.join("k", lambda: "stale"))
+    )
+    waiter.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    flight.finish("k", "fresh")
+    waiter.join()
+
+    assert result == [(False, "fresh")]
+
+
+def test_waiter_gives_up_at_its_own_timeout():
+    flight = SingleFlight()
+    assert flight.join("k") == (True, None)
+
+    start = time.monotonic()
+    with pytest.raises(FlightTimeout):
+        flight.join("k", timeout=0.1)
+    assert time.monotonic() - start < 0.5
+    assert flight.stats()["timed_out"] == 1
+
+    # The leader's flight is unaffected and still hands over its result
+    flight.finish("k", "armbar")
+    assert flight.in_flight() == 0
+
+
+def test_async_waiter_gives_up_at_its_own_timeout():
+    flight = SingleFlight()
+    assert flight.join("k") == (True, None)
+
+    with pytest.raises(FlightTimeout):
+        asyncio.run(flight.ajoin("k", timeout=0.1))
+    flight.finish("k", "armbar")
+
+
+def test_coalesced_call_times_out_before_a_slow_leader(fake_openai):
+    fake_openai.latency = 1.0
+    leader = threading.Thread(target=lambda: use_llm_raw("Drill for today?"))
+    leader.start()
+    while fake_openai.requests == 0:
+        time.sleep(0.01)
+
+    start = time.monotonic()
+    with pytest.raises(LLMCallError) as excinfo:
+        use_llm_raw("Drill for today?", timeout=0.2)
+    assert excinfo.value.kind == "timeout"
+    assert time.monotonic() - start < 0.6
+    leader.join()
+    assert fake_openai.requests == 1